@@ -6,6 +6,7 @@ Final Production Version for Vercel.
 from pathlib import Path
 import dj_database_url
 import os
+import tempfile
 from email.utils import formataddr
 # في الإنتاج على Vercel، لا نحتاج لـ load_dotenv لأن القيم تُقرأ من إعدادات الموقع مباشرة
 # لكن سنبقي عليها للمساعدة في التشغيل المحلي إذا لزم الأمر
@@ -47,6 +48,7 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 MIDDLEWARE = [
+    'inspectors.middleware.PerformanceMiddleware', # أولاً حتى يشمل القياس بقية السلسلة
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # الترتيب مهم: تحت Security مباشرة
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -127,6 +129,45 @@ EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 if EMAIL_HOST_USER:
     DEFAULT_FROM_EMAIL = formataddr(('نظام التفتيش الحكومي', EMAIL_HOST_USER))
 
+# صندوق البريد الصادر: الطلبات تضيف الرسائل فقط والإرسال يتم خارج الطلب
+# عند تشغيل "python manage.py send_queued_mail --loop" كعامل مستقل يمكن تعطيل التفريغ في الخلفية
+EMAIL_OUTBOX_BACKGROUND_DRAIN = os.environ.get('EMAIL_OUTBOX_BACKGROUND_DRAIN', 'true').lower() == 'true'
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = 60
+
+# خطوط تقارير PDF (يجب أن تدعم العربية)، وإن لم تُحدد يُستخدم الخط المضمّن static/fonts/NotoNaskhArabic-Regular.ttf
+# التطبيق لا يبدأ إن لم يوجد الخط بدلاً من توليد تقارير بمربعات مكان الحروف
+PDF_ARABIC_FONT = os.environ.get('PDF_ARABIC_FONT')
+PDF_ARABIC_BOLD_FONT = os.environ.get('PDF_ARABIC_BOLD_FONT')
+# مجلد حفظ ملفات PDF المولدة (يجب ألا يكون داخل MEDIA_ROOT)
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'govinspect_pdf_cache'))
+
+# سجلات التدقيق الأقدم من مدة الاحتفاظ تُنقل إلى ملفات مضغوطة شهرية
+# بالأمر "python manage.py archive_audit_logs" (المجلد خارج MEDIA_ROOT لأن السجلات غير عامة)
+AUDIT_LOG_RETENTION_DAYS = int(os.environ.get('AUDIT_LOG_RETENTION_DAYS', 180))
+AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR', os.path.join(BASE_DIR, 'audit_archive'))
+
+# قياس أداء الطلبات لكل مسار (يُعرض للمدير في /manager/performance/ وفي ترويسة Server-Timing)
+PERFORMANCE_MONITORING = os.environ.get('PERFORMANCE_MONITORING', 'true').lower() == 'true'
+PERFORMANCE_SLOW_REQUEST_MS = int(os.environ.get('PERFORMANCE_SLOW_REQUEST_MS', 1000))
+
+# معالجة الصور المرفوعة: تدوير وحذف EXIF وتصغير الأصل عند الحفظ، وتوليد نسخة عرض وصورة مصغرة (WebP) في خيوط خلفية
+# الصور المرفوعة قبل هذه الميزة تُعالج بالأمر "python manage.py process_images"
+IMAGE_ORIGINAL_MAX_DIMENSION = int(os.environ.get('IMAGE_ORIGINAL_MAX_DIMENSION', 2560))
+IMAGE_DISPLAY_MAX_DIMENSION = 1600
+IMAGE_THUMBNAIL_MAX_DIMENSION = 400
+IMAGE_RENDITION_FORMAT = os.environ.get('IMAGE_RENDITION_FORMAT', 'WEBP')
+IMAGE_BACKGROUND_PROCESSING = os.environ.get('IMAGE_BACKGROUND_PROCESSING', 'true').lower() == 'true'
+
+# رفع صور التقارير على أجزاء: الأجزاء تُكتب في مجلد مؤقت حتى يكتمل الملف
+# عمليات الرفع التي لم تُربط بتقرير تُحذف بالأمر "python manage.py clean_uploads"
+UPLOAD_TEMP_DIR = os.environ.get('UPLOAD_TEMP_DIR', os.path.join(tempfile.gettempdir(), 'govinspect_uploads'))
+UPLOAD_MAX_FILE_SIZE = int(os.environ.get('UPLOAD_MAX_FILE_SIZE', 25 * 1024 * 1024))
+UPLOAD_EXPIRY_HOURS = 48
+
+# مزامنة تطبيق المفتش دون اتصال (api/sync/): أقصى عدد عمليات في الطلب الواحد
+SYNC_MAX_OPERATIONS = 100
+
 AUTHENTICATION_BACKENDS = [
     'inspectors.backends.EmailBackend',
     'django.contrib.auth.backends.ModelBackend',
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Company, CompanyImage, Inspection, InspectionImage, User
+from .models import Company, CompanyImage, Inspection, InspectionImage, User, OutgoingEmail, AuditArchive, MediaBlob, PhotoUpload
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.sites.shortcuts import get_current_site
@@ -11,6 +11,7 @@ from django.contrib.auth.tokens import default_token_generator
 from django.utils.translation import gettext_lazy as _
 from .forms import CustomUserCreationForm
 from auditlog.models import LogEntry
+from .outbox import enqueue_email
 
 # تسجيل الموديلات الأخرى
 admin.site.register(Company)
@@ -18,6 +19,32 @@ admin.site.register(CompanyImage)
 admin.site.register(Inspection)
 admin.site.register(InspectionImage)
 
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'to')
+
+
+@admin.register(AuditArchive)
+class AuditArchiveAdmin(admin.ModelAdmin):
+    list_display = ('month', 'file', 'entries_count', 'first_timestamp', 'last_timestamp', 'created_at')
+    list_filter = ('month',)
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'references', 'created_at')
+    search_fields = ('name', 'sha256')
+    readonly_fields = ('name', 'sha256', 'size', 'references', 'created_at')
+
+
+@admin.register(PhotoUpload)
+class PhotoUploadAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'owner', 'inspection', 'received', 'size', 'blob', 'updated_at')
+    raw_id_fields = ('owner', 'inspection')
+
 User = get_user_model()
 
 @admin.register(User)
@@ -71,8 +98,7 @@ class UserAdmin(BaseUserAdmin):
                     'token': default_token_generator.make_token(obj),
                 })
                 
-                email = EmailMessage(subject, message, to=[obj.email])
-                email.send()
+                enqueue_email(subject, message, [obj.email])
                 
                 return
         
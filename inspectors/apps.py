@@ -4,3 +4,37 @@ from django.apps import AppConfig
 class InspectorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inspectors'
+
+    def ready(self):
+        from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+        from auditlog.models import LogEntry
+        from .images import image_post_delete, image_post_save, image_pre_save
+        from .models import Company, CompanyImage, Inspection, InspectionImage, User
+        from .pdf import register_fonts
+        from .rollups import company_post_save, company_pre_save, inspection_post_delete, inspection_post_save, inspection_pre_save
+        from .roles import user_groups_changed
+        from .search import company_saved, inspection_saved, logentry_saved, object_deleted, user_saved
+
+        m2m_changed.connect(user_groups_changed, sender=User.groups.through, dispatch_uid='inspectors_user_groups_changed')
+        # تحديث جداول التجميع اليومية عند تغير حالة التقرير
+        pre_save.connect(inspection_pre_save, sender=Inspection, dispatch_uid='inspectors_inspection_rollup_pre_save')
+        post_save.connect(inspection_post_save, sender=Inspection, dispatch_uid='inspectors_inspection_rollup_post_save')
+        post_delete.connect(inspection_post_delete, sender=Inspection, dispatch_uid='inspectors_inspection_rollup_post_delete')
+        # نقل التقارير بين مفاتيح التجميع عند تغيير منطقة المنشأة أو نوعها
+        pre_save.connect(company_pre_save, sender=Company, dispatch_uid='inspectors_company_rollup_pre_save')
+        post_save.connect(company_post_save, sender=Company, dispatch_uid='inspectors_company_rollup_post_save')
+        # تحديث فهرس البحث
+        post_save.connect(company_saved, sender=Company, dispatch_uid='inspectors_search_company_saved')
+        post_save.connect(user_saved, sender=User, dispatch_uid='inspectors_search_user_saved')
+        post_save.connect(inspection_saved, sender=Inspection, dispatch_uid='inspectors_search_inspection_saved')
+        post_save.connect(logentry_saved, sender=LogEntry, dispatch_uid='inspectors_search_logentry_saved')
+        for model in (Company, User, Inspection, LogEntry):
+            post_delete.connect(object_deleted, sender=model, dispatch_uid=f'inspectors_search_{model.__name__}_deleted')
+        # توليد نسخ العرض والصور المصغرة بعد رفع الصور، وتحرير مراجع الملفات عند حذفها
+        for model in (CompanyImage, InspectionImage):
+            pre_save.connect(image_pre_save, sender=model, dispatch_uid=f'inspectors_images_{model.__name__}_pre_save')
+            post_save.connect(image_post_save, sender=model, dispatch_uid=f'inspectors_images_{model.__name__}_post_save')
+            post_delete.connect(image_post_delete, sender=model, dispatch_uid=f'inspectors_images_{model.__name__}_post_delete')
+
+        # تسجيل الخطوط العربية مرة واحدة لكل عملية بدلاً من كل طلب PDF
+        register_fonts()
@@ -0,0 +1,37 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+# التشكيل والتطويل
+_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+# توحيد أشكال الألف والياء والتاء المربوطة والهمزات والأرقام الهندية
+_FOLD = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+})
+_TOKEN = re.compile(r'[^\W_]+')
+
+
+def normalize_arabic(text):
+    """
+    تطبيع النص للبحث: حذف التشكيل، توحيد (أ/إ/آ -> ا، ى -> ي، ة -> ه)، أحرف صغيرة،
+    وإرجاع الكلمات مفصولة بمسافة واحدة.
+    """
+    if not text:
+        return ''
+    text = _DIACRITICS.sub('', str(text)).translate(_FOLD).casefold()
+    return ' '.join(_TOKEN.findall(text))
+
+
+def normalized_prefix_q(field, text):
+    """
+    شرط "يبدأ بـ" على عمود مطبّع بحيث يُنفذ كمسح نطاق على الفهرس.
+    """
+    prefix = normalize_arabic(text)
+    if connection.vendor == 'postgresql':
+        # الفهرس مبني بـ varchar_pattern_ops فيخدم LIKE 'x%' مهما كان ترتيب اللغة (collation)
+        return Q(**{f'{field}__startswith': prefix})
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '\U0010ffff'})
@@ -0,0 +1,186 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import User
+from .typeahead import inspector_label
+
+# مدة الاحتفاظ بالتغييرات المعالجة لكل سجل (السجلات لا تتغير بعد إنشائها)
+AUDIT_CHANGES_CACHE_TIMEOUT = getattr(settings, 'AUDIT_CHANGES_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+
+# القيم التي يسجلها auditlog للحقول الفارغة
+EMPTY_VALUES = (None, '', 'None')
+
+# قاموس لترجمة أسماء الحقول إلى العربية
+FIELD_NAMES = {
+    # Company Fields (الموجودة سابقاً)
+    'company_name': 'اسم المنشأة',
+    'company_number': 'رقم المنشأة',
+    'region': 'المنطقة',
+    'street_name': 'اسم الشارع',
+    'building_number': 'رقم العقار',
+    'activity_type': 'نوع النشاط',
+    'electricity_meter_number': 'رقم الكهرباء',
+    'actual_workers_count': 'عدد العمال الفعلي',
+    'establishment_type': 'نوع المنشأة',
+    'size_description': 'وصف الحجم',
+    'created_at': 'تاريخ الإضافة',
+    'status': 'الحالة',
+    'manager': 'المدير المسؤول',
+    'assigned_to': 'المفتش المعين',
+    'status_by_inspector': 'حالة التعيين',
+    'decline_reason': 'سبب الرفض',
+    
+    # User Fields (النماذج التي سجلتيها)
+    'phone_number': 'رقم الجوال',
+    'address': 'العنوان',
+    'user_id': 'رقم الهوية',
+    'supervisor': 'المشرف/المدير',
+    'username': 'اسم المستخدم',
+    'first_name': 'الاسم الأول',
+    'last_name': 'الاسم الأخير',
+    'email': 'البريد الإلكتروني',
+
+    # Inspection Fields
+    'inspector': 'المفتش',
+    'company': 'المنشأة المفتشة',
+    'inspection_date': 'تاريخ التفتيش',
+    'workers_size_estimation': 'تقدير حجم العمالة',
+    'license_compliance': 'مطابقة الرخصة للموقع',
+    'female_workers_element': 'العنصر النسائي',
+    'unlicensed_workers': 'عمال دون ترخيص',
+    'penalties_regulation': 'لائحة الجزاءات',
+    'work_regulation': 'لائحة تنظيم العمل',
+    'worker_file_maintenance': 'الاحتفاظ بملف العامل',
+    'extended_working_hours': 'ساعات العمل الإضافية',
+    'consecutive_shifts': 'الورديات المتتالية',
+    'weekly_rest_schedule': 'جدول الراحة الأسبوعية',
+    'number_of_shifts': 'عدد ورديات العمل',
+    'inspector_opinion': 'رأي المفتش',
+    'mandoub_name_1': 'اسم المندوب الأول',
+    'mandoub_phone_1': 'جوال المندوب الأول',
+    'mandoub_name_2': 'اسم المندوب الثاني',
+    'mandoub_phone_2': 'جوال المندوب الثاني',
+    'inspection_status': 'حالة التقرير', # تأكدي من الاسم التقني للحقل في نموذج Inspection
+    
+    # الحقول الداخلية التي قد تظهر
+    'id': 'الرقم التعريفي (ID)',
+}
+
+# خرائط الحقول لكل نوع محتوى: الحقل -> (الاسم المترجم، النموذج المرتبط، خيارات العرض)
+_field_maps = {}
+
+
+def _cache_key(entry_pk):
+    return f'audit_changes:{entry_pk}'
+
+
+def _field_map(content_type):
+    fields = _field_maps.get(content_type.pk)
+    if fields is None:
+        fields = {}
+        model = content_type.model_class()
+        for field in model._meta.concrete_fields if model else []:
+            related = field.related_model if field.is_relation else None
+            fields[field.name] = (
+                FIELD_NAMES.get(field.name, str(field.verbose_name)),
+                related,
+                {str(value): str(label) for value, label in field.flatchoices},
+            )
+        _field_maps[content_type.pk] = fields
+    return fields
+
+
+def _changes(entry):
+    changes = entry.changes
+    if isinstance(changes, str):
+        try:
+            changes = json.loads(changes)
+        except ValueError:
+            return {}
+    return changes or {}
+
+
+def _object_label(obj):
+    if isinstance(obj, User):
+        return inspector_label(obj)
+    return str(obj)
+
+
+def _rows(entry):
+    """
+    التغييرات المعروضة للسجل: [(الحقل، الاسم، القيمة القديمة، القيمة الجديدة)].
+    الإنشاء يعرض القيم الجديدة غير الفارغة، والحذف القيم القديمة غير الفارغة، والتعديل كل التغييرات.
+    """
+    rows = []
+    for field, values in _changes(entry).items():
+        old, new = (list(values) + [None, None])[:2]
+        old = None if old in EMPTY_VALUES else str(old)
+        new = None if new in EMPTY_VALUES else str(new)
+        if entry.action == entry.Action.CREATE:
+            if new is None:
+                continue
+            old = None
+        elif entry.action == entry.Action.DELETE:
+            if old is None:
+                continue
+            new = None
+        rows.append((field, old, new))
+    return rows
+
+
+def render_log_changes(entries):
+    """
+    يعيد التغييرات الجاهزة للعرض لكل سجل في الصفحة: {رقم السجل: [{'field', 'old', 'new'}]}.
+    أسماء الكائنات المرتبطة تُجلب باستعلام واحد لكل نموذج للصفحة كاملة،
+    والنتيجة تُخزن في الكاش حسب رقم السجل.
+    """
+    entries = list(entries)
+    cached = cache.get_many([_cache_key(entry.pk) for entry in entries])
+    rendered = {}
+    pending = []
+    for entry in entries:
+        value = cached.get(_cache_key(entry.pk))
+        if value is None:
+            pending.append((entry, _field_map(entry.content_type), _rows(entry)))
+        else:
+            rendered[entry.pk] = value
+    if not pending:
+        return rendered
+
+    # جمع أرقام الكائنات المرتبطة من جميع السجلات ثم جلبها دفعة واحدة لكل نموذج
+    wanted = {}
+    for _, fields, rows in pending:
+        for field, old, new in rows:
+            related = fields.get(field, (None, None, None))[1]
+            if related is None:
+                continue
+            for value in (old, new):
+                if value is not None and value.isdigit():
+                    wanted.setdefault(related, set()).add(int(value))
+    objects = {
+        model: {str(pk): _object_label(obj) for pk, obj in model._default_manager.in_bulk(pks).items()}
+        for model, pks in wanted.items()
+    }
+
+    def display(value, related, choices):
+        if value is None:
+            return None
+        if related is not None:
+            return objects.get(related, {}).get(value, f'(ID: {value})')
+        return choices.get(value, value)
+
+    fresh = {}
+    for entry, fields, rows in pending:
+        changes = []
+        for field, old, new in rows:
+            label, related, choices = fields.get(field, (FIELD_NAMES.get(field, field), None, {}))
+            changes.append({
+                'field': label,
+                'old': display(old, related, choices),
+                'new': display(new, related, choices),
+            })
+        rendered[entry.pk] = fresh[_cache_key(entry.pk)] = changes
+    cache.set_many(fresh, AUDIT_CHANGES_CACHE_TIMEOUT)
+    return rendered
@@ -0,0 +1,196 @@
+import gzip
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from auditlog.models import LogEntry
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditArchive, User
+from .search import build_document, query_tokens
+
+# السجلات الأحدث من هذه المدة (بالأيام) تبقى في قاعدة البيانات ويُعرض منها سجل التدقيق مباشرة
+AUDIT_LOG_RETENTION_DAYS = getattr(settings, 'AUDIT_LOG_RETENTION_DAYS', 180)
+AUDIT_ARCHIVE_DIR = getattr(settings, 'AUDIT_ARCHIVE_DIR', None)
+AUDIT_ARCHIVE_BATCH_SIZE = 2000
+# مدة الاحتفاظ بسجلات شهر مؤرشف لفريق مدير بعد قراءتها (الملفات لا تتغير بعد كتابتها)
+AUDIT_ARCHIVE_CACHE_TIMEOUT = getattr(settings, 'AUDIT_ARCHIVE_CACHE_TIMEOUT', 60 * 60)
+# أقصى عدد سجلات يُحفظ في الكاش لشهر واحد، وما زاد يُقرأ من الملفات في كل طلب
+AUDIT_ARCHIVE_CACHE_MAX_ENTRIES = getattr(settings, 'AUDIT_ARCHIVE_CACHE_MAX_ENTRIES', 5000)
+
+
+def archive_storage():
+    return FileSystemStorage(location=AUDIT_ARCHIVE_DIR)
+
+
+def hot_window_start(now=None):
+    """
+    بداية فترة السجلات الحية: ما قبلها يُنقل إلى الأرشيف.
+    """
+    return (now or timezone.now()) - timedelta(days=AUDIT_LOG_RETENTION_DAYS)
+
+
+def _next_month(month_start):
+    year, month = (month_start.year + 1, 1) if month_start.month == 12 else (month_start.year, month_start.month + 1)
+    return timezone.make_aware(datetime(year, month, 1))
+
+
+def _serialize(entry):
+    return {
+        'id': entry.pk,
+        'content_type': f'{entry.content_type.app_label}.{entry.content_type.model}',
+        'object_pk': entry.object_pk,
+        'object_id': entry.object_id,
+        'object_repr': entry.object_repr,
+        'serialized_data': entry.serialized_data,
+        'action': entry.action,
+        'changes_text': entry.changes_text,
+        'changes': entry.changes,
+        'actor_id': entry.actor_id,
+        'cid': entry.cid,
+        'remote_addr': entry.remote_addr,
+        'timestamp': entry.timestamp,
+        'additional_data': entry.additional_data,
+    }
+
+
+def _write_batch(month, entries, storage):
+    lines = ''.join(json.dumps(_serialize(entry), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n' for entry in entries)
+    name = f'{month:%Y-%m}/{entries[0].pk}-{entries[-1].pk}.jsonl.gz'
+    return storage.save(name, ContentFile(gzip.compress(lines.encode('utf-8'))))
+
+
+def archive_logs(before=None, batch_size=AUDIT_ARCHIVE_BATCH_SIZE, dry_run=False):
+    """
+    ينقل سجلات التدقيق الأقدم من before (افتراضياً بداية الفترة الحية) إلى ملفات مضغوطة
+    لكل شهر على دفعات، ثم يحذفها من قاعدة البيانات. يعيد قائمة (الشهر، عدد السجلات).
+    الملف يُكتب قبل حذف السجلات، فتوقف العملية في المنتصف لا يفقد أي سجل.
+    """
+    before = before or hot_window_start()
+    expired = LogEntry.objects.filter(timestamp__lt=before)
+    storage = archive_storage()
+    summary = []
+    for month_start in expired.datetimes('timestamp', 'month'):
+        month = month_start.date()
+        month_entries = expired.filter(timestamp__gte=month_start, timestamp__lt=_next_month(month_start))
+        if dry_run:
+            summary.append((month, month_entries.count()))
+            continue
+        archived = 0
+        while True:
+            batch = list(month_entries.select_related('content_type').order_by('pk')[:batch_size])
+            if not batch:
+                break
+            name = _write_batch(month, batch, storage)
+            ids = [entry.pk for entry in batch]
+            with transaction.atomic():
+                AuditArchive.objects.create(
+                    month=month,
+                    file=name,
+                    entries_count=len(batch),
+                    first_entry_id=batch[0].pk,
+                    last_entry_id=batch[-1].pk,
+                    first_timestamp=min(entry.timestamp for entry in batch),
+                    last_timestamp=max(entry.timestamp for entry in batch),
+                )
+                # إشارة الحذف تزيل السجلات من فهرس البحث
+                LogEntry.objects.filter(pk__in=ids).delete()
+            archived += len(batch)
+        summary.append((month, archived))
+    return summary
+
+
+def archive_index():
+    """
+    الأشهر المؤرشفة (الأحدث أولاً) ووقت أحدث سجل في الأرشيف، باستعلام واحد.
+    السجلات الحية تُعرض من بعد هذا الوقت فقط (None: لا يوجد أرشيف).
+    """
+    rows = list(AuditArchive.objects.values('month').annotate(newest=Max('last_timestamp')).order_by('-month'))
+    return [row['month'] for row in rows], max((row['newest'] for row in rows), default=None)
+
+
+def _read_archive(archive, storage):
+    with storage.open(archive.file, 'rb') as handle:
+        lines = gzip.decompress(handle.read()).decode('utf-8').splitlines()
+    return [json.loads(line) for line in lines]
+
+
+def _slice_key(month, archives, actor_ids):
+    # المفتاح يتغير بإضافة ملف للشهر أو بتغير أعضاء الفريق
+    actors = 'all' if actor_ids is None else ','.join(str(pk) for pk in sorted(actor_ids))
+    files = ','.join(str(archive.pk) for archive in archives)
+    return f'audit_archive:{month:%Y-%m}:{hashlib.sha1(f"{files}|{actors}".encode()).hexdigest()}'
+
+
+def _archived_rows(month, actor_ids):
+    """
+    سجلات الشهر الخاصة بالفريق (قبل تحويلها إلى LogEntry).
+    يُحفظ في الكاش هذا الجزء فقط وليس محتوى الملفات كاملاً، وبحد أقصى AUDIT_ARCHIVE_CACHE_MAX_ENTRIES.
+    """
+    archives = list(AuditArchive.objects.filter(month=month).only('pk', 'file').order_by('pk'))
+    key = _slice_key(month, archives, actor_ids)
+    rows = cache.get(key)
+    if rows is None:
+        storage = archive_storage()
+        rows = [
+            data for archive in archives for data in _read_archive(archive, storage)
+            if actor_ids is None or data['actor_id'] in actor_ids
+        ]
+        if len(rows) <= AUDIT_ARCHIVE_CACHE_MAX_ENTRIES:
+            cache.set(key, rows, AUDIT_ARCHIVE_CACHE_TIMEOUT)
+    return rows
+
+
+def _deserialize(data):
+    data = dict(data)
+    app_label, model = data.pop('content_type').split('.')
+    data['content_type_id'] = ContentType.objects.get_by_natural_key(app_label, model).pk
+    data['timestamp'] = parse_datetime(data['timestamp'])
+    return LogEntry(**data)
+
+
+def load_archived_entries(month, actor_ids=None):
+    """
+    يقرأ سجلات شهر من ملفات الأرشيف كسجلات LogEntry غير محفوظة (الأحدث أولاً)،
+    مع تعبئة content_type و actor حتى تُعرض بنفس قالب السجلات الحية.
+    سجلات الفريق في الشهر تُقرأ من الملفات مرة واحدة لكل AUDIT_ARCHIVE_CACHE_TIMEOUT.
+    """
+    entries = [_deserialize(data) for data in _archived_rows(month, actor_ids)]
+
+    actors = User.objects.in_bulk({entry.actor_id for entry in entries if entry.actor_id})
+    for entry in entries:
+        entry.content_type = ContentType.objects.get_for_id(entry.content_type_id)
+        entry.actor = actors.get(entry.actor_id)
+    entries.sort(key=lambda entry: entry.pk, reverse=True)
+    return entries
+
+
+def filter_archived_entries(entries, query=None, action=None, model=None):
+    """
+    نفس فلاتر صفحة سجل التدقيق (البحث، العملية، النموذج) لسجلات الأرشيف في الذاكرة.
+    """
+    tokens = query_tokens(query or '')
+    result = []
+    for entry in entries:
+        if action is not None and entry.action != action:
+            continue
+        if model and entry.content_type.model != model.lower():
+            continue
+        if tokens:
+            actor = entry.actor
+            document = build_document([entry.object_repr] + ([
+                actor.first_name, actor.last_name, actor.username, actor.email, actor.user_id,
+            ] if actor else []))
+            if not all(token in document for token in tokens):
+                continue
+        result.append(entry)
+    return result
@@ -0,0 +1,169 @@
+import json
+import math
+import time
+import tracemalloc
+
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Inspection, User
+from .roles import INSPECTORS, MANAGERS
+
+DEFAULT_ITERATIONS = 20
+DEFAULT_WARMUP = 2
+
+
+def percentile(values, percent):
+    """
+    النسبة المئوية بطريقة أقرب رتبة (nearest rank).
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def benchmark_users():
+    """
+    المستخدمون الذين تُقاس بهم الصفحات: المدير صاحب أكبر فريق، والمفتش صاحب أكبر عدد منشآت،
+    وأحدث تقرير معتمد لقياس توليد PDF.
+    """
+    manager = (
+        User.objects.filter(groups__name=MANAGERS, is_active=True)
+        .annotate(team=Count('supervised_inspectors'))
+        .order_by('-team', 'pk')
+        .first()
+    )
+    inspector = (
+        User.objects.filter(groups__name=INSPECTORS, is_active=True)
+        .annotate(load=Count('companies_inspected'))
+        .order_by('-load', 'pk')
+        .first()
+    )
+    inspection = Inspection.objects.filter(status__in=['approved', 'archived']).order_by('-inspection_date').first()
+    return manager, inspector, inspection
+
+
+def benchmark_endpoints(manager, inspector, inspection):
+    """
+    قائمة (الاسم، المستخدم، الرابط) للصفحات المقاسة.
+    """
+    endpoints = [
+        ('companies_list', manager, reverse('companies_list')),
+        ('companies_list_search', manager, reverse('companies_list') + '?q=النور'),
+        ('inspector_companies_list', inspector, reverse('companies_list')),
+        ('manager_review_list', manager, reverse('manager_review_list')),
+        ('reports_archive', manager, reverse('reports_archive')),
+        ('manager_deleted_reports', manager, reverse('manager_deleted_reports')),
+        ('manager_audit_logs', manager, reverse('manager_audit_logs')),
+        ('notifications_view', manager, reverse('notifications_view')),
+        ('manager_dashboard', manager, reverse('manager_dashboard')),
+    ]
+    if inspection is not None:
+        endpoints.append(('generate_inspection_pdf', manager, reverse('generate_inspection_pdf', args=[inspection.pk])))
+    return [(name, user, url) for name, user, url in endpoints if user is not None]
+
+
+def _request(client, url):
+    response = client.get(url)
+    # الاستجابات التدفقية (PDF / ZIP) تُقرأ كاملة حتى يدخل زمن التوليد في القياس
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        response.close()
+    else:
+        size = len(response.content)
+    return response.status_code, size
+
+
+def measure(client, url, iterations=DEFAULT_ITERATIONS, warmup=DEFAULT_WARMUP):
+    """
+    يقيس صفحة واحدة: زمن الاستجابة (p50 / p95)، عدد الاستعلامات وزمنها، حجم الاستجابة،
+    وأقصى استهلاك للذاكرة (في طلب منفصل لأن tracemalloc يبطئ التنفيذ).
+    """
+    for _ in range(warmup):
+        _request(client, url)
+
+    timings = []
+    query_counts = []
+    query_times = []
+    status = size = None
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            status, size = _request(client, url)
+            timings.append((time.perf_counter() - start) * 1000)
+        query_counts.append(len(context.captured_queries))
+        query_times.append(sum(float(query['time']) for query in context.captured_queries) * 1000)
+
+    tracemalloc.start()
+    try:
+        _request(client, url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'url': url,
+        'status': status,
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'mean_ms': round(sum(timings) / len(timings), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': max(query_counts),
+        'query_ms_p50': round(percentile(query_times, 50), 2),
+        'response_bytes': size,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(iterations=DEFAULT_ITERATIONS, warmup=DEFAULT_WARMUP, only=None, log=None):
+    """
+    يشغل القياس على جميع الصفحات بعميل الاختبار في Django ويعيد النتائج كقاموس قابل للتحويل إلى JSON.
+    """
+    log = log or (lambda message: None)
+    manager, inspector, inspection = benchmark_users()
+    results = {}
+    clients = {}
+    for name, user, url in benchmark_endpoints(manager, inspector, inspection):
+        if only and name not in only:
+            continue
+        client = clients.get(user.pk)
+        if client is None:
+            client = clients[user.pk] = Client()
+            client.force_login(user)
+        log(name)
+        results[name] = measure(client, url, iterations=iterations, warmup=warmup)
+
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'data': {
+            'users': User.objects.count(),
+            'inspections': Inspection.objects.count(),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline):
+    """
+    الفرق بين تشغيلين لكل صفحة: [(الاسم، p50 السابق، p50 الحالي، التغير %، الاستعلامات السابقة، الحالية)].
+    """
+    rows = []
+    for name, result in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        change = (result['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] * 100 if previous['p50_ms'] else None
+        rows.append((name, previous['p50_ms'], result['p50_ms'], change, previous['queries'], result['queries']))
+    return rows
+
+
+def dumps(report):
+    return json.dumps(report, ensure_ascii=False, indent=2)
@@ -0,0 +1,96 @@
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .models import CompanyImage, Inspection, InspectionImage
+from .notifications import get_unread_count
+from .roles import get_user_roles
+
+
+def _stamp(value):
+    return value.isoformat() if value else ''
+
+
+def _related(model, field, aggregate):
+    # قيمة تجميعية لصفوف model المرتبطة بالسجل كاستعلام فرعي داخل استعلام السجل نفسه
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+    return Subquery(rows.annotate(value=aggregate).values('value'))
+
+
+def _images_annotations(model, field):
+    # عدد الصور وما اكتملت معالجته منها (تتغير روابط الصور عند انتهاء توليد النسخ في الخلفية) وآخر وقت رفع
+    return {
+        'images_count': _related(model, field, Count('pk')),
+        'images_processed': _related(model, field, Count('pk', filter=~Q(thumbnail=''))),
+        'images_uploaded': _related(model, field, Max('uploaded_at')),
+    }
+
+
+def with_inspection_version(queryset):
+    """
+    يضيف إلى استعلام التقارير ما يلزم لـ inspection_version دون استعلامات إضافية.
+    """
+    return queryset.annotate(**_images_annotations(InspectionImage, 'inspection'))
+
+
+def with_company_version(queryset):
+    """
+    يضيف إلى استعلام المنشآت ما يلزم لـ company_version دون استعلامات إضافية.
+    حذف التقرير (status='deleted') يغير updated_at، لذا تُحسب جميع تقارير المنشأة.
+    """
+    return queryset.annotate(
+        inspections_count=_related(Inspection, 'company', Count('pk')),
+        inspections_updated=_related(Inspection, 'company', Max('updated_at')),
+        **_images_annotations(CompanyImage, 'company'),
+    )
+
+
+def _images_version(instance):
+    return (instance.images_count, instance.images_processed, _stamp(instance.images_uploaded))
+
+
+def inspection_version(inspection):
+    return (_stamp(inspection.updated_at), _stamp(inspection.company.updated_at), _images_version(inspection))
+
+
+def company_version(company):
+    return (
+        _stamp(company.updated_at), company.inspections_count, _stamp(company.inspections_updated),
+        _images_version(company),
+    )
+
+
+def page_etag(request, version):
+    """
+    ETag لصفحة HTML: نسخة البيانات مع ما يخص المستخدم في القالب الأساسي
+    (الأدوار والاسم وعدد الإشعارات غير المقروءة ورمز CSRF في النماذج).
+    يعيد None إن كانت هناك رسائل بانتظار العرض حتى لا تضيع في استجابة 304.
+    """
+    if len(get_messages(request)):
+        return None
+    user = request.user
+    # get_token ينشئ رمز CSRF إن لم يكن موجوداً (كما يفعل القالب) حتى تبقى ETag ثابتة من أول زيارة
+    get_token(request)
+    parts = (
+        version, user.pk, user.username, user.first_name, user.is_superuser,
+        sorted(get_user_roles(user)), get_unread_count(user), request.META['CSRF_COOKIE'],
+    )
+    return '"%s"' % hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def conditional_response(request, build, etag=None):
+    """
+    يعيد 304 دون استدعاء build (أي دون عرض القالب أو توليد الملف) إن طابق If-None-Match
+    النسخة الحالية، وإلا يعيد build().
+    المتصفح يعيد التحقق في كل زيارة (no-cache) والصفحات خاصة بالمستخدم فلا تُخزن في كاش مشترك.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build()
+    if etag and request.method in ('GET', 'HEAD') and not response.has_header('ETag'):
+        response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
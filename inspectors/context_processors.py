@@ -1,4 +1,4 @@
-from .models import Notification # تأكدي من استيراد موديل Notification من مكان وجوده الصحيح
+from .notifications import get_unread_count
 
 def unread_notifications(request):
     """
@@ -6,11 +6,8 @@ def unread_notifications(request):
     ويضيف هذا العدد كمتغير إلى سياق جميع القوالب.
     """
     if request.user.is_authenticated:
-        # 1. جلب عدد الإشعارات غير المقروءة للمستخدم المسجل دخوله
-        unread_count = Notification.objects.filter(
-            recipient=request.user, 
-            is_read=False
-        ).count()
+        # 1. عدد الإشعارات غير المقروءة (COUNT واحد لكل طلب)
+        unread_count = get_unread_count(request.user)
         
         # 2. إرجاع القيمة في السياق (Context)
         return {
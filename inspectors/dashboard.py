@@ -0,0 +1,184 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+from django.utils import timezone
+
+from .models import (
+    Company, Inspection, User,
+    INSPECTOR_STATUS_CHOICES, INSPECTION_STATUS_CHOICES,
+)
+from .roles import INSPECTORS
+from .rollups import regional_violation_summary
+
+# مدة الاحتفاظ بإحصائيات لوحة المدير في الكاش (بالثواني)
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60)
+
+# حقول قائمة الفحص التي تُحسب لها نسبة المخالفة: الحقل -> القيمة التي تعتبر مخالفة
+VIOLATION_FIELDS = {
+    'license_compliance': 'non_compliant',
+    'unlicensed_workers': 'violation',
+    'penalties_regulation': 'not_exists',
+    'work_regulation': 'not_exists',
+    'worker_file_maintenance': 'violation',
+    'extended_working_hours': 'violation',
+    'consecutive_shifts': 'violation',
+    'weekly_rest_schedule': 'violation',
+}
+
+# التقارير التي تدخل في نسب المخالفات ومتوسط زمن الإنجاز (المسودات والمحذوفة مستبعدة)
+COUNTED_INSPECTION_STATUSES = ['pending_approval', 'approved', 'rejected', 'archived']
+
+
+def _cache_key(manager_pk):
+    return f'manager_dashboard:{manager_pk}'
+
+
+def _assignment_counts(manager):
+    annotations = {
+        status: Count('pk', filter=Q(status_by_inspector=status))
+        for status, _ in INSPECTOR_STATUS_CHOICES
+    }
+    rows = (
+        Company.objects
+        .filter(assigned_to__supervisor=manager)
+        .exclude(status='deleted')
+        .order_by()
+        .values('assigned_to')
+        .annotate(**annotations)
+    )
+    return {row.pop('assigned_to'): row for row in rows}
+
+
+def _inspection_counts(manager):
+    counted = Q(status__in=COUNTED_INSPECTION_STATUSES)
+    annotations = {
+        f'status_{status}': Count('pk', filter=Q(status=status))
+        for status, _ in INSPECTION_STATUS_CHOICES
+    }
+    annotations.update({
+        f'violation_{field}': Count('pk', filter=counted & Q(**{field: value}))
+        for field, value in VIOLATION_FIELDS.items()
+    })
+    annotations['counted'] = Count('pk', filter=counted)
+    # زمن الإنجاز: من إضافة المنشأة (التعيين) إلى إنشاء تقرير التفتيش
+    annotations['avg_turnaround'] = Avg(
+        ExpressionWrapper(F('inspection_date') - F('company__created_at'), output_field=DurationField()),
+        filter=counted,
+    )
+    rows = (
+        Inspection.objects
+        .filter(inspector__supervisor=manager)
+        .order_by()
+        .values('inspector')
+        .annotate(**annotations)
+    )
+    return {row.pop('inspector'): row for row in rows}
+
+
+def _rate(part, whole):
+    return round(100.0 * part / whole, 1) if whole else None
+
+
+def _days(duration):
+    return round(duration.total_seconds() / 86400, 1) if duration is not None else None
+
+
+def _summary(assignments, inspections):
+    counted = inspections.get('counted', 0)
+    return {
+        'assignments': [
+            (label, assignments.get(status, 0)) for status, label in INSPECTOR_STATUS_CHOICES
+        ],
+        'inspections': [
+            (label, inspections.get(f'status_{status}', 0)) for status, label in INSPECTION_STATUS_CHOICES
+        ],
+        'inspections_total': sum(inspections.get(f'status_{status}', 0) for status, _ in INSPECTION_STATUS_CHOICES),
+        'counted': counted,
+        'violation_rates': [
+            (str(Inspection._meta.get_field(field).verbose_name), _rate(inspections.get(f'violation_{field}', 0), counted))
+            for field in VIOLATION_FIELDS
+        ],
+        'avg_turnaround_days': _days(inspections.get('avg_turnaround')),
+    }
+
+
+def build_manager_dashboard(manager):
+    """
+    يحسب إحصائيات جميع المفتشين التابعين للمدير بعدد ثابت من الاستعلامات
+    (المفتشون، التعيينات، التقارير) باستخدام التجميع الشرطي في قاعدة البيانات،
+    وملخص المناطق من جداول التجميع اليومية.
+    """
+    inspectors = list(
+        User.objects
+        .filter(groups__name=INSPECTORS, supervisor=manager)
+        .order_by('last_name', 'first_name', 'pk')
+        .only('pk', 'username', 'first_name', 'last_name', 'is_active')
+    )
+    assignments = _assignment_counts(manager)
+    inspections = _inspection_counts(manager)
+
+    rows = []
+    team_assignments = {}
+    team_inspections = {}
+    weighted = []
+    for inspector in inspectors:
+        inspector_assignments = assignments.get(inspector.pk, {})
+        inspector_inspections = inspections.get(inspector.pk, {})
+        rows.append({
+            'pk': inspector.pk,
+            'name': inspector.get_full_name() or inspector.username,
+            'is_active': inspector.is_active,
+            **_summary(inspector_assignments, inspector_inspections),
+        })
+        for key, value in inspector_assignments.items():
+            team_assignments[key] = team_assignments.get(key, 0) + value
+        for key, value in inspector_inspections.items():
+            if key == 'avg_turnaround':
+                if value is not None:
+                    weighted.append((value, inspector_inspections['counted']))
+                continue
+            team_inspections[key] = team_inspections.get(key, 0) + value
+
+    # متوسط الفريق موزون بعدد تقارير كل مفتش
+    if weighted:
+        team_inspections['avg_turnaround'] = sum((d * n for d, n in weighted), timedelta()) / sum(n for _, n in weighted)
+
+    regions = [
+        {
+            'region': region['region'] or '-',
+            'inspections': region['inspections'],
+            'violation_rates': [
+                (str(Inspection._meta.get_field(field).verbose_name), _rate(region['values'].get((field, value), 0), region['inspections']))
+                for field, value in VIOLATION_FIELDS.items()
+            ],
+        }
+        for region in regional_violation_summary(inspectors=[inspector.pk for inspector in inspectors])
+    ]
+
+    return {
+        'inspectors': rows,
+        'totals': _summary(team_assignments, team_inspections),
+        'regions': regions,
+        'generated_at': timezone.now(),
+    }
+
+
+def get_manager_dashboard(manager):
+    """
+    يعيد إحصائيات لوحة المدير من الكاش (لمدة قصيرة) أو يحسبها.
+    """
+    key = _cache_key(manager.pk)
+    data = cache.get(key)
+    if data is None:
+        data = build_manager_dashboard(manager)
+        cache.set(key, data, DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+def get_inspector_statistics(manager, inspector_pk):
+    for row in get_manager_dashboard(manager)['inspectors']:
+        if row['pk'] == inspector_pk:
+            return row
+    return None
@@ -0,0 +1,122 @@
+import csv
+import datetime
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Inspection, INSPECTION_CHECKLIST_FIELDS
+
+# حجم الدفعة عند قراءة الصفوف من قاعدة البيانات أثناء التصدير
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# النص الذي يبدأ بأحد هذه الرموز يفسره Excel كصيغة (CSV/formula injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# أعمدة التصدير: (مسار الحقل، عنوان العمود)
+INSPECTION_EXPORT_COLUMNS = [
+    ('pk', 'رقم التقرير'),
+    ('company__company_name', 'اسم المنشأة'),
+    ('company__company_number', 'رقم المنشأة'),
+    ('company__region', 'اسم المنطقة'),
+    ('company__establishment_type', 'المنشأة عبارة عن'),
+    ('inspector__username', 'اسم المستخدم للمفتش'),
+    ('inspector__first_name', 'الاسم الأول للمفتش'),
+    ('inspector__last_name', 'اسم العائلة للمفتش'),
+    ('inspector__user_id', 'رقم هوية المفتش'),
+    ('inspection_date', 'تاريخ التفتيش'),
+    ('updated_at', 'تاريخ التحديث'),
+    ('status', 'الحالة'),
+] + [
+    (name, str(Inspection._meta.get_field(name).verbose_name))
+    for name in INSPECTION_CHECKLIST_FIELDS
+]
+
+
+def _choice_labels():
+    # قيم الاختيارات تُصدّر بعناوينها العربية بدلاً من القيم التقنية
+    labels = {}
+    for lookup, _ in INSPECTION_EXPORT_COLUMNS:
+        model = Inspection
+        parts = lookup.split('__')
+        for part in parts[:-1]:
+            model = model._meta.get_field(part).related_model
+        if parts[-1] == 'pk':
+            continue
+        field = model._meta.get_field(parts[-1])
+        if field.choices:
+            labels[lookup] = dict(field.choices)
+    return labels
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # الفاصلة العليا تجعل الخلية نصاً عادياً ولا تظهر عند العرض
+        return "'" + value
+    return value
+
+
+def iter_export_rows(queryset):
+    """
+    يولد صفوف التصدير (بما فيها صف العناوين) عبر values_list و iterator
+    بحيث تبقى الذاكرة ثابتة مهما كان عدد النتائج.
+    """
+    lookups = [lookup for lookup, _ in INSPECTION_EXPORT_COLUMNS]
+    labels = _choice_labels()
+    choice_columns = [(index, labels[lookup]) for index, lookup in enumerate(lookups) if lookup in labels]
+
+    yield [header for _, header in INSPECTION_EXPORT_COLUMNS]
+    for row in queryset.values_list(*lookups).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row = list(row)
+        for index, choices in choice_columns:
+            row[index] = choices.get(row[index], row[index])
+        yield [_format_value(value) for value in row]
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _stream_csv(queryset):
+    writer = csv.writer(_Echo())
+    # BOM حتى يتعرف Excel على الترميز العربي
+    yield '\ufeff'
+    for row in iter_export_rows(queryset):
+        yield writer.writerow(row)
+
+
+def export_inspections(queryset, export_format, filename):
+    """
+    يعيد استجابة تصدير للتقارير بصيغة CSV (تدفقية) أو XLSX (وضع الكتابة فقط).
+    """
+    stamp = timezone.localtime().strftime('%Y%m%d_%H%M')
+    if export_format == 'xlsx':
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        for row in iter_export_rows(queryset):
+            sheet.append(row)
+        # الملف يُكتب على القرص ثم يُرسل على أجزاء
+        output = tempfile.TemporaryFile()
+        workbook.save(output)
+        output.seek(0)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f'{filename}_{stamp}.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+    response = StreamingHttpResponse(_stream_csv(queryset), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}_{stamp}.csv"'
+    return response
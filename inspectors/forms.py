@@ -3,8 +3,9 @@ from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db.backends.base.operations import BaseDatabaseOperations
 from django.contrib.auth.forms import SetPasswordForm
-from django.forms import formset_factory, inlineformset_factory
+from django.forms import BaseInlineFormSet, formset_factory, inlineformset_factory
 from .models import Company, Inspection, InspectionImage, CompanyImage, Notification
 from django.contrib.auth.forms import UserCreationForm
 from django.core.mail import send_mail
@@ -16,6 +17,11 @@ from django.core.mail import EmailMessage
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
+from .images import attach_stored_image
+from .outbox import enqueue_email
+from .typeahead import inspector_label, manager_inspectors
+from .uploads import UploadError, claim_upload, find_upload
+from django.urls import reverse_lazy
 
 
 User = get_user_model()
@@ -193,8 +199,7 @@ class InspectorCreationForm(UserCreationForm):
                 'token': default_token_generator.make_token(user),
             })
             
-            email = EmailMessage(subject, message, to=[user.email])
-            email.send()
+            enqueue_email(subject, message, [user.email])
             
         return user
 
@@ -294,9 +299,61 @@ class UserProfileEditForm(forms.ModelForm):
 # قائمة المستخدمين المفتشين
 # INSPECTOR_CHOICES = [(user.id, user.username) for user in User.objects.filter(groups__name='Inspectors')]
 
+def _pk_or_none(model, value):
+    """
+    يحول القيمة المرسلة إلى رقم سجل صالح للاستعلام، أو None إن لم تكن رقماً صحيحاً
+    أو كانت خارج مدى عمود المعرف (تسبب OverflowError/DataError بدلاً من خطأ تحقق).
+    """
+    pk_field = model._meta.pk
+    try:
+        pk = pk_field.to_python(value)
+    except ValidationError:
+        return None
+    # المدى القياسي لأعمدة الأرقام (SQLite لا يعيد مدى من connection.ops)
+    low, high = BaseDatabaseOperations.integer_field_ranges.get(pk_field.get_internal_type(), (None, None))
+    if pk is None or (low is not None and pk < low) or (high is not None and pk > high):
+        return None
+    return pk
+
+
+class InspectorTypeaheadWidget(forms.Select):
+    """
+    قائمة اختيار المفتش بدون تضمين جميع المفتشين في الصفحة:
+    يُعرض الخيار المحدد فقط، وباقي الخيارات تُجلب من واجهة الإكمال التلقائي أثناء الكتابة.
+    """
+    template_name = 'inspectors/widgets/inspector_typeahead.html'
+
+    def __init__(self, attrs=None):
+        super().__init__(attrs)
+        self.attrs.setdefault('data-typeahead-url', reverse_lazy('inspector_typeahead'))
+
+    def optgroups(self, name, value, attrs=None):
+        # القيمة قد تكون من POST غير صالح (مثلاً "abc") عند إعادة عرض النموذج بأخطائه
+        model = self.choices.queryset.model
+        selected = [pk for pk in (_pk_or_none(model, v) for v in value if v not in (None, '')) if pk is not None]
+        options = [self.create_option(name, '', '---------', not selected, 0, attrs=attrs)]
+        if selected:
+            # استعلام واحد للخيار المحدد فقط بدلاً من المرور على جميع المفتشين
+            for index, user in enumerate(self.choices.queryset.filter(pk__in=selected), start=1):
+                options.append(self.create_option(name, user.pk, self.choices.field.label_from_instance(user), True, index, attrs=attrs))
+        return [(None, options, 0)]
+
+
+class InspectorChoiceField(forms.ModelChoiceField):
+    widget = InspectorTypeaheadWidget
+
+    def to_python(self, value):
+        if value not in self.empty_values and _pk_or_none(self.queryset.model, value) is None:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+        return super().to_python(value)
+
+    def label_from_instance(self, obj):
+        return inspector_label(obj)
+
+
 class ManagerCompanyForm(forms.ModelForm):
     # المدير هو من يضيف البيانات الأولية
-    assigned_to = forms.ModelChoiceField(
+    assigned_to = InspectorChoiceField(
         queryset=User.objects.filter(groups__name='Inspectors'),
         required=True,
         label='تعيين مفتش'
@@ -317,6 +374,12 @@ class ManagerCompanyForm(forms.ModelForm):
             'assigned_to': 'تعيين مفتش',
         }
 
+    def __init__(self, *args, manager=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if manager is not None and 'assigned_to' in self.fields:
+            # الاختيار محصور في المفتشين التابعين للمدير
+            self.fields['assigned_to'].queryset = manager_inspectors(manager, include_pk=self.instance.assigned_to_id)
+
 class InspectorCompanyForm(forms.ModelForm):
     # المفتش يكمل البيانات الميدانية
     class Meta:
@@ -350,6 +413,15 @@ class InspectorCompanyForm(forms.ModelForm):
                 self.fields[field].widget.attrs['readonly'] = True
 
 
+# نموذج رفع ملف استيراد المنشآت (CSV / XLSX)
+class CompanyImportForm(forms.Form):
+    file = forms.FileField(
+        label='ملف المنشآت (CSV أو XLSX)',
+        widget=forms.ClearableFileInput(attrs={'accept': '.csv,.xlsx'}),
+    )
+    dry_run = forms.BooleanField(label='تحقق فقط دون حفظ', required=False)
+
+
 # النموذج الجديد لإضافة سبب الرفض
 class DeclineReasonForm(forms.Form):
     reason = forms.CharField(
@@ -359,6 +431,12 @@ class DeclineReasonForm(forms.Form):
     )
 
 
+class TeamNotificationForm(forms.Form):
+    title = forms.CharField(label="العنوان", max_length=255)
+    message = forms.CharField(label="الرسالة", widget=forms.Textarea(attrs={'rows': 3}))
+    send_email = forms.BooleanField(label="إرسال بالبريد الإلكتروني أيضاً", required=False)
+
+
 class CompanyImageForm(forms.ModelForm):
     # هذا النموذج خاص بحقول الصورة
     class Meta:
@@ -447,10 +525,66 @@ class InspectionForm(forms.ModelForm):
             }
         }
 
+class InspectionImageForm(forms.ModelForm):
+    # معرف صورة رُفعت مسبقاً على أجزاء (api/uploads/) بدلاً من إرسال الملف مع النموذج
+    upload = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
+    class Meta:
+        model = InspectionImage
+        fields = ['image', 'description']
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        self.photo_upload = None
+        self.fields['image'].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload_id = cleaned_data.get('upload')
+        if upload_id:
+            self.photo_upload = find_upload(self.user, upload_id, self.instance.inspection_id) if self.user else None
+            if self.photo_upload is None:
+                self.add_error('upload', 'الصورة المرفوعة غير موجودة أو لم يكتمل رفعها. يرجى اختيارها مرة أخرى.')
+        elif not cleaned_data.get('image'):
+            self.add_error('image', 'يرجى اختيار صورة.')
+        return cleaned_data
+
+    def save(self, commit=True):
+        if self.photo_upload is not None:
+            # يُطالب بعملية الرفع من جديد مع القفل داخل معاملة الحفظ، فطلب آخر قد يكون ربطها بعد clean()
+            upload = claim_upload(self.user, self.photo_upload.pk, self.instance.inspection_id)
+            if upload is None:
+                raise UploadError('الصورة المرفوعة استُخدمت في تقرير آخر أو لم تعد موجودة. يرجى اختيارها مرة أخرى.', status=409)
+            attach_stored_image(self.instance, upload.blob)
+            # مرجع الملف في التخزين ينتقل من عملية الرفع إلى صورة التقرير
+            upload.delete()
+            self.photo_upload = None
+        return super().save(commit)
+
+
+class BaseInspectionImageFormSet(BaseInlineFormSet):
+    def clean(self):
+        super().clean()
+        # نفس عملية الرفع في أكثر من نموذج تعني صورتين لملف واحد
+        seen = set()
+        for form in self.forms:
+            if not hasattr(form, 'cleaned_data') or self._should_delete_form(form):
+                continue
+            upload_id = form.cleaned_data.get('upload')
+            if not upload_id:
+                continue
+            if upload_id in seen:
+                form.add_error('upload', 'تم اختيار هذه الصورة أكثر من مرة.')
+            seen.add(upload_id)
+
+
 # هذا هو الـ Formset الذي يربط التقرير بصوره
 InspectionImageFormSet = inlineformset_factory(
     Inspection,
     InspectionImage,
+    form=InspectionImageForm,
+    formset=BaseInspectionImageFormSet,
     fields=('image', 'description'),
     extra=1,
     can_delete=True
@@ -0,0 +1,252 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+from .storage import media_storage
+
+logger = logging.getLogger(__name__)
+
+# أقصى بُعد للصورة الأصلية بعد المعالجة (صور الجوال تصل إلى 4000 بكسل وأكثر)
+IMAGE_ORIGINAL_MAX_DIMENSION = getattr(settings, 'IMAGE_ORIGINAL_MAX_DIMENSION', 2560)
+IMAGE_ORIGINAL_QUALITY = getattr(settings, 'IMAGE_ORIGINAL_QUALITY', 88)
+# نسخة العرض (عند فتح الصورة) والصورة المصغرة (في صفحات التفاصيل)
+IMAGE_DISPLAY_MAX_DIMENSION = getattr(settings, 'IMAGE_DISPLAY_MAX_DIMENSION', 1600)
+IMAGE_THUMBNAIL_MAX_DIMENSION = getattr(settings, 'IMAGE_THUMBNAIL_MAX_DIMENSION', 400)
+IMAGE_RENDITION_QUALITY = getattr(settings, 'IMAGE_RENDITION_QUALITY', 80)
+# صيغة النسخ المولدة: WEBP إن كان Pillow يدعمها وإلا JPEG
+IMAGE_RENDITION_FORMAT = getattr(settings, 'IMAGE_RENDITION_FORMAT', 'WEBP')
+# توليد النسخ في خيوط خلفية بعد حفظ الطلب (تُعطّل لتتم مباشرة بعد الحفظ)، أما تنظيف الأصل فيتم دائماً عند الحفظ
+IMAGE_BACKGROUND_PROCESSING = getattr(settings, 'IMAGE_BACKGROUND_PROCESSING', True)
+IMAGE_PROCESSING_WORKERS = getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2)
+
+RENDITIONS_DIR = 'renditions'
+
+_executor = ThreadPoolExecutor(max_workers=IMAGE_PROCESSING_WORKERS, thread_name_prefix='image-processing')
+
+
+def rendition_format():
+    if IMAGE_RENDITION_FORMAT.upper() == 'WEBP' and features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def rendition_name(name, suffix, extension):
+    """
+    company_images/photo.jpg -> company_images/renditions/photo-thumb.webp
+    """
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, RENDITIONS_DIR, f'{stem}-{suffix}.{extension}')
+
+
+def _encode(image, image_format, quality, icc_profile=None):
+    """
+    يحفظ الصورة دون بيانات EXIF (الموقع الجغرافي ونوع الجهاز) مع الإبقاء على ملف الألوان.
+    """
+    if image_format in ('JPEG', 'MPO'):
+        image_format = 'JPEG'
+        if image.mode not in ('RGB', 'L'):
+            image = _flatten(image)
+    options = {}
+    if image_format in ('JPEG', 'WEBP'):
+        options['quality'] = quality
+    if image_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        options['method'] = 4
+    elif image_format == 'PNG':
+        options['optimize'] = True
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    output = io.BytesIO()
+    image.save(output, format=image_format, **options)
+    return output.getvalue()
+
+
+def _flatten(image):
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _bounded(image, max_dimension):
+    if max(image.size) <= max_dimension:
+        return image
+    image = image.copy()
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    return image
+
+
+def _prepare(data):
+    # الصورة بعد التدوير (وتصغير الأصل عند الحاجة)، ومحتوى الأصل النظيف أو None
+    with Image.open(io.BytesIO(data)) as source:
+        original_format = source.format
+        has_exif = bool(source.getexif())
+        # فك ترميز JPEG بدقة مخفضة مباشرة (أسرع بكثير من فك الصورة كاملة ثم تصغيرها)
+        if original_format == 'JPEG':
+            source.draft('RGB', (IMAGE_ORIGINAL_MAX_DIMENSION, IMAGE_ORIGINAL_MAX_DIMENSION))
+        icc_profile = source.info.get('icc_profile')
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        image = _flatten(image)
+
+    original = None
+    oversized = max(image.size) > IMAGE_ORIGINAL_MAX_DIMENSION
+    if has_exif or oversized:
+        image = _bounded(image, IMAGE_ORIGINAL_MAX_DIMENSION)
+        original = _encode(image, original_format or 'JPEG', IMAGE_ORIGINAL_QUALITY, icc_profile)
+    return image, original, icc_profile
+
+
+def sanitize_original(data):
+    """
+    تدوير الصورة حسب اتجاه الكاميرا، حذف EXIF (الموقع الجغرافي ونوع الجهاز)، وتصغيرها إلى حد معقول.
+    يعيد المحتوى الجديد، أو None إن لم تحتج الصورة لإعادة حفظ.
+    """
+    return _prepare(data)[1]
+
+
+def build_renditions(data):
+    """
+    يولد نسخة العرض والصورة المصغرة. الأصل يُنظف عادةً عند الحفظ (انظر image_pre_save)،
+    ويُعاد هنا فقط للصور الأقدم التي حُفظت قبل ذلك.
+    يعيد (محتوى الأصل أو None إن لم يحتج لإعادة حفظ، نسخة العرض، المصغرة، امتداد النسخ).
+    """
+    image, original, icc_profile = _prepare(data)
+
+    image_format, extension = rendition_format()
+    if image_format == 'JPEG':
+        image = _flatten(image)
+    display = _encode(_bounded(image, IMAGE_DISPLAY_MAX_DIMENSION), image_format, IMAGE_RENDITION_QUALITY, icc_profile)
+    thumbnail = _encode(_bounded(image, IMAGE_THUMBNAIL_MAX_DIMENSION), image_format, IMAGE_RENDITION_QUALITY, icc_profile)
+    return original, display, thumbnail, extension
+
+
+def process_image(model, pk, stale=()):
+    """
+    يولد نسخ الصورة ويحدّث السجل. stale ملفات الصورة السابقة (عند الاستبدال) وتُحرر مراجعها أولاً.
+    إن استُبدلت الصورة أثناء المعالجة تُحرر النسخ الناتجة لأن المعالجة الجديدة ستولد غيرها.
+    """
+    for name in stale:
+        media_storage.delete(name)
+
+    instance = model.objects.filter(pk=pk).only('pk', 'image', 'thumbnail', 'display').first()
+    if instance is None or not instance.image:
+        return False
+    name = instance.image.name
+    with media_storage.open(name, 'rb') as f:
+        data = f.read()
+    original, display, thumbnail, extension = build_renditions(data)
+
+    new_name = name
+    created = []
+    released = [instance.display.name, instance.thumbnail.name]
+    if original is not None:
+        new_name = media_storage.save(name, ContentFile(original))
+        created.append(new_name)
+        released.append(name)
+    created += [
+        media_storage.save(rendition_name(new_name, 'display', extension), ContentFile(display)),
+        media_storage.save(rendition_name(new_name, 'thumb', extension), ContentFile(thumbnail)),
+    ]
+    updated = model.objects.filter(pk=pk, image=name).update(image=new_name, display=created[-2], thumbnail=created[-1])
+    # كل حفظ في التخزين يضيف مرجعاً للملف، فيُحرر مرجع كل ملف لم يعد السجل يشير إليه
+    for old in (created if not updated else released):
+        if old:
+            media_storage.delete(old)
+    return bool(updated)
+
+
+def _process_safely(model, pk, stale):
+    try:
+        process_image(model, pk, stale)
+    except Exception:
+        logger.exception("فشلت معالجة الصورة %s رقم %s", model.__name__, pk)
+
+
+def _process_in_background(model, pk, stale):
+    close_old_connections()
+    try:
+        _process_safely(model, pk, stale)
+    finally:
+        close_old_connections()
+
+
+def _schedule(model, pk, stale):
+    if IMAGE_BACKGROUND_PROCESSING:
+        _executor.submit(_process_in_background, model, pk, stale)
+    else:
+        _process_safely(model, pk, stale)
+
+
+def _sanitize_upload(instance):
+    """
+    ينظف الصورة الجديدة قبل حفظها، فلا يُكتب في التخزين ملف يحمل الموقع الجغرافي
+    حتى لو لم تكتمل المعالجة في الخلفية (مثلاً في بيئة serverless).
+    """
+    image = instance.image
+    try:
+        if image._committed:
+            # ملف محفوظ مسبقاً (رفع مجزأ): يُستبدل بنسخة نظيفة ويُحرر مرجع الأصل
+            with media_storage.open(image.name, 'rb') as f:
+                cleaned = sanitize_original(f.read())
+            if cleaned is not None:
+                # الأصل يبقى حتى نجاح المعاملة، فعملية الرفع تبقى صالحة إن فشل الحفظ
+                transaction.on_commit(lambda name=image.name: media_storage.delete(name))
+                instance.image = media_storage.save(image.name, ContentFile(cleaned))
+        else:
+            image.seek(0)
+            cleaned = sanitize_original(image.read())
+            if cleaned is not None:
+                instance.image = ContentFile(cleaned, name=os.path.basename(image.name))
+    except Exception:
+        # ملف لا يُقرأ كصورة: يُحفظ كما هو وتفشل معالجته لاحقاً مع تسجيل الخطأ
+        logger.exception("تعذر تنظيف الصورة %s قبل حفظها", image.name)
+
+
+def attach_stored_image(instance, name):
+    """
+    يربط بالسجل ملفاً محفوظاً مسبقاً في التخزين (مثل صورة مرفوعة على أجزاء)
+    وتُنظف وتُعالج عند الحفظ كأي صورة مرفوعة. مرجع الملف ينتقل إلى السجل.
+    """
+    instance.image = name
+    instance._image_attached = True
+
+
+def image_pre_save(sender, instance, **kwargs):
+    # الملف الجديد لم يُحفظ في التخزين بعد، فنعرف هنا أن الصورة رُفعت أو استُبدلت
+    if instance.image and (not instance.image._committed or instance.__dict__.pop('_image_attached', False)):
+        _sanitize_upload(instance)
+        instance._image_uploaded = True
+        stale = [instance.display.name, instance.thumbnail.name]
+        if instance.pk:
+            stale.append(sender.objects.filter(pk=instance.pk).values_list('image', flat=True).first())
+        instance._stale_files = tuple(name for name in stale if name)
+        # حتى تنتهي المعالجة تُعرض الصورة الأصلية بدلاً من نسخ الصورة السابقة
+        instance.display = ''
+        instance.thumbnail = ''
+
+
+def image_post_save(sender, instance, **kwargs):
+    if getattr(instance, '_image_uploaded', False):
+        instance._image_uploaded = False
+        stale = getattr(instance, '_stale_files', ())
+        transaction.on_commit(lambda: _schedule(sender, instance.pk, stale))
+
+
+def image_post_delete(sender, instance, **kwargs):
+    # حذف الصورة (مثلاً من نموذج الصور) يحرر مراجع ملفاتها، ولا يُحذف الملف إلا إن لم يشر إليه صف آخر
+    names = [name for name in (instance.image.name, instance.display.name, instance.thumbnail.name) if name]
+    if names:
+        transaction.on_commit(lambda: [media_storage.delete(name) for name in names])
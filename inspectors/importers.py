@@ -0,0 +1,219 @@
+import codecs
+import csv
+import io
+import os
+import zipfile
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .forms import ManagerCompanyForm
+from .models import Company
+from .notifications import dispatch_notifications
+from .outbox import enqueue_email
+from .search import reindex
+from .typeahead import manager_inspectors
+
+User = get_user_model()
+
+# أعمدة ملف الاستيراد: تُقبل أسماء الحقول التقنية أو العناوين العربية
+IMPORT_FIELDS = ['company_name', 'company_number', 'region', 'street_name', 'building_number', 'assigned_to']
+HEADER_ALIASES = {field: field for field in IMPORT_FIELDS}
+HEADER_ALIASES.update({str(label): field for field, label in ManagerCompanyForm.Meta.labels.items()})
+
+DEFAULT_BATCH_SIZE = 500
+# حجم القراءة عند التحقق من ترميز ملف CSV
+ENCODING_CHECK_BLOCK_SIZE = 64 * 1024
+
+
+class ImportFileError(Exception):
+    pass
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.processed = 0
+        # قائمة من (رقم الصف في الملف، {الحقل: [الأخطاء]})
+        self.errors = []
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+
+def iter_csv_rows(fileobj):
+    """
+    يقرأ ملف CSV صفاً بصف دون تحميله كاملاً في الذاكرة.
+    """
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        check_utf8(fileobj)
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        return
+    yield header
+    for row in reader:
+        yield row
+
+
+def check_utf8(fileobj):
+    """
+    يتحقق أن الملف بترميز UTF-8 قبل الاستيراد (قراءة على أجزاء ثم العودة للبداية)، حتى لا يفشل
+    الاستيراد في منتصفه بعد حفظ دفعات منه. ملفات Excel العربية تُحفظ غالباً بترميز Windows-1256.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    try:
+        for block in iter(lambda: fileobj.read(ENCODING_CHECK_BLOCK_SIZE), b''):
+            decoder.decode(block)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        raise ImportFileError('ترميز الملف غير مدعوم. يرجى حفظ ملف CSV بترميز UTF-8.')
+    finally:
+        fileobj.seek(0)
+
+
+def iter_xlsx_rows(fileobj):
+    """
+    يقرأ أول ورقة من ملف XLSX في وضع القراءة فقط (تدفقي).
+    """
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, ValueError):
+        raise ImportFileError('ملف XLSX تالف أو غير صالح.')
+    try:
+        sheet = workbook.worksheets[0]
+        for row in sheet.iter_rows(values_only=True):
+            yield ['' if value is None else str(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def iter_rows(fileobj, filename):
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        return iter_csv_rows(fileobj)
+    if extension in ('.xlsx', '.xlsm'):
+        return iter_xlsx_rows(fileobj)
+    raise ImportFileError('صيغة الملف غير مدعومة. يرجى رفع ملف CSV أو XLSX.')
+
+
+def build_inspector_lookup(manager):
+    """
+    خريطة واحدة لمفتشي المدير: اسم المستخدم / البريد / رقم الهوية -> المستخدم.
+    تُجلب باستعلام واحد بدلاً من استعلام لكل صف.
+    """
+    lookup = {}
+    for inspector in manager_inspectors(manager):
+        for key in (inspector.username, inspector.email, inspector.user_id):
+            if key:
+                lookup.setdefault(key.strip().lower(), inspector)
+    return lookup
+
+
+def _row_errors(form):
+    return {field: [str(e) for e in errors] for field, errors in form.errors.items()}
+
+
+def import_companies(fileobj, filename, manager, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, notify=True):
+    """
+    يستورد المنشآت من ملف CSV/XLSX مع التحقق من كل صف بقواعد ManagerCompanyForm.
+    تُحفظ الصفوف الصحيحة على دفعات بـ bulk_create، والصفوف الخاطئة تُسجل في التقرير.
+    """
+    report = ImportReport()
+    rows = iter_rows(fileobj, filename)
+
+    header = next(rows, None)
+    if not header:
+        raise ImportFileError('الملف فارغ.')
+    columns = [HEADER_ALIASES.get(str(name).strip()) for name in header]
+    missing = [field for field in IMPORT_FIELDS if field not in columns]
+    if missing:
+        raise ImportFileError(f"أعمدة مفقودة في الملف: {', '.join(missing)}")
+
+    inspectors = build_inspector_lookup(manager)
+    batch = []
+    assigned = defaultdict(int)
+
+    def flush():
+        if not batch:
+            return
+        if not dry_run:
+            with transaction.atomic():
+                Company.objects.bulk_create(batch)
+                # bulk_create لا يرسل post_save، لذا تُفهرس الدفعة للبحث مباشرة
+                reindex('company', Company.objects.filter(pk__in=[company.pk for company in batch if company.pk]))
+                if notify:
+                    dispatch_notifications(
+                        [
+                            (
+                                company.assigned_to,
+                                "تم تعيين منشأة جديدة لك",
+                                f"قام المدير {manager.username} بتعيين منشأة {company.company_name} لك. يرجى تأكيد الاستلام.",
+                                company,
+                            )
+                            for company in batch
+                        ],
+                        sender=manager,
+                        send_email=False,
+                    )
+        for company in batch:
+            assigned[company.assigned_to] += 1
+        report.created += len(batch)
+        batch.clear()
+
+    # الصف الأول هو العناوين، لذا تبدأ البيانات من الصف 2
+    for line_number, values in enumerate(rows, start=2):
+        if not any(str(value).strip() for value in values):
+            continue
+        report.processed += 1
+        data = {field: str(value).strip() for field, value in zip(columns, values) if field}
+
+        form = ManagerCompanyForm(data=data)
+        # المفتش يُحل من الخريطة المحملة مسبقاً بدلاً من استعلام ModelChoiceField لكل صف
+        del form.fields['assigned_to']
+        inspector = inspectors.get(data.get('assigned_to', '').lower())
+        valid = form.is_valid()
+        errors = _row_errors(form) if not valid else {}
+        if inspector is None:
+            errors['assigned_to'] = ['لا يوجد مفتش مطابق لهذه القيمة.']
+        if errors:
+            report.errors.append((line_number, errors))
+            continue
+
+        company = form.save(commit=False)
+        company.manager = manager
+        company.assigned_to = inspector
+        company.status_by_inspector = 'assigned'
+        # bulk_create لا يستدعي save()، لذا تُحسب الأعمدة المطبّعة هنا
+        company.set_normalized_fields()
+        batch.append(company)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    if notify and not dry_run:
+        # رسالة بريد واحدة لكل مفتش تلخص المنشآت المعينة له
+        for inspector, count in assigned.items():
+            enqueue_email(
+                f"تم تعيين {count} منشأة جديدة لك",
+                f"مرحباً {inspector.username},\n\nتم تعيين {count} منشأة جديدة لك لإجراء التفتيش عليها.\n\nيرجى تسجيل الدخول إلى النظام لتأكيد الاستلام والبدء في العمل.",
+                [inspector.email],
+            )
+    return report
+
+
+def write_error_report(report, fileobj):
+    writer = csv.writer(fileobj)
+    writer.writerow(['row', 'field', 'error'])
+    for line_number, errors in report.errors:
+        for field, messages in errors.items():
+            for message in messages:
+                writer.writerow([line_number, field, message])
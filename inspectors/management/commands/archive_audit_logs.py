@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inspectors.audit_archive import AUDIT_ARCHIVE_BATCH_SIZE, AUDIT_LOG_RETENTION_DAYS, archive_logs
+
+
+class Command(BaseCommand):
+    help = 'ينقل سجلات التدقيق الأقدم من مدة الاحتفاظ إلى ملفات شهرية مضغوطة ويحذفها من قاعدة البيانات.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=AUDIT_LOG_RETENTION_DAYS,
+                            help=f'مدة الاحتفاظ بالأيام (الافتراضي {AUDIT_LOG_RETENTION_DAYS})')
+        parser.add_argument('--batch-size', type=int, default=AUDIT_ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='عرض عدد السجلات لكل شهر دون أرشفة')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('مدة الاحتفاظ يجب أن تكون يوماً واحداً على الأقل.')
+
+        before = timezone.now() - timedelta(days=options['days'])
+        summary = archive_logs(before=before, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        for month, count in summary:
+            self.stdout.write(f"{month:%Y-%m}: {count} سجل")
+        total = sum(count for _, count in summary)
+        if options['dry_run']:
+            self.stdout.write(f"سيتم أرشفة {total} سجل أقدم من {before:%Y-%m-%d}.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"تمت أرشفة {total} سجل أقدم من {before:%Y-%m-%d}."))
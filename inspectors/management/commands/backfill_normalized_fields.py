@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from inspectors.models import Company, Inspection, User
+
+
+class Command(BaseCommand):
+    help = 'يملأ الأعمدة المطبّعة (اسم المنشأة، المنطقة، اسم المستخدم) للسجلات الموجودة.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def _backfill(self, queryset, fields, batch_size):
+        count = 0
+        batch = []
+        for obj in queryset.order_by('pk').iterator(chunk_size=batch_size):
+            before = [getattr(obj, field) for field in fields]
+            obj.set_normalized_fields()
+            if [getattr(obj, field) for field in fields] != before:
+                batch.append(obj)
+            if len(batch) >= batch_size:
+                queryset.model.objects.bulk_update(batch, fields)
+                count += len(batch)
+                batch = []
+        if batch:
+            queryset.model.objects.bulk_update(batch, fields)
+            count += len(batch)
+        return count
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        companies = self._backfill(
+            Company.objects.only('pk', 'company_name', 'region', 'company_name_normalized', 'region_normalized'),
+            ['company_name_normalized', 'region_normalized'],
+            batch_size,
+        )
+        self.stdout.write(f"المنشآت: تم تحديث {companies}")
+
+        users = self._backfill(
+            User.objects.only('pk', 'first_name', 'last_name', 'name_normalized'),
+            ['name_normalized'],
+            batch_size,
+        )
+        self.stdout.write(f"المستخدمون: تم تحديث {users}")
+
+        # التقارير تأخذ القيمة من المنشأة مباشرة بتحديث واحد
+        normalized_name = Company.objects.filter(pk=OuterRef('company_id')).values('company_name_normalized')[:1]
+        inspections = Inspection.objects.exclude(
+            company_name_normalized=Subquery(normalized_name)
+        ).update(company_name_normalized=Subquery(normalized_name))
+        self.stdout.write(f"التقارير: تم تحديث {inspections}")
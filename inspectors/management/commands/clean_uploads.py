@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inspectors.uploads import UPLOAD_EXPIRY_HOURS, clean_expired_uploads
+
+
+class Command(BaseCommand):
+    help = f'يحذف عمليات رفع الصور التي لم تُربط بتقرير خلال {UPLOAD_EXPIRY_HOURS} ساعة وملفاتها المؤقتة.'
+
+    def handle(self, *args, **options):
+        removed = clean_expired_uploads()
+        self.stdout.write(f"تم حذف {removed} عملية رفع منتهية.")
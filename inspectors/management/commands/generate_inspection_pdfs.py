@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from inspectors.pdf import PDF_BATCH_WORKERS, batch_queryset, render_merged_pdf, stream_zip
+
+
+class Command(BaseCommand):
+    help = 'يولد ملفات PDF لمجموعة من تقارير التفتيش ويجمعها في ملف ZIP أو ملف PDF واحد.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='مسار ملف الإخراج (.zip أو .pdf).')
+        parser.add_argument('--status', default='archived')
+        parser.add_argument('--region')
+        parser.add_argument('--company', help='بداية اسم المنشأة.')
+        parser.add_argument('--start-date', help='YYYY-MM-DD')
+        parser.add_argument('--end-date', help='YYYY-MM-DD')
+        parser.add_argument('--workers', type=int, default=PDF_BATCH_WORKERS)
+
+    def handle(self, *args, **options):
+        dates = {}
+        for key in ('start_date', 'end_date'):
+            if options[key]:
+                dates[key] = parse_date(options[key])
+                if dates[key] is None:
+                    raise CommandError(f"صيغة التاريخ غير صحيحة: {options[key]}")
+
+        inspections = batch_queryset(
+            status=options['status'], region=options['region'], company_name=options['company'], **dates,
+        )
+        count = inspections.count()
+
+        with open(options['output'], 'wb') as output:
+            if options['output'].lower().endswith('.pdf'):
+                render_merged_pdf(inspections, output, workers=options['workers'])
+            else:
+                for chunk in stream_zip(inspections, workers=options['workers']):
+                    output.write(chunk)
+
+        self.stdout.write(f"تم توليد {count} تقرير في {options['output']}")
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inspectors.synthetic import DEFAULT_BATCH_SIZE, SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = 'يولد بيانات تجريبية (مدراء، مفتشون، منشآت، تقارير، صور، إشعارات، سجلات تدقيق) لقياس الأداء.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--managers', type=int, default=5)
+        parser.add_argument('--inspectors', type=int, default=50)
+        parser.add_argument('--companies', type=int, default=5000)
+        parser.add_argument('--inspections', type=int, default=10000)
+        parser.add_argument('--images', type=int, default=2000)
+        parser.add_argument('--notifications', type=int, default=20000)
+        parser.add_argument('--audit-entries', type=int, default=50000)
+        parser.add_argument('--prefix', default='synthetic', help='بادئة أسماء المستخدمين المولدين.')
+        parser.add_argument('--seed', type=int, help='بذرة المولد العشوائي لتكرار نفس البيانات.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--allow', action='store_true', help='التشغيل رغم أن DEBUG معطل (بيئة غير تطويرية).')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow']:
+            raise CommandError('DEBUG معطل: هذا الأمر يضيف بيانات وهمية إلى قاعدة البيانات. استخدم --allow للتأكيد.')
+        if options['managers'] < 1 or options['inspectors'] < 1:
+            raise CommandError('يجب توليد مدير ومفتش واحد على الأقل.')
+
+        generator = SyntheticDataGenerator(
+            prefix=options['prefix'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        counts = generator.generate(
+            managers=options['managers'],
+            inspectors=options['inspectors'],
+            companies=options['companies'],
+            inspections=options['inspections'],
+            images=options['images'],
+            notifications=options['notifications'],
+            audit_entries=options['audit_entries'],
+        )
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS("تم توليد البيانات. المستخدمون المولدون بدون كلمة مرور صالحة للدخول."))
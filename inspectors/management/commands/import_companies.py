@@ -0,0 +1,46 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from inspectors.importers import DEFAULT_BATCH_SIZE, ImportFileError, import_companies, write_error_report
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'يستورد المنشآت من ملف CSV أو XLSX ويعينها للمفتشين دفعة واحدة.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='مسار ملف CSV أو XLSX.')
+        parser.add_argument('--manager', required=True, help='اسم المستخدم للمدير المسؤول عن المنشآت.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='التحقق من الملف دون حفظ أي بيانات.')
+        parser.add_argument('--errors', help='مسار لحفظ تقرير الأخطاء بصيغة CSV (الافتراضي: الطباعة على الشاشة).')
+
+    def handle(self, *args, **options):
+        try:
+            manager = User.objects.get(username=options['manager'], groups__name='Managers')
+        except User.DoesNotExist:
+            raise CommandError(f"لا يوجد مدير باسم المستخدم {options['manager']}.")
+
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                report = import_companies(
+                    fileobj,
+                    options['path'],
+                    manager,
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                )
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        if report.errors:
+            if options['errors']:
+                with open(options['errors'], 'w', encoding='utf-8', newline='') as out:
+                    write_error_report(report, out)
+            else:
+                write_error_report(report, sys.stdout)
+
+        self.stdout.write(f'الصفوف: {report.processed}، تمت إضافة: {report.created}، أخطاء: {report.failed}')
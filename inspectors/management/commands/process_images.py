@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from inspectors.images import process_image
+from inspectors.models import CompanyImage, InspectionImage
+
+MODELS = {'company': CompanyImage, 'inspection': InspectionImage}
+
+
+class Command(BaseCommand):
+    help = 'يولد نسخ العرض والصور المصغرة للصور التي لم تُعالج بعد (مثل الصور المرفوعة قبل تفعيل المعالجة).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=list(MODELS), action='append', help='نوع واحد أو أكثر (الافتراضي: الكل).')
+        parser.add_argument('--force', action='store_true', help='إعادة معالجة جميع الصور حتى المعالجة سابقاً.')
+
+    def handle(self, *args, **options):
+        for key in options['model'] or MODELS:
+            model = MODELS[key]
+            queryset = model.objects.exclude(image='')
+            if not options['force']:
+                queryset = queryset.filter(thumbnail='')
+            processed = failed = 0
+            for pk in queryset.order_by('pk').values_list('pk', flat=True).iterator():
+                try:
+                    if process_image(model, pk):
+                        processed += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{key} {pk}: {e}")
+            self.stdout.write(f"{key}: تمت معالجة {processed} صورة، وفشلت {failed}")
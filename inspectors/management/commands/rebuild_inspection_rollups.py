@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from inspectors.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'يعيد بناء جداول التجميع اليومية لإحصائيات التفتيش من جدول التقارير.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='YYYY-MM-DD')
+        parser.add_argument('--end-date', help='YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        dates = {}
+        for key in ('start_date', 'end_date'):
+            if options[key]:
+                dates[key] = parse_date(options[key])
+                if dates[key] is None:
+                    raise CommandError(f"صيغة التاريخ غير صحيحة: {options[key]}")
+
+        daily, compliance = rebuild_rollups(**dates)
+        self.stdout.write(f"تم بناء {daily} صف إحصائيات يومية و {compliance} صف تجميع بنود.")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from inspectors.storage import rebuild_references
+
+
+class Command(BaseCommand):
+    help = 'يعيد حساب عدد المراجع لملفات الصور من صفوف قاعدة البيانات ويحذف الملفات التي لا يشير إليها أي صف.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='عرض النتيجة دون تعديل أو حذف.')
+
+    def handle(self, *args, **options):
+        fixed, removed = rebuild_references(dry_run=options['dry_run'])
+        prefix = '(تجربة) ' if options['dry_run'] else ''
+        self.stdout.write(f"{prefix}تم تصحيح {fixed} سجل وحذف {removed} ملف غير مستخدم.")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from inspectors.search import SEARCH_SOURCES, reindex
+
+
+class Command(BaseCommand):
+    help = 'يعيد بناء فهرس البحث (المنشآت، التقارير، المستخدمون، سجلات التدقيق) من البيانات الحالية.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=list(SEARCH_SOURCES), action='append', help='نوع واحد أو أكثر (الافتراضي: الكل).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for kind in options['kind'] or SEARCH_SOURCES:
+            count = reindex(kind, batch_size=options['batch_size'])
+            self.stdout.write(f"{kind}: تمت فهرسة {count} عنصر")
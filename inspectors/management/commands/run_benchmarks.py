@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+
+from inspectors.benchmarks import DEFAULT_ITERATIONS, DEFAULT_WARMUP, compare, dumps, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'يقيس زمن الاستجابة (p50 / p95) وعدد الاستعلامات والذاكرة للصفحات الرئيسية ويطبع النتائج بصيغة JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+        parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP)
+        parser.add_argument('--only', nargs='+', help='أسماء الصفحات المطلوب قياسها فقط.')
+        parser.add_argument('--output', help='مسار ملف JSON لحفظ النتائج (الافتراضي: الطباعة على الشاشة).')
+        parser.add_argument('--compare', help='ملف نتائج سابق لمقارنة زمن p50 وعدد الاستعلامات.')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('عدد التكرارات يجب أن يكون 1 على الأقل.')
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as fileobj:
+                    baseline = json.load(fileobj)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'تعذرت قراءة ملف المقارنة: {e}')
+
+        # يسمح لعميل الاختبار بالعمل (ALLOWED_HOSTS) ويمنع إرسال البريد الفعلي أثناء القياس
+        setup_test_environment()
+        report = run_benchmarks(
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            only=options['only'],
+            log=lambda name: self.stderr.write(f'... {name}'),
+        )
+        if not report['results']:
+            raise CommandError('لا توجد بيانات للقياس. شغّل generate_synthetic_data أولاً.')
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fileobj:
+                fileobj.write(dumps(report))
+            self.stdout.write(self.style.SUCCESS(f"تم حفظ النتائج في {options['output']}"))
+        else:
+            self.stdout.write(dumps(report))
+
+        if baseline:
+            for name, before, after, change, queries_before, queries_after in compare(report, baseline):
+                change_text = f'{change:+.1f}%' if change is not None else '-'
+                self.stdout.write(f'{name}: p50 {before} -> {after} ms ({change_text}), queries {queries_before} -> {queries_after}')
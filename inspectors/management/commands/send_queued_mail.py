@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inspectors.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = 'يرسل الرسائل الموجودة في صندوق البريد الصادر مع إعادة المحاولة للرسائل الفاشلة.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--loop', action='store_true', help='العمل كعامل دائم بدلاً من دورة واحدة.')
+        parser.add_argument('--interval', type=float, default=5.0, help='ثوانٍ بين الدورات عند استخدام --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            total_sent = total_failed = 0
+            # نكرر حتى يفرغ الصندوق من الرسائل المستحقة
+            while True:
+                sent, failed = deliver_pending(batch_size=options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+                if sent + failed < options['batch_size']:
+                    break
+            if total_sent or total_failed or not options['loop']:
+                self.stdout.write(f'تم الإرسال: {total_sent}، فشل: {total_failed}')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,55 @@
+import time
+from contextlib import ExitStack
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .performance import (
+    PERFORMANCE_MONITORING, PERFORMANCE_SLOW_REQUEST_MS, RequestMetrics,
+    activate, deactivate, instrument_templates, server_timing, slow_request_sample, stats,
+)
+
+
+class PerformanceMiddleware:
+    """
+    يقيس لكل طلب: الزمن الكلي، عدد استعلامات قاعدة البيانات وزمنها، زمن عرض القوالب وحجم الاستجابة،
+    ويجمعها حسب اسم المسار (URL name). يضيف ترويسة Server-Timing للمستخدمين المسجلين،
+    ويحفظ الطلبات البطيئة مع أبطأ استعلاماتها.
+    يجب أن يكون أول middleware حتى يشمل القياس بقية السلسلة.
+    """
+
+    def __init__(self, get_response):
+        if not PERFORMANCE_MONITORING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrument_templates()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = activate(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            deactivate(token)
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        # الملفات الثابتة والروابط غير الموجودة ليس لها اسم مسار
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            route = match.view_name
+            if response.streaming:
+                size = int(response['Content-Length']) if response.has_header('Content-Length') else None
+            else:
+                size = len(response.content)
+            stats.record(route, wall_ms, metrics, size, response.status_code)
+            if wall_ms >= PERFORMANCE_SLOW_REQUEST_MS:
+                stats.record_slow(slow_request_sample(request, route, wall_ms, metrics, response.status_code))
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            response['Server-Timing'] = server_timing(wall_ms, metrics)
+        return response
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspectors', '0010_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplianceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='التاريخ')),
+                ('region', models.CharField(max_length=100, verbose_name='اسم المنطقة')),
+                ('establishment_type', models.CharField(choices=[('commercial_shop', 'محل تجاري'), ('commercial_building', 'عقار تجاري'), ('factory', 'مصنع'), ('lab', 'معمل'), ('apartment', 'شقة'), ('workshop', 'ورشة'), ('office', 'مكتب'), ('villa', 'فيلا'), ('other', 'اخرى')], max_length=50, verbose_name='المنشأة عبارة عن')),
+                ('field', models.CharField(max_length=50, verbose_name='البند')),
+                ('value', models.CharField(max_length=50, verbose_name='القيمة')),
+                ('count', models.IntegerField(default=0, verbose_name='العدد')),
+                ('inspector', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='المفتش')),
+            ],
+            options={
+                'verbose_name': 'تجميع بنود الفحص',
+                'verbose_name_plural': 'تجميعات بنود الفحص',
+            },
+        ),
+        migrations.CreateModel(
+            name='InspectionDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='التاريخ')),
+                ('region', models.CharField(max_length=100, verbose_name='اسم المنطقة')),
+                ('establishment_type', models.CharField(choices=[('commercial_shop', 'محل تجاري'), ('commercial_building', 'عقار تجاري'), ('factory', 'مصنع'), ('lab', 'معمل'), ('apartment', 'شقة'), ('workshop', 'ورشة'), ('office', 'مكتب'), ('villa', 'فيلا'), ('other', 'اخرى')], max_length=50, verbose_name='المنشأة عبارة عن')),
+                ('inspections_count', models.IntegerField(default=0, verbose_name='عدد التقارير')),
+                ('inspector', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='المفتش')),
+            ],
+            options={
+                'verbose_name': 'إحصائية يومية للتفتيش',
+                'verbose_name_plural': 'الإحصائيات اليومية للتفتيش',
+                'indexes': [models.Index(fields=['region', 'date'], name='inspectors__region_239219_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='inspectiondailystats',
+            constraint=models.UniqueConstraint(fields=('date', 'region', 'inspector', 'establishment_type'), name='unique_inspection_daily_stats'),
+        ),
+        migrations.AddIndex(
+            model_name='compliancerollup',
+            index=models.Index(fields=['region', 'field', 'date'], name='inspectors__region_beecdf_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='compliancerollup',
+            constraint=models.UniqueConstraint(fields=('date', 'region', 'inspector', 'establishment_type', 'field', 'value'), name='unique_compliance_rollup'),
+        ),
+    ]
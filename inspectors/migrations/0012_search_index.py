@@ -0,0 +1,81 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+FTS_TABLE = 'inspectors_search_fts'
+
+
+def create_search_backend(apps, schema_editor):
+    SearchEntry = apps.get_model('inspectors', 'SearchEntry')
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        # نفس تعبير SearchVector المستخدم في الاستعلام حتى يستخدمه المخطط
+        schema_editor.add_index(SearchEntry, GinIndex(SearchVector('document', config='simple'), name='search_entry_tsv_gin'))
+        schema_editor.add_index(SearchEntry, GinIndex(fields=['document'], opclasses=['gin_trgm_ops'], name='search_entry_trgm_gin'))
+    elif vendor == 'sqlite':
+        # جدول FTS5 بمحتوى خارجي (external content) يُحدّث عبر triggers
+        # ملاحظة: إعادة بناء جدول inspectors_searchentry في SQLite تحذف هذه الـ triggers
+        table = SearchEntry._meta.db_table
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(document, content='{table}', content_rowid='id')"
+            )
+        except Exception:
+            # SQLite بدون FTS5: البحث يعمل بالمطابقة الجزئية على النص المطبّع
+            return
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.id, new.document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.id, old.document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {table} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.id, old.document); "
+            f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.id, new.document); END"
+        )
+
+
+def drop_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS search_entry_tsv_gin')
+        schema_editor.execute('DROP INDEX IF EXISTS search_entry_trgm_gin')
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspectors', '0011_inspection_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20, verbose_name='النوع')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='رقم العنصر')),
+                ('document', models.TextField(verbose_name='النص المفهرس')),
+            ],
+            options={
+                'verbose_name': 'عنصر بحث',
+                'verbose_name_plural': 'فهرس البحث',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_entry'),
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspectors', '0012_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='company_name_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='اسم المنشأة المطبّع'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='region_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='اسم المنطقة المطبّع'),
+        ),
+        migrations.AddField(
+            model_name='inspection',
+            name='company_name_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='اسم المنشأة المطبّع'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='name_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=320, verbose_name='الاسم المطبّع'),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['company_name_normalized'], name='company_name_normalized_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['region_normalized'], name='company_region_normalized_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['company_name_normalized'], name='inspection_company_norm_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['name_normalized'], name='user_name_normalized_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspectors', '0013_normalized_search_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(db_index=True, verbose_name='الشهر')),
+                ('file', models.CharField(max_length=255, verbose_name='ملف الأرشيف')),
+                ('entries_count', models.IntegerField(verbose_name='عدد السجلات')),
+                ('first_entry_id', models.BigIntegerField(verbose_name='أول سجل')),
+                ('last_entry_id', models.BigIntegerField(verbose_name='آخر سجل')),
+                ('first_timestamp', models.DateTimeField(verbose_name='أقدم وقت')),
+                ('last_timestamp', models.DateTimeField(verbose_name='أحدث وقت')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الأرشفة')),
+            ],
+            options={
+                'verbose_name': 'أرشيف سجلات التدقيق',
+                'verbose_name_plural': 'أرشيفات سجلات التدقيق',
+                'ordering': ['-month', 'first_entry_id'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspectors', '0015_list_view_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companyimage',
+            name='display',
+            field=models.ImageField(blank=True, editable=False, upload_to='company_images/renditions/', verbose_name='نسخة العرض'),
+        ),
+        migrations.AddField(
+            model_name='companyimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='company_images/renditions/', verbose_name='الصورة المصغرة'),
+        ),
+        migrations.AddField(
+            model_name='inspectionimage',
+            name='display',
+            field=models.ImageField(blank=True, editable=False, upload_to='inspection_images/renditions/', verbose_name='نسخة العرض'),
+        ),
+        migrations.AddField(
+            model_name='inspectionimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='inspection_images/renditions/', verbose_name='الصورة المصغرة'),
+        ),
+    ]
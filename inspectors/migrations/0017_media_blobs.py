@@ -0,0 +1,59 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:41
+
+from django.db import migrations, models
+import inspectors.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspectors', '0016_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='اسم الملف')),
+                ('sha256', models.CharField(max_length=64, verbose_name='البصمة')),
+                ('size', models.PositiveBigIntegerField(verbose_name='الحجم بالبايت')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='عدد المراجع')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+            ],
+            options={
+                'verbose_name': 'ملف وسائط',
+                'verbose_name_plural': 'ملفات الوسائط',
+            },
+        ),
+        migrations.AlterField(
+            model_name='companyimage',
+            name='display',
+            field=models.ImageField(blank=True, editable=False, storage=inspectors.storage.image_storage, upload_to='company_images/renditions/', verbose_name='نسخة العرض'),
+        ),
+        migrations.AlterField(
+            model_name='companyimage',
+            name='image',
+            field=models.ImageField(storage=inspectors.storage.image_storage, upload_to='company_images/', verbose_name='الصورة'),
+        ),
+        migrations.AlterField(
+            model_name='companyimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, storage=inspectors.storage.image_storage, upload_to='company_images/renditions/', verbose_name='الصورة المصغرة'),
+        ),
+        migrations.AlterField(
+            model_name='inspectionimage',
+            name='display',
+            field=models.ImageField(blank=True, editable=False, storage=inspectors.storage.image_storage, upload_to='inspection_images/renditions/', verbose_name='نسخة العرض'),
+        ),
+        migrations.AlterField(
+            model_name='inspectionimage',
+            name='image',
+            field=models.ImageField(storage=inspectors.storage.image_storage, upload_to='inspection_images/', verbose_name='الصورة'),
+        ),
+        migrations.AlterField(
+            model_name='inspectionimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, storage=inspectors.storage.image_storage, upload_to='inspection_images/renditions/', verbose_name='الصورة المصغرة'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspectors', '0017_media_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='اسم الملف')),
+                ('size', models.PositiveBigIntegerField(verbose_name='الحجم بالبايت')),
+                ('received', models.PositiveBigIntegerField(default=0, verbose_name='المستلم بالبايت')),
+                ('blob', models.CharField(blank=True, max_length=255, verbose_name='الملف المخزن')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ البدء')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')),
+                ('inspection', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='photo_uploads', to='inspectors.inspection', verbose_name='تقرير التفتيش')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_uploads', to=settings.AUTH_USER_MODEL, verbose_name='المستخدم')),
+            ],
+            options={
+                'verbose_name': 'عملية رفع صورة',
+                'verbose_name_plural': 'عمليات رفع الصور',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspectors', '0018_photo_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='تاريخ التحديث'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='inspection',
+            name='sync_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='معرف المزامنة'),
+        ),
+    ]
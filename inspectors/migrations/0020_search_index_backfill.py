@@ -0,0 +1,98 @@
+# Generated by Django 4.2.11 on 2026-10-18 13:10
+
+from django.db import migrations
+
+from inspectors.search import build_document
+
+FTS_TABLE = 'inspectors_search_fts'
+BATCH_SIZE = 1000
+
+# نسخة من SEARCH_SOURCES وقت هذا الترحيل: (التطبيق، النموذج، الحقول)
+SOURCES = {
+    'company': ('inspectors', 'Company', ['company_name', 'company_number', 'region', 'street_name', 'activity_type']),
+    'user': ('inspectors', 'User', ['first_name', 'last_name', 'username', 'email', 'user_id']),
+    'inspection': ('inspectors', 'Inspection', [
+        'company__company_name', 'company__company_number', 'company__region',
+        'inspector__first_name', 'inspector__last_name', 'inspector__username', 'inspector__user_id',
+    ]),
+    'logentry': ('auditlog', 'LogEntry', ['object_repr']),
+}
+
+
+def _drop_sqlite_fts(schema_editor):
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def _create_sqlite_fts(schema_editor, table, tokenize):
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(document, content='{table}', content_rowid='id'{tokenize})"
+        )
+    except Exception:
+        # SQLite بدون FTS5 أو بدون trigram (أقدم من 3.34): البحث يعمل بالمطابقة الجزئية على النص المطبّع
+        return
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.id, new.document); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.id, old.document); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.id, old.document); "
+        f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.id, new.document); END"
+    )
+    # جدول المحتوى الخارجي يُملأ من الصفوف الموجودة
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _backfill(apps):
+    SearchEntry = apps.get_model('inspectors', 'SearchEntry')
+    SearchEntry.objects.all().delete()
+    for kind, (app_label, model_name, lookups) in SOURCES.items():
+        model = apps.get_model(app_label, model_name)
+        batch = []
+        for row in model.objects.order_by().values_list('pk', *lookups).iterator(chunk_size=BATCH_SIZE):
+            batch.append(SearchEntry(kind=kind, object_id=row[0], document=build_document(row[1:])))
+            if len(batch) >= BATCH_SIZE:
+                SearchEntry.objects.bulk_create(batch)
+                batch = []
+        SearchEntry.objects.bulk_create(batch)
+
+
+def backfill_search_index(apps, schema_editor):
+    """
+    فهرسة البيانات الموجودة (الترحيل 0012 أنشأ الفهرس فارغاً)، وفي SQLite إعادة إنشاء جدول FTS5
+    بمقسم trigram حتى يطابق البحث أي جزء من الكلمة كما في PostgreSQL والمطابقة الجزئية.
+    """
+    sqlite = schema_editor.connection.vendor == 'sqlite'
+    if sqlite:
+        # الجدول يُبنى بعد تعبئة الفهرس بـ rebuild واحد بدلاً من trigger لكل صف
+        _drop_sqlite_fts(schema_editor)
+    _backfill(apps)
+    if sqlite:
+        table = apps.get_model('inspectors', 'SearchEntry')._meta.db_table
+        _create_sqlite_fts(schema_editor, table, ", tokenize='trigram'")
+
+
+def restore_prefix_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        table = apps.get_model('inspectors', 'SearchEntry')._meta.db_table
+        _drop_sqlite_fts(schema_editor)
+        _create_sqlite_fts(schema_editor, table, '')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditlog', '0015_alter_logentry_changes'),
+        ('inspectors', '0019_sync_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_index, restore_prefix_fts),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.11 on 2026-10-18 13:40
+
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+# نسخة ثابتة من inspectors.arabic.normalize_arabic وقت كتابة الترحيل، حتى لا يتغير ناتجه بتغير كود التطبيق
+_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_FOLD = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+})
+_TOKEN = re.compile(r'[^\W_]+')
+
+
+def normalize_arabic(text):
+    if not text:
+        return ''
+    text = _DIACRITICS.sub('', str(text)).translate(_FOLD).casefold()
+    return ' '.join(_TOKEN.findall(text))
+
+
+def _backfill(model, sources, field):
+    batch = []
+    for obj in model.objects.order_by('pk').only('pk', field, *sources).iterator(chunk_size=BATCH_SIZE):
+        value = normalize_arabic(' '.join(getattr(obj, source) for source in sources))
+        if getattr(obj, field) != value:
+            setattr(obj, field, value)
+            batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_update(batch, [field])
+            batch = []
+    model.objects.bulk_update(batch, [field])
+
+
+def backfill_normalized_fields(apps, schema_editor):
+    """
+    تعبئة الأعمدة المطبّعة للسجلات الموجودة (الترحيل 0013 أضافها فارغة) حتى تعمل التصفية
+    بالمنطقة والبحث بالاسم دون تشغيل backfill_normalized_fields يدوياً.
+    """
+    _backfill(apps.get_model('inspectors', 'Company'), ['region'], 'region_normalized')
+    _backfill(apps.get_model('inspectors', 'User'), ['first_name', 'last_name'], 'name_normalized')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspectors', '0020_search_index_backfill'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='company',
+            name='company_name_normalized_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='inspection',
+            name='inspection_company_norm_idx',
+        ),
+        migrations.RemoveField(
+            model_name='company',
+            name='company_name_normalized',
+        ),
+        migrations.RemoveField(
+            model_name='inspection',
+            name='company_name_normalized',
+        ),
+        migrations.RunPython(backfill_normalized_fields, migrations.RunPython.noop),
+    ]
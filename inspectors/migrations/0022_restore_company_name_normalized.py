@@ -0,0 +1,71 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:38
+
+import re
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 1000
+
+# نسخة ثابتة من inspectors.arabic.normalize_arabic وقت كتابة الترحيل، حتى لا يتغير ناتجه بتغير كود التطبيق
+_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_FOLD = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+})
+_TOKEN = re.compile(r'[^\W_]+')
+
+
+def normalize_arabic(text):
+    if not text:
+        return ''
+    text = _DIACRITICS.sub('', str(text)).translate(_FOLD).casefold()
+    return ' '.join(_TOKEN.findall(text))
+
+
+def backfill_company_names(apps, schema_editor):
+    Company = apps.get_model('inspectors', 'Company')
+    Inspection = apps.get_model('inspectors', 'Inspection')
+    batch = []
+    for company in Company.objects.order_by('pk').only('pk', 'company_name').iterator(chunk_size=BATCH_SIZE):
+        company.company_name_normalized = normalize_arabic(company.company_name)
+        batch.append(company)
+        if len(batch) >= BATCH_SIZE:
+            Company.objects.bulk_update(batch, ['company_name_normalized'])
+            batch = []
+    Company.objects.bulk_update(batch, ['company_name_normalized'])
+    # التقارير تأخذ القيمة من منشآتها بتحديث واحد
+    Inspection.objects.update(company_name_normalized=Subquery(
+        Company.objects.filter(pk=OuterRef('company_id')).values('company_name_normalized')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspectors', '0021_drop_company_name_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='company_name_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='اسم المنشأة المطبّع'),
+        ),
+        migrations.AddField(
+            model_name='inspection',
+            name='company_name_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='اسم المنشأة المطبّع'),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['company_name_normalized'], name='company_name_normalized_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['company_name_normalized'], name='inspection_company_norm_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(backfill_company_names, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,13 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.utils import timezone
 from auditlog.registry import auditlog
+from .arabic import normalize_arabic
+from .storage import image_storage
 # خيارات للحقول ذات القوائم المحددة
 COMPANY_TYPE_CHOICES = [
     ('commercial_shop', 'محل تجاري'),
@@ -64,6 +69,31 @@ INSPECTION_STATUS_CHOICES = (
     ('deleted', 'محذوف'),    # حالة جديدة للحذف الناعم
 )
 
+# حقول قائمة الفحص في تقرير التفتيش (بنفس ترتيب النموذج)
+INSPECTION_CHECKLIST_FIELDS = [
+    'workers_size_estimation', 'license_compliance', 'female_workers_element',
+    'unlicensed_workers', 'penalties_regulation', 'work_regulation',
+    'worker_file_maintenance', 'extended_working_hours', 'consecutive_shifts',
+    'weekly_rest_schedule', 'number_of_shifts', 'inspector_opinion',
+    'mandoub_name_1', 'mandoub_phone_1', 'mandoub_name_2', 'mandoub_phone_2',
+]
+
+OUTGOING_EMAIL_STATUS_CHOICES = [
+    ('pending', 'بانتظار الإرسال'),
+    ('sent', 'تم الإرسال'),
+    ('failed', 'فشل الإرسال'),
+]
+
+def _with_shadow_fields(update_fields, sources, shadows):
+    # عند الحفظ الجزئي (update_fields) تُضاف الأعمدة المطبّعة إذا تغيرت الحقول المصدر
+    if update_fields is None:
+        return None
+    update_fields = set(update_fields)
+    if update_fields & sources:
+        update_fields |= shadows
+    return update_fields
+
+
 class User(AbstractUser):
     phone_number = models.CharField(max_length=20, verbose_name='رقم الجوال', unique=True)
     address = models.CharField(max_length=255, verbose_name='العنوان')
@@ -76,7 +106,23 @@ class User(AbstractUser):
         related_name='supervised_inspectors' # يمكن للمدير الوصول لقائمة المفتشين من خلال هذا الاسم
     )
     date_joined = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الانضمام', db_index=True)
+    # الاسم الكامل بعد التطبيع العربي (يُحدّث تلقائياً عند الحفظ) للبحث ببداية الاسم
+    name_normalized = models.CharField(max_length=320, blank=True, default='', editable=False, verbose_name='الاسم المطبّع')
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['name_normalized'], name='user_name_normalized_idx', opclasses=['varchar_pattern_ops']),
+            # قائمة مفتشي المدير مرتبة بالاسم الأخير
+            models.Index(fields=['supervisor', 'last_name', 'id'], name='user_supervisor_name_idx'),
+        ]
 
+    def set_normalized_fields(self):
+        self.name_normalized = normalize_arabic(f'{self.first_name} {self.last_name}')
+
+    def save(self, *args, **kwargs):
+        self.set_normalized_fields()
+        kwargs['update_fields'] = _with_shadow_fields(kwargs.get('update_fields'), {'first_name', 'last_name'}, {'name_normalized'})
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.username
@@ -118,19 +164,46 @@ class Company(models.Model):
         default='not_assigned',
         verbose_name='حالة التعيين'
     )
+    company_name_normalized = models.CharField(max_length=255, blank=True, default='', editable=False, verbose_name='اسم المنشأة المطبّع')
+    region_normalized = models.CharField(max_length=100, blank=True, default='', editable=False, verbose_name='اسم المنطقة المطبّع')
     decline_reason = models.TextField(
         ("سبب الرفض"), 
         blank=True, 
         null=True
     )
+    # يُستخدم كرقم نسخة في المزامنة (api/sync/) واستجابات HTTP الشرطية
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')
 
     class Meta:
         verbose_name = 'منشأة'
         verbose_name_plural = 'منشآت'
         indexes = [
             models.Index(fields=['company_name', 'region']),
+            models.Index(fields=['company_name_normalized'], name='company_name_normalized_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['region_normalized'], name='company_region_normalized_idx', opclasses=['varchar_pattern_ops']),
+            # قوائم المنشآت (النشطة / المخفية) مرتبة بتاريخ الإضافة
+            models.Index(fields=['status', 'created_at', 'id'], name='company_status_created_idx'),
+            # منشآت المفتش النشطة فقط
+            models.Index(fields=['assigned_to', 'created_at', 'id'], name='company_active_assigned_idx', condition=models.Q(status='active')),
         ]
 
+    def set_normalized_fields(self):
+        self.company_name_normalized = normalize_arabic(self.company_name)
+        self.region_normalized = normalize_arabic(self.region)
+
+    def save(self, *args, **kwargs):
+        self.set_normalized_fields()
+        update_fields = kwargs['update_fields'] = _with_shadow_fields(
+            kwargs.get('update_fields'), {'company_name', 'region'}, {'company_name_normalized', 'region_normalized'}
+        )
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding and (update_fields is None or 'company_name' in update_fields):
+            # نسخة الاسم المطبّع في تقارير المنشأة (لا يُحدّث إلا التقارير المختلفة)
+            Inspection.objects.filter(company=self).exclude(
+                company_name_normalized=self.company_name_normalized
+            ).update(company_name_normalized=self.company_name_normalized)
+
     def __str__(self):
         return self.company_name
     
@@ -139,13 +212,25 @@ class Company(models.Model):
 # نموذج لصور الشركة
 class CompanyImage(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, verbose_name='اسم المنشأة')
-    image = models.ImageField(upload_to='company_images/', verbose_name='الصورة')
+    image = models.ImageField(upload_to='company_images/', storage=image_storage, verbose_name='الصورة')
+    # نسخ مصغرة تولد في الخلفية بعد الرفع (inspectors/images.py)
+    display = models.ImageField(upload_to='company_images/renditions/', storage=image_storage, blank=True, editable=False, verbose_name='نسخة العرض')
+    thumbnail = models.ImageField(upload_to='company_images/renditions/', storage=image_storage, blank=True, editable=False, verbose_name='الصورة المصغرة')
     description = models.CharField(max_length=255, blank=True, verbose_name='وصف الصورة')
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الرفع')
 
     def __str__(self):
         return f"Image for {self.company}"
 
+    # حتى تنتهي المعالجة تُعرض الصورة الأصلية
+    @property
+    def display_url(self):
+        return (self.display or self.image).url
+
+    @property
+    def thumbnail_url(self):
+        return (self.thumbnail or self.image).url
+
 # نموذج للإشعارات
 class Notification(models.Model):
     recipient = models.ForeignKey(
@@ -177,6 +262,11 @@ class Notification(models.Model):
         verbose_name = ("إشعار")
         verbose_name_plural = ("إشعارات")
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'created_at'], name='notification_recipient_idx'),
+            # عدد الإشعارات غير المقروءة وتعليمها كمقروءة
+            models.Index(fields=['recipient'], name='notification_unread_idx', condition=models.Q(is_read=False)),
+        ]
 
     def __str__(self):
         return self.title
@@ -204,26 +294,227 @@ class Inspection(models.Model):
     mandoub_phone_2 = models.CharField(max_length=20, blank=True, verbose_name='رقم الجوال (2)')
     status = models.CharField(max_length=50, default='draft',choices=INSPECTION_STATUS_CHOICES, verbose_name='الحالة')  # draft, pending approval, approved, rejected, archived, deleted
     updated_at = models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')
+    # معرف المسودة لدى تطبيق المفتش (المزامنة دون اتصال) حتى لا تتكرر المسودة عند إعادة إرسال الدفعة
+    sync_id = models.UUIDField(null=True, blank=True, unique=True, editable=False, verbose_name='معرف المزامنة')
+    # نسخة من اسم المنشأة المطبّع لتصفية التقارير بدون JOIN
+    company_name_normalized = models.CharField(max_length=255, blank=True, default='', editable=False, verbose_name='اسم المنشأة المطبّع')
 
     class Meta:
         indexes = [
             models.Index(fields=['inspector', 'inspection_date']),
+            models.Index(fields=['company_name_normalized'], name='inspection_company_norm_idx', opclasses=['varchar_pattern_ops']),
+            # قوائم المراجعة والأرشيف مرتبة بتاريخ التفتيش
+            models.Index(fields=['status', 'inspection_date', 'id'], name='inspection_status_date_idx'),
+            # التقارير المحذوفة مرتبة بتاريخ الحذف
+            models.Index(fields=['status', 'updated_at', 'id'], name='inspection_status_updated_idx'),
+            # تقارير المنشأة في صفحة تفاصيلها
+            models.Index(fields=['company', 'inspection_date'], name='inspection_company_date_idx'),
         ]
 
+    def set_normalized_fields(self):
+        if Inspection.company.is_cached(self):
+            self.company_name_normalized = self.company.company_name_normalized
+        else:
+            # قراءة العمود وحده بدلاً من تحميل المنشأة كاملة
+            self.company_name_normalized = Company.objects.filter(pk=self.company_id).values_list(
+                'company_name_normalized', flat=True,
+            ).first() or ''
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # المنشأة كما قُرئت من قاعدة البيانات، لمعرفة هل تغيرت قبل الحفظ
+        instance._loaded_company_id = instance.__dict__.get('company_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # بعد الإنشاء يبقى العمود متزامناً من Company.save، فلا يُعاد حسابه إلا عند تغيير المنشأة
+        if self._state.adding or self.company_id != getattr(self, '_loaded_company_id', None):
+            self.set_normalized_fields()
+            kwargs['update_fields'] = _with_shadow_fields(kwargs.get('update_fields'), {'company'}, {'company_name_normalized'})
+        super().save(*args, **kwargs)
+        self._loaded_company_id = self.company_id
+
     def __str__(self):
         return f"Inspection on {self.company.company_name} - {self.inspection_date.date()}"
 
 # نموذج لصور التفتيش
 class InspectionImage(models.Model):
     inspection = models.ForeignKey(Inspection, on_delete=models.CASCADE, verbose_name='تقرير التفتيش')
-    image = models.ImageField(upload_to='inspection_images/', verbose_name='الصورة')
+    image = models.ImageField(upload_to='inspection_images/', storage=image_storage, verbose_name='الصورة')
+    display = models.ImageField(upload_to='inspection_images/renditions/', storage=image_storage, blank=True, editable=False, verbose_name='نسخة العرض')
+    thumbnail = models.ImageField(upload_to='inspection_images/renditions/', storage=image_storage, blank=True, editable=False, verbose_name='الصورة المصغرة')
     description = models.CharField(max_length=255, blank=True, verbose_name='وصف الصورة')
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الرفع')
 
     def __str__(self):
         return f"Image for {self.inspection}"
+
+    @property
+    def display_url(self):
+        return (self.display or self.image).url
+
+    @property
+    def thumbnail_url(self):
+        return (self.thumbnail or self.image).url
     
 
-auditlog.register(User)
-auditlog.register(Company)
-auditlog.register(Inspection)
\ No newline at end of file
+# صندوق البريد الصادر: الطلبات تضيف الرسائل هنا فقط، والإرسال الفعلي يتم خارج الطلب
+class OutgoingEmail(models.Model):
+    subject = models.CharField(max_length=255, verbose_name='الموضوع')
+    body = models.TextField(verbose_name='نص الرسالة')
+    to = models.TextField(verbose_name='المستلمون')  # عناوين مفصولة بفواصل
+    from_email = models.CharField(max_length=255, blank=True, verbose_name='المرسل')
+    status = models.CharField(max_length=20, choices=OUTGOING_EMAIL_STATUS_CHOICES, default='pending', verbose_name='الحالة')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='عدد المحاولات')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='موعد المحاولة التالية')
+    last_error = models.TextField(blank=True, verbose_name='آخر خطأ')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإضافة')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='تاريخ الإرسال')
+
+    class Meta:
+        verbose_name = 'رسالة صادرة'
+        verbose_name_plural = 'الرسائل الصادرة'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to}"
+
+    @property
+    def recipients(self):
+        return [address for address in self.to.split(',') if address]
+
+
+# جداول تجميع يومية لإحصائيات التفتيش (تُحدّث تدريجياً عند تغير حالة التقرير، ويمكن إعادة بنائها)
+class InspectionDailyStats(models.Model):
+    date = models.DateField(verbose_name='التاريخ')
+    region = models.CharField(max_length=100, verbose_name='اسم المنطقة')
+    inspector = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', verbose_name='المفتش')
+    establishment_type = models.CharField(max_length=50, choices=COMPANY_TYPE_CHOICES, verbose_name='المنشأة عبارة عن')
+    inspections_count = models.IntegerField(default=0, verbose_name='عدد التقارير')
+
+    class Meta:
+        verbose_name = 'إحصائية يومية للتفتيش'
+        verbose_name_plural = 'الإحصائيات اليومية للتفتيش'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'region', 'inspector', 'establishment_type'], name='unique_inspection_daily_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['region', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.region}: {self.inspections_count}"
+
+
+class ComplianceRollup(models.Model):
+    date = models.DateField(verbose_name='التاريخ')
+    region = models.CharField(max_length=100, verbose_name='اسم المنطقة')
+    inspector = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', verbose_name='المفتش')
+    establishment_type = models.CharField(max_length=50, choices=COMPANY_TYPE_CHOICES, verbose_name='المنشأة عبارة عن')
+    field = models.CharField(max_length=50, verbose_name='البند')
+    value = models.CharField(max_length=50, verbose_name='القيمة')
+    count = models.IntegerField(default=0, verbose_name='العدد')
+
+    class Meta:
+        verbose_name = 'تجميع بنود الفحص'
+        verbose_name_plural = 'تجميعات بنود الفحص'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'region', 'inspector', 'establishment_type', 'field', 'value'], name='unique_compliance_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['region', 'field', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.region} - {self.field}={self.value}: {self.count}"
+
+
+# فهرس البحث: نص مطبّع (عربي) لكل منشأة / تقرير / مستخدم / سجل تدقيق
+# يُستخدم مع فهرس GIN (tsvector + trigram) في PostgreSQL أو جدول FTS5 في SQLite
+class SearchEntry(models.Model):
+    kind = models.CharField(max_length=20, verbose_name='النوع')
+    object_id = models.PositiveBigIntegerField(verbose_name='رقم العنصر')
+    document = models.TextField(verbose_name='النص المفهرس')
+
+    class Meta:
+        verbose_name = 'عنصر بحث'
+        verbose_name_plural = 'فهرس البحث'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_entry'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id}"
+
+
+# ملفات أرشيف سجلات التدقيق: كل ملف (JSON Lines مضغوط) يحوي دفعة من سجلات شهر واحد
+# نُقلت من جدول auditlog بعد انتهاء مدة الاحتفاظ
+class AuditArchive(models.Model):
+    month = models.DateField(db_index=True, verbose_name='الشهر')
+    file = models.CharField(max_length=255, verbose_name='ملف الأرشيف')
+    entries_count = models.IntegerField(verbose_name='عدد السجلات')
+    first_entry_id = models.BigIntegerField(verbose_name='أول سجل')
+    last_entry_id = models.BigIntegerField(verbose_name='آخر سجل')
+    first_timestamp = models.DateTimeField(verbose_name='أقدم وقت')
+    last_timestamp = models.DateTimeField(verbose_name='أحدث وقت')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الأرشفة')
+
+    class Meta:
+        verbose_name = 'أرشيف سجلات التدقيق'
+        verbose_name_plural = 'أرشيفات سجلات التدقيق'
+        ordering = ['-month', 'first_entry_id']
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.file} ({self.entries_count})"
+
+
+# ملفات الصور المخزنة حسب محتواها (inspectors/storage.py) مع عدد الصفوف التي تشير إليها
+class MediaBlob(models.Model):
+    name = models.CharField(max_length=255, unique=True, verbose_name='اسم الملف')
+    sha256 = models.CharField(max_length=64, verbose_name='البصمة')
+    size = models.PositiveBigIntegerField(verbose_name='الحجم بالبايت')
+    references = models.PositiveIntegerField(default=0, verbose_name='عدد المراجع')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
+
+    class Meta:
+        verbose_name = 'ملف وسائط'
+        verbose_name_plural = 'ملفات الوسائط'
+
+    def __str__(self):
+        return f"{self.name} ({self.references})"
+
+
+# رفع الصور على أجزاء (inspectors/uploads.py): الأجزاء تُكتب في ملف مؤقت، وعند اكتمالها
+# تُحفظ الصورة في التخزين (blob) ثم تُربط بصورة في التقرير عند حفظ النموذج
+class PhotoUpload(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='photo_uploads', verbose_name='المستخدم')
+    inspection = models.ForeignKey(
+        Inspection, on_delete=models.CASCADE, null=True, blank=True, related_name='photo_uploads', verbose_name='تقرير التفتيش',
+    )
+    filename = models.CharField(max_length=255, verbose_name='اسم الملف')
+    size = models.PositiveBigIntegerField(verbose_name='الحجم بالبايت')
+    received = models.PositiveBigIntegerField(default=0, verbose_name='المستلم بالبايت')
+    blob = models.CharField(max_length=255, blank=True, verbose_name='الملف المخزن')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ البدء')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')
+
+    class Meta:
+        verbose_name = 'عملية رفع صورة'
+        verbose_name_plural = 'عمليات رفع الصور'
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+    @property
+    def is_complete(self):
+        return bool(self.blob)
+
+
+# الأعمدة المطبّعة وتاريخ التحديث مشتقة وتتغير مع كل حفظ فلا تُسجل كتغييرات في سجل التدقيق
+auditlog.register(User, exclude_fields=['name_normalized'])
+auditlog.register(Company, exclude_fields=['company_name_normalized', 'region_normalized', 'updated_at'])
+auditlog.register(Inspection, exclude_fields=['company_name_normalized', 'updated_at'])
\ No newline at end of file
@@ -0,0 +1,72 @@
+from django.db import transaction
+
+from .models import Notification
+from .outbox import enqueue_emails
+
+
+def get_unread_count(user):
+    """
+    يعيد عدد الإشعارات غير المقروءة.
+    يُحسب مرة واحدة لكل طلب من قاعدة البيانات (الفهرس الجزئي notification_unread_idx)
+    ويُحفظ على كائن المستخدم، فلا يتأخر ظهور إشعار أُنشئ في عملية أخرى.
+    """
+    count = getattr(user, '_unread_count', None)
+    if count is None:
+        count = Notification.objects.filter(recipient=user, is_read=False).count()
+        user._unread_count = count
+    return count
+
+
+def reset_unread_count(user):
+    # بعد تعليم جميع إشعارات المستخدم كمقروءة داخل الطلب
+    user._unread_count = 0
+
+
+def dispatch_notifications(items, sender=None, send_email=True):
+    """
+    يرسل مجموعة من الإشعارات دفعة واحدة.
+
+    items: قائمة من (المستلم، العنوان، الرسالة، الشركة) والشركة قد تكون None.
+    تُكتب جميع الإشعارات بـ bulk_create واحد، وتُضاف رسائل البريد إلى صندوق البريد الصادر
+    بإدخال واحد (تُرسل في الخلفية، انظر outbox.py).
+
+    يعيد قائمة بنتيجة كل مستلم بنفس ترتيب items:
+    {'recipient', 'notification', 'email_queued', 'error'}
+    """
+    items = [item for item in items if item[0] is not None]
+    if not items:
+        return []
+
+    notifications = [
+        Notification(recipient=recipient, sender=sender, title=title, message=message, related_company=company)
+        for recipient, title, message, company in items
+    ]
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications)
+
+        results = [
+            {'recipient': n.recipient, 'notification': n, 'email_queued': False, 'error': None}
+            for n in notifications
+        ]
+        if send_email:
+            emails = []
+            for result in results:
+                if result['recipient'].email:
+                    emails.append((result['notification'].title, result['notification'].message, [result['recipient'].email]))
+                    result['email_queued'] = True
+                else:
+                    result['error'] = 'لا يوجد بريد إلكتروني للمستلم.'
+            enqueue_emails(emails)
+    return results
+
+
+def notify_team(manager, title, message, company=None, send_email=True):
+    """
+    يبث إشعاراً واحداً لجميع المفتشين التابعين للمدير.
+    """
+    inspectors = manager.supervised_inspectors.filter(is_active=True)
+    return dispatch_notifications(
+        [(inspector, title, message, company) for inspector in inspectors],
+        sender=manager,
+        send_email=send_email,
+    )
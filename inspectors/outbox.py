@@ -0,0 +1,151 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+# أقصى عدد لمحاولات الإرسال قبل اعتبار الرسالة فاشلة نهائياً
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+# زمن الانتظار الأساسي بين المحاولات (بالثواني) ويتضاعف مع كل محاولة
+OUTBOX_RETRY_BASE_SECONDS = getattr(settings, 'EMAIL_OUTBOX_RETRY_BASE_SECONDS', 60)
+# مدة حجز الرسالة أثناء إرسالها حتى لا يلتقطها عامل آخر
+OUTBOX_LEASE_SECONDS = getattr(settings, 'EMAIL_OUTBOX_LEASE_SECONDS', 300)
+# تفريغ الصندوق في خيط خلفي بعد كل إضافة (يُعطّل عند تشغيل أمر send_queued_mail كعامل مستقل)
+OUTBOX_BACKGROUND_DRAIN = getattr(settings, 'EMAIL_OUTBOX_BACKGROUND_DRAIN', True)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-outbox')
+
+
+def enqueue_email(subject, body, to, from_email=None):
+    """
+    يضيف رسالة إلى صندوق البريد الصادر بدلاً من إرسالها داخل الطلب.
+    """
+    if isinstance(to, str):
+        to = [to]
+    to = [address for address in to if address]
+    if not to:
+        return None
+
+    outgoing = OutgoingEmail.objects.create(
+        subject=str(subject),
+        body=body,
+        to=','.join(to),
+        from_email=from_email or '',
+    )
+    if OUTBOX_BACKGROUND_DRAIN:
+        transaction.on_commit(_schedule_drain)
+    return outgoing
+
+
+def enqueue_emails(messages):
+    """
+    مثل enqueue_email لعدة رسائل دفعة واحدة (إدخال واحد): messages قائمة من (العنوان، النص، المستلمون).
+    """
+    outgoing = []
+    for subject, body, to in messages:
+        to = [to] if isinstance(to, str) else to
+        to = [address for address in to if address]
+        if to:
+            outgoing.append(OutgoingEmail(subject=str(subject), body=body, to=','.join(to), from_email=''))
+    if not outgoing:
+        return []
+    outgoing = OutgoingEmail.objects.bulk_create(outgoing)
+    if OUTBOX_BACKGROUND_DRAIN:
+        transaction.on_commit(_schedule_drain)
+    return outgoing
+
+
+def _schedule_drain():
+    _executor.submit(_drain_in_background)
+
+
+def _drain_in_background():
+    close_old_connections()
+    try:
+        deliver_pending()
+    except Exception:
+        logger.exception("فشل تفريغ صندوق البريد الصادر")
+    finally:
+        close_old_connections()
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=OUTBOX_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutgoingEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        OutgoingEmail.objects.filter(pk__in=ids).update(
+            next_attempt_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+        )
+    return list(OutgoingEmail.objects.filter(pk__in=ids).order_by('pk'))
+
+
+def deliver_pending(batch_size=50, max_attempts=OUTBOX_MAX_ATTEMPTS):
+    """
+    يرسل الرسائل المستحقة عبر اتصال بريد واحد مع إعادة المحاولة بتأخير متزايد.
+    يعيد (عدد المرسلة، عدد التي فشلت في هذه الدورة).
+    """
+    batch = _claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for outgoing in batch:
+            _record_failure(outgoing, e, max_attempts)
+        return 0, len(batch)
+
+    try:
+        for outgoing in batch:
+            message = EmailMessage(
+                outgoing.subject,
+                outgoing.body,
+                from_email=outgoing.from_email or None,
+                to=outgoing.recipients,
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as e:
+                _record_failure(outgoing, e, max_attempts)
+                failed += 1
+            else:
+                outgoing.status = 'sent'
+                outgoing.attempts += 1
+                outgoing.sent_at = timezone.now()
+                outgoing.last_error = ''
+                outgoing.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def _record_failure(outgoing, error, max_attempts):
+    outgoing.attempts += 1
+    outgoing.last_error = str(error)
+    if outgoing.attempts >= max_attempts:
+        outgoing.status = 'failed'
+    else:
+        outgoing.next_attempt_at = timezone.now() + retry_delay(outgoing.attempts)
+    outgoing.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+    logger.warning("تعذر إرسال الرسالة %s (المحاولة %s): %s", outgoing.pk, outgoing.attempts, error)
@@ -0,0 +1,233 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+# عدد العناصر الافتراضي في كل صفحة من صفحات القوائم
+DEFAULT_PAGE_SIZE = 50
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder يقتطع الميكروثانية، والمؤشر يحتاج القيمة كاملة للمقارنة
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values, pk, direction):
+    payload = json.dumps({'v': values, 'pk': pk, 'd': direction}, cls=CursorEncoder)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        values, pk, direction = data['v'], data['pk'], data['d']
+    except (ValueError, TypeError, KeyError, UnicodeError):
+        raise InvalidCursor(cursor)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    # bool صنف فرعي من int في بايثون
+    if not isinstance(pk, int) or isinstance(pk, bool):
+        raise InvalidCursor(cursor)
+    return values, pk, direction
+
+
+class KeysetPage:
+    """
+    صفحة واحدة من نتائج الترقيم بالمؤشر (Keyset).
+    تتصرف كقائمة عادية داخل القوالب (for / if / length).
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+class KeysetPaginator:
+    """
+    ترقيم الصفحات بالمؤشر بدلاً من OFFSET:
+    كل صفحة تُجلب بشرط (عمود الترتيب، pk) أكبر/أصغر من آخر صف في الصفحة السابقة،
+    فتبقى تكلفة الصفحة ثابتة مهما كان عمق التصفح.
+
+    ordering: قائمة أعمدة الترتيب بصيغة Django (مثل ['-inspection_date'])،
+    ويُضاف pk تلقائياً كعمود أخير لضمان ترتيب ثابت.
+    """
+
+    def __init__(self, queryset, ordering, per_page=DEFAULT_PAGE_SIZE):
+        if isinstance(ordering, str):
+            ordering = [ordering]
+        self.queryset = queryset
+        self.per_page = per_page
+        # (اسم الحقل، هل الترتيب تنازلي)
+        self.keys = [(o.lstrip('-'), o.startswith('-')) for o in ordering if o.lstrip('-') not in ('pk', 'id')]
+        # اتجاه pk يتبع آخر عمود ترتيب ما لم يُحدد صراحة
+        pk_desc = self.keys[-1][1] if self.keys else False
+        for o in ordering:
+            if o.lstrip('-') in ('pk', 'id'):
+                pk_desc = o.startswith('-')
+        self.keys.append(('pk', pk_desc))
+
+    def _order_by(self, reverse=False):
+        return [('-' if desc != reverse else '') + field for field, desc in self.keys]
+
+    def _after(self, values, reverse=False):
+        # شرط المقارنة المعجمية: (a, b, pk) > (va, vb, vpk)
+        condition = Q()
+        for i in range(len(self.keys) - 1, -1, -1):
+            field, desc = self.keys[i]
+            lookup = 'lt' if desc != reverse else 'gt'
+            step = Q(**{f'{field}__{lookup}': values[i]})
+            if i < len(self.keys) - 1:
+                step |= Q(**{field: values[i]}) & condition
+            condition = step
+        return condition
+
+    def _key_field(self, name):
+        # الحقل الذي يُقارن به عمود الترتيب: تعليق (annotation) أو حقل مباشر أو عبر علاقة
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        model = self.queryset.model
+        if name == 'pk':
+            return model._meta.pk
+        parts = name.split('__')
+        for part in parts[:-1]:
+            model = model._meta.get_field(part).related_model
+        return model._meta.get_field(parts[-1])
+
+    def _coerce(self, values, cursor):
+        # المؤشر يأتي من المستخدم: كل قيمة تُحوّل لنوع حقلها، وأي قيمة لا تتحول تُبطل المؤشر
+        coerced = []
+        for (field, _), value in zip(self.keys, values):
+            try:
+                value = self._key_field(field).to_python(value)
+            except (FieldDoesNotExist, ValidationError, ValueError, TypeError):
+                raise InvalidCursor(cursor)
+            if value is None:
+                raise InvalidCursor(cursor)
+            coerced.append(value)
+        return coerced
+
+    def _row_values(self, obj):
+        values = []
+        for field, _ in self.keys:
+            value = obj
+            for part in field.split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def _cursor(self, obj, direction):
+        values = self._row_values(obj)
+        return encode_cursor(values[:-1], values[-1], direction)
+
+    def get_page(self, cursor=None):
+        """
+        يعيد الصفحة المطلوبة. المؤشر غير الصالح يعيد الصفحة الأولى.
+        """
+        values = direction = None
+        if cursor:
+            try:
+                key_values, pk, direction = decode_cursor(cursor)
+                if len(key_values) != len(self.keys) - 1:
+                    raise InvalidCursor(cursor)
+                values = self._coerce(key_values + [pk], cursor)
+            except InvalidCursor:
+                values = direction = None
+
+        backwards = direction == 'prev'
+        qs = self.queryset.order_by(*self._order_by(reverse=backwards))
+        if values is not None:
+            qs = qs.filter(self._after(values, reverse=backwards))
+
+        # نجلب صفاً إضافياً لمعرفة وجود صفحة تالية دون COUNT
+        rows = list(qs[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if backwards:
+                next_cursor = self._cursor(rows[-1], 'next')
+                if has_more:
+                    previous_cursor = self._cursor(rows[0], 'prev')
+            else:
+                if has_more:
+                    next_cursor = self._cursor(rows[-1], 'next')
+                if values is not None:
+                    previous_cursor = self._cursor(rows[0], 'prev')
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def paginate_keyset(request, queryset, ordering, per_page=DEFAULT_PAGE_SIZE):
+    """
+    دالة مساعدة للـ views: تقرأ المؤشر من ?cursor= وتعيد الصفحة.
+    """
+    return KeysetPaginator(queryset, ordering, per_page=per_page).get_page(request.GET.get('cursor'))
+
+
+def paginate_list_keyset(request, rows, per_page=DEFAULT_PAGE_SIZE):
+    """
+    نفس واجهة paginate_keyset لقائمة في الذاكرة مرتبة تنازلياً حسب pk
+    (مثل سجلات الأرشيف المقروءة من الملفات)، فيعمل نفس قالب التنقل.
+    """
+    rows = list(rows)
+    pk = direction = None
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            values, pk, direction = decode_cursor(cursor)
+            if values:
+                raise InvalidCursor(cursor)
+        except InvalidCursor:
+            pk = direction = None
+
+    if direction == 'prev':
+        newer = [row for row in rows if row.pk > pk]
+        page_rows = newer[-per_page:]
+        has_more = len(newer) > per_page
+        next_cursor = encode_cursor([], page_rows[-1].pk, 'next') if page_rows else None
+        previous_cursor = encode_cursor([], page_rows[0].pk, 'prev') if has_more else None
+    else:
+        older = [row for row in rows if row.pk < pk] if direction == 'next' else rows
+        page_rows = older[:per_page]
+        next_cursor = encode_cursor([], page_rows[-1].pk, 'next') if len(older) > per_page else None
+        previous_cursor = encode_cursor([], page_rows[0].pk, 'prev') if direction and page_rows else None
+    return KeysetPage(page_rows, next_cursor, previous_cursor)
@@ -0,0 +1,492 @@
+import glob
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from xml.sax.saxutils import escape
+
+import arabic_reshaper
+from bidi.algorithm import get_display
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Prefetch
+from django.utils import timezone
+from pypdf import PdfWriter
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.platypus import Image, KeepTogether, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .arabic import normalize_arabic, normalized_prefix_q
+from .models import Inspection, InspectionImage, INSPECTION_CHECKLIST_FIELDS
+from .storage import media_storage
+
+logger = logging.getLogger(__name__)
+
+# عدد العمليات المستخدمة لتوليد ملفات PDF دفعة واحدة (1 = داخل العملية الحالية)
+PDF_BATCH_WORKERS = getattr(settings, 'PDF_BATCH_WORKERS', 2)
+# عدد التقارير التي تُجهز وتُرسل لمجمع العمليات في كل دفعة
+PDF_BATCH_CHUNK_SIZE = 50
+# مجلد الملفات المولدة مسبقاً (خارج MEDIA_ROOT حتى لا تُخدم بدون صلاحيات)
+PDF_CACHE_DIR = getattr(settings, 'PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'govinspect_pdf_cache'))
+# يُزاد عند تغيير شكل التقرير لإبطال الملفات القديمة في الكاش
+PDF_RENDERER_VERSION = 3
+# ما يُطبع في التقرير من خارجه: بيانات المنشأة واسم المفتش ورقم هويته (لمستخدم المفتش لا يوجد updated_at)
+PDF_VERSION_FIELDS = (
+    'updated_at', 'company__updated_at', 'inspector_id',
+    'inspector__first_name', 'inspector__last_name', 'inspector__username', 'inspector__user_id',
+)
+
+# خط التقارير المضمّن في المشروع (Noto Naskh Arabic مع الحروف اللاتينية من Noto Serif، رخصة static/fonts/OFL.txt)
+DEFAULT_ARABIC_FONT = os.path.join(settings.BASE_DIR, 'static', 'fonts', 'NotoNaskhArabic-Regular.ttf')
+# يمكن استبداله بخط آخر يدعم العربية، والخط العريض اختياري (يُستخدم الخط العادي للعناوين إن لم يُحدد)
+PDF_ARABIC_FONT = getattr(settings, 'PDF_ARABIC_FONT', None) or DEFAULT_ARABIC_FONT
+PDF_ARABIC_BOLD_FONT = getattr(settings, 'PDF_ARABIC_BOLD_FONT', None)
+
+_fonts = None
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 1.5 * cm
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+LABEL_WIDTH = 5.5 * cm
+IMAGE_MAX_WIDTH = 8 * cm
+IMAGE_MAX_HEIGHT = 6 * cm
+
+
+def _load_font(name, path, setting):
+    if not os.path.exists(path):
+        raise ImproperlyConfigured(f"خط تقارير PDF غير موجود: {path} (الإعداد {setting}).")
+    try:
+        pdfmetrics.registerFont(TTFont(name, path))
+    except TTFError as e:
+        raise ImproperlyConfigured(f"تعذر تحميل خط تقارير PDF {path}: {e}")
+
+
+def register_fonts():
+    """
+    يسجل الخطوط العربية مرة واحدة لكل عملية (تُستدعى عند بدء التطبيق).
+    يعيد (اسم الخط العادي، اسم الخط العريض).
+    لا يُستخدم خط بديل لا يدعم العربية: غياب الخط خطأ في الإعداد وليس تقريراً بمربعات فارغة.
+    """
+    global _fonts
+    if _fonts is not None:
+        return _fonts
+
+    _load_font('Arabic', PDF_ARABIC_FONT, 'PDF_ARABIC_FONT')
+    bold = 'Arabic'
+    if PDF_ARABIC_BOLD_FONT:
+        _load_font('Arabic-Bold', PDF_ARABIC_BOLD_FONT, 'PDF_ARABIC_BOLD_FONT')
+        bold = 'Arabic-Bold'
+    _fonts = ('Arabic', bold)
+    return _fonts
+
+
+def _styles():
+    regular, bold = register_fonts()
+    return {
+        'title': ParagraphStyle('title', fontName=bold, fontSize=20, leading=28, alignment=TA_CENTER),
+        'subtitle': ParagraphStyle('subtitle', fontName=regular, fontSize=9, leading=14, alignment=TA_CENTER, textColor=colors.grey),
+        'heading': ParagraphStyle('heading', fontName=bold, fontSize=13, leading=20, alignment=TA_RIGHT, spaceBefore=12, spaceAfter=6),
+        'label': ParagraphStyle('label', fontName=bold, fontSize=10, leading=15, alignment=TA_RIGHT),
+        'value': ParagraphStyle('value', fontName=regular, fontSize=10, leading=15, alignment=TA_RIGHT),
+        'caption': ParagraphStyle('caption', fontName=regular, fontSize=8, leading=12, alignment=TA_CENTER, textColor=colors.grey),
+    }
+
+
+def ar(text, style, width=CONTENT_WIDTH):
+    """
+    فقرة عربية: تشكيل الحروف ثم تقسيم الأسطر بالترتيب المنطقي،
+    وبعدها تطبيق اتجاه bidi لكل سطر على حدة حتى لا تنعكس الأسطر.
+    """
+    lines = []
+    for raw in (str(text) if text not in (None, '') else '-').splitlines() or ['']:
+        reshaped = arabic_reshaper.reshape(raw)
+        for line in simpleSplit(reshaped, style.fontName, style.fontSize, width) or ['']:
+            lines.append(escape(get_display(line)))
+    return Paragraph('<br/>'.join(lines), style)
+
+
+def batch_queryset(status='archived', region=None, start_date=None, end_date=None, inspector=None, company_name=None):
+    """
+    يبني استعلام التقارير المطلوبة مع جلب المنشأة والمفتش والصور
+    بعدد ثابت من الاستعلامات لكل دفعة بدلاً من استعلام لكل تقرير.
+    """
+    inspections = Inspection.objects.select_related('company', 'inspector').prefetch_related(
+        Prefetch('inspectionimage_set', queryset=InspectionImage.objects.order_by('pk'))
+    )
+    if status:
+        inspections = inspections.filter(status=status)
+    if region:
+        # المقارنة على العمود المطبّع حتى تطابق "الرياض" و "الرياض" بأي شكل للهمزة أو التاء
+        inspections = inspections.filter(company__region_normalized=normalize_arabic(region))
+    if start_date:
+        inspections = inspections.filter(inspection_date__date__gte=start_date)
+    if end_date:
+        inspections = inspections.filter(inspection_date__date__lte=end_date)
+    if inspector:
+        inspections = inspections.filter(inspector=inspector)
+    if company_name:
+        # بداية اسم المنشأة على نسخته المطبّعة في جدول التقارير (بدون JOIN)
+        inspections = inspections.filter(normalized_prefix_q('company_name_normalized', company_name))
+    return inspections.order_by('inspection_date', 'pk')
+
+
+def _field_row(instance, name):
+    field = instance._meta.get_field(name)
+    if field.choices:
+        value = getattr(instance, f'get_{name}_display')()
+    else:
+        value = getattr(instance, name)
+    return str(field.verbose_name), value
+
+
+def pdf_version(values):
+    """
+    نسخة ملف PDF من قيم PDF_VERSION_FIELDS (بنفس الترتيب) ومن رقم إصدار شكل التقرير.
+    تتغير مع تعديل التقرير أو المنشأة أو بيانات المفتش، وتُستخدم في اسم ملف الكاش.
+    """
+    text = '|'.join(value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in values)
+    return f'{hashlib.sha256(text.encode()).hexdigest()[:20]}_v{PDF_RENDERER_VERSION}'
+
+
+def inspection_pdf_version(inspection):
+    company = inspection.company
+    inspector = inspection.inspector
+    return pdf_version((
+        inspection.updated_at, company.updated_at, inspector.pk,
+        inspector.first_name, inspector.last_name, inspector.username, inspector.user_id,
+    ))
+
+
+def inspection_payload(inspection):
+    """
+    يحول التقرير إلى قاموس بسيط قابل للتمرير إلى عملية أخرى (pickle).
+    """
+    company = inspection.company
+    inspector = inspection.inspector
+    checklist = [name for name in INSPECTION_CHECKLIST_FIELDS if name != 'inspector_opinion' and not name.startswith('mandoub_')]
+    return {
+        'pk': inspection.pk,
+        'version': inspection_pdf_version(inspection),
+        'updated_at': inspection.updated_at,
+        'company': [
+            _field_row(company, name) for name in (
+                'company_name', 'company_number', 'region', 'street_name', 'building_number',
+                'activity_type', 'electricity_meter_number', 'actual_workers_count',
+                'establishment_type', 'size_description',
+            )
+        ],
+        'details': [
+            ('المفتش', inspector.get_full_name() or inspector.username),
+            ('رقم هوية المفتش', inspector.user_id),
+            (str(Inspection._meta.get_field('inspection_date').verbose_name),
+             timezone.localtime(inspection.inspection_date).strftime('%Y-%m-%d %H:%M')),
+            _field_row(inspection, 'status'),
+        ],
+        'checklist': [_field_row(inspection, name) for name in checklist],
+        'opinion': inspection.inspector_opinion,
+        'representatives': [
+            _field_row(inspection, name) for name in ('mandoub_name_1', 'mandoub_phone_1', 'mandoub_name_2', 'mandoub_phone_2')
+            if getattr(inspection, name)
+        ],
+        'inspector_name': inspector.get_full_name() or inspector.username,
+        'images': [
+            (image.image.name, image.description)
+            for image in inspection.inspectionimage_set.all() if image.image
+        ],
+    }
+
+
+def pdf_filename(payload):
+    return f"inspection_{payload['pk']}.pdf"
+
+
+def _rows_table(rows, styles):
+    data = [
+        [ar(value, styles['value'], CONTENT_WIDTH - LABEL_WIDTH - 12), ar(label, styles['label'], LABEL_WIDTH - 12)]
+        for label, value in rows
+    ]
+    table = Table(data, colWidths=[CONTENT_WIDTH - LABEL_WIDTH, LABEL_WIDTH])
+    table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+        ('BACKGROUND', (1, 0), (1, -1), colors.whitesmoke),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    return table
+
+
+def _image_flowable(name, description, styles):
+    try:
+        with media_storage.open(name, 'rb') as f:
+            data = io.BytesIO(f.read())
+        width, height = ImageReader(data).getSize()
+    except Exception:
+        logger.warning("تعذر قراءة صورة التقرير %s", name)
+        return None
+    data.seek(0)
+    scale = min(IMAGE_MAX_WIDTH / width, IMAGE_MAX_HEIGHT / height, 1)
+    parts = [Image(data, width=width * scale, height=height * scale)]
+    if description:
+        parts.append(ar(description, styles['caption'], IMAGE_MAX_WIDTH))
+    parts.append(Spacer(1, 8))
+    return KeepTogether(parts)
+
+
+def _signatures(payload, styles):
+    line = '_' * 25
+    data = [
+        [ar('اعتماد المدير', styles['label'], CONTENT_WIDTH / 2 - 12), ar('توقيع المفتش', styles['label'], CONTENT_WIDTH / 2 - 12)],
+        [ar('', styles['value'], CONTENT_WIDTH / 2 - 12), ar(payload['inspector_name'], styles['value'], CONTENT_WIDTH / 2 - 12)],
+        [Paragraph(line, styles['value']), Paragraph(line, styles['value'])],
+    ]
+    table = Table(data, colWidths=[CONTENT_WIDTH / 2, CONTENT_WIDTH / 2])
+    table.setStyle(TableStyle([('TOPPADDING', (0, 2), (-1, 2), 24)]))
+    return KeepTogether([Spacer(1, 18), table])
+
+
+def build_story(payload):
+    """
+    محتوى التقرير الكامل: بيانات المنشأة، قائمة الفحص، رأي المفتش، المندوبون، الصور والتوقيعات.
+    """
+    styles = _styles()
+    story = [
+        ar('تقرير تفتيش', styles['title']),
+        # الملف يُحفظ في الكاش ويُرسل لاحقاً، فيُطبع تاريخ آخر تحديث للتقرير لا وقت التوليد
+        ar(f"رقم التقرير: {payload['pk']} - آخر تحديث: {timezone.localtime(payload['updated_at']).strftime('%Y-%m-%d %H:%M')}", styles['subtitle']),
+        Spacer(1, 12),
+        ar('معلومات الشركة', styles['heading']),
+        _rows_table(payload['company'], styles),
+        ar('بيانات التفتيش', styles['heading']),
+        _rows_table(payload['details'], styles),
+        ar('قائمة الفحص', styles['heading']),
+        _rows_table(payload['checklist'], styles),
+        ar('رأي المفتش', styles['heading']),
+        ar(payload['opinion'], styles['value']),
+    ]
+    if payload['representatives']:
+        story += [ar('بيانات المندوبين', styles['heading']), _rows_table(payload['representatives'], styles)]
+
+    images = [_image_flowable(name, description, styles) for name, description in payload['images']]
+    images = [image for image in images if image is not None]
+    if images:
+        story.append(ar('صور التفتيش', styles['heading']))
+        story += images
+
+    story.append(_signatures(payload, styles))
+    return story
+
+
+def _draw_footer(p, doc):
+    regular, _ = register_fonts()
+    p.saveState()
+    p.setFont(regular, 8)
+    p.setFillColor(colors.grey)
+    p.drawCentredString(PAGE_WIDTH / 2, MARGIN / 2, get_display(arabic_reshaper.reshape(f'صفحة {doc.page}')))
+    p.restoreState()
+
+
+def _document(output):
+    return SimpleDocTemplate(
+        output, pagesize=A4,
+        leftMargin=MARGIN, rightMargin=MARGIN, topMargin=MARGIN, bottomMargin=MARGIN,
+    )
+
+
+def render_inspection_pdf(payload):
+    buffer = io.BytesIO()
+    _document(buffer).build(build_story(payload), onFirstPage=_draw_footer, onLaterPages=_draw_footer)
+    return buffer.getvalue()
+
+
+def cache_path(pk, version):
+    return os.path.join(PDF_CACHE_DIR, f'inspection_{pk}_{version}.pdf')
+
+
+def pdf_etag(pk, version):
+    # نفس مفتاح ملف الكاش (pdf_version): يتغير مع تعديل التقرير أو المنشأة أو المفتش أو شكل PDF
+    return f'"inspection-{pk}-{version}"'
+
+
+def get_cached_pdf_path(pk, version):
+    path = cache_path(pk, version)
+    return path if os.path.exists(path) else None
+
+
+def store_cached_pdf(pk, version, content):
+    path = cache_path(pk, version)
+    try:
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        # حذف النسخ القديمة لنفس التقرير
+        for old in glob.glob(os.path.join(PDF_CACHE_DIR, f'inspection_{pk}_*.pdf')):
+            if old != path:
+                os.remove(old)
+        # كتابة ذرية حتى لا يُقرأ ملف غير مكتمل
+        fd, tmp_path = tempfile.mkstemp(dir=PDF_CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.warning("تعذر حفظ ملف PDF للتقرير %s في الكاش", pk)
+        return None
+    return path
+
+
+def render_inspection_pdf_cached(payload):
+    """
+    يعيد محتوى PDF من الكاش إن وُجد (بنفس النسخة)، وإلا يولده ويحفظه.
+    """
+    path = get_cached_pdf_path(payload['pk'], payload['version'])
+    if path:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            pass
+    content = render_inspection_pdf(payload)
+    store_cached_pdf(payload['pk'], payload['version'], content)
+    return content
+
+
+def _render_named(payload):
+    return pdf_filename(payload), render_inspection_pdf_cached(payload)
+
+
+def _iter_payload_chunks(queryset, chunk_size=PDF_BATCH_CHUNK_SIZE):
+    chunk = []
+    for inspection in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(inspection_payload(inspection))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# مجمع عمليات واحد لكل عملية خادم يُنشأ عند أول طلب ويُعاد استخدامه (لا مجمع جديد لكل طلب)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _worker_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_BATCH_WORKERS)
+        return _pool
+
+
+def _discard_pool(pool):
+    # عملية عاملة توقفت فجأة تُعطل المجمع كاملاً، فيُنشأ غيره في الطلب التالي
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _map_chunks(function, queryset, workers):
+    """
+    يطبق function على بيانات كل تقرير (بنفس الترتيب)، موزعة على مجمع العمليات المشترك.
+    يولد (payload، النتيجة).
+    """
+    if workers <= 1:
+        for chunk in _iter_payload_chunks(queryset):
+            for payload in chunk:
+                yield payload, function(payload)
+        return
+
+    pool = _worker_pool()
+    try:
+        for chunk in _iter_payload_chunks(queryset):
+            yield from zip(chunk, pool.map(function, chunk))
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+
+
+def iter_rendered_pdfs(queryset, workers=PDF_BATCH_WORKERS):
+    """
+    يولد (اسم الملف، محتوى PDF) لكل تقرير، ويوزع التوليد على مجمع عمليات.
+    """
+    for payload, result in _map_chunks(_render_named, queryset, workers):
+        yield result
+
+
+class _StreamBuffer:
+    """
+    مخزن مؤقت غير قابل للتنقل (بدون tell/seek) يسمح لـ zipfile بالكتابة
+    بشكل تدفقي، ونفرغه بعد كل ملف.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(queryset, workers=PDF_BATCH_WORKERS):
+    """
+    يولد ملف ZIP على أجزاء يحتوي ملف PDF لكل تقرير.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, content in iter_rendered_pdfs(queryset, workers=workers):
+            archive.writestr(filename, content)
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def _render_to_cache(payload):
+    """
+    يتأكد أن ملف PDF التقرير في الكاش ويعيد مساره، أو المحتوى نفسه إن تعذر حفظه.
+    يعيد المسار فقط حتى لا يُنقل محتوى الملف بين العمليات.
+    """
+    path = get_cached_pdf_path(payload['pk'], payload['version'])
+    if path:
+        return path
+    content = render_inspection_pdf(payload)
+    return store_cached_pdf(payload['pk'], payload['version'], content) or content
+
+
+def render_merged_pdf(queryset, output, workers=PDF_BATCH_WORKERS):
+    """
+    يكتب جميع التقارير في ملف PDF واحد بدمج ملف كل تقرير من الكاش (كل تقرير يبدأ في صفحة جديدة)،
+    فلا يُعاد توليد تقرير لم يتغير ولا تُحمّل صور جميع التقارير في الذاكرة معاً.
+    """
+    writer = PdfWriter()
+    for payload, cached in _map_chunks(_render_to_cache, queryset, workers):
+        if isinstance(cached, str):
+            try:
+                writer.append(cached)
+                continue
+            except FileNotFoundError:
+                # نسخة أحدث من التقرير حلت محل الملف في الكاش أثناء الدمج
+                cached = render_inspection_pdf(payload)
+        writer.append(io.BytesIO(cached))
+
+    if not writer.pages:
+        _document(output).build([ar('لا توجد تقارير مطابقة.', _styles()['heading'])])
+        return output
+    writer.write(output)
+    writer.close()
+    return output
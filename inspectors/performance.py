@@ -0,0 +1,212 @@
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# تفعيل قياس أداء الطلبات (PerformanceMiddleware)
+PERFORMANCE_MONITORING = getattr(settings, 'PERFORMANCE_MONITORING', True)
+# عدد آخر الطلبات المحفوظة لكل مسار لحساب النسب المئوية
+PERFORMANCE_WINDOW = getattr(settings, 'PERFORMANCE_WINDOW', 500)
+# الطلبات الأبطأ من هذا الحد (بالملي ثانية) تُحفظ مع استعلاماتها
+PERFORMANCE_SLOW_REQUEST_MS = getattr(settings, 'PERFORMANCE_SLOW_REQUEST_MS', 1000)
+PERFORMANCE_SLOW_SAMPLES = getattr(settings, 'PERFORMANCE_SLOW_SAMPLES', 50)
+# عدد الاستعلامات الأبطأ المحفوظة مع كل طلب بطيء
+SLOW_REQUEST_QUERIES = 20
+# حدود فئات مدرج زمن الاستجابة (بالملي ثانية)
+HISTOGRAM_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_current = contextvars.ContextVar('performance_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    قياسات طلب واحد. تُستخدم كـ execute_wrapper لاتصال قاعدة البيانات لعد الاستعلامات وزمنها.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.queries += 1
+            self.db_ms += elapsed
+            self.statements.append((elapsed, sql))
+
+    def slowest_statements(self, limit=SLOW_REQUEST_QUERIES):
+        ordered = sorted(self.statements, key=lambda statement: statement[0], reverse=True)[:limit]
+        return [{'ms': round(elapsed, 2), 'sql': sql} for elapsed, sql in ordered]
+
+
+def current_metrics():
+    return _current.get()
+
+
+def activate(metrics):
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def instrument_templates():
+    """
+    يضيف قياس زمن عرض القوالب إلى قوالب Django (مرة واحدة لكل عملية).
+    القوالب المتداخلة (مثل قوالب عناصر النماذج) تُحسب ضمن القالب الخارجي فقط.
+    """
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'performance_timed', False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return original(self, context, request)
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            metrics.template_depth -= 1
+            if metrics.template_depth == 0:
+                metrics.template_ms += (time.perf_counter() - start) * 1000
+
+    render.performance_timed = True
+    Template.render = render
+
+
+def _percentile(ordered, percent):
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _summary(values):
+    ordered = sorted(values)
+    return {
+        'p50': round(_percentile(ordered, 50), 2),
+        'p95': round(_percentile(ordered, 95), 2),
+        'p99': round(_percentile(ordered, 99), 2),
+        'max': round(ordered[-1], 2),
+    }
+
+
+def _histogram(values):
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for value in values:
+        for index, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if value <= bound:
+                counts[index] += 1
+                break
+        else:
+            counts[-1] += 1
+    labels = [f'<={bound}' for bound in HISTOGRAM_BUCKETS_MS] + [f'>{HISTOGRAM_BUCKETS_MS[-1]}']
+    return dict(zip(labels, counts))
+
+
+class PerformanceStats:
+    """
+    إحصائيات الأداء لكل مسار (اسم URL) داخل العملية الحالية:
+    نافذة متحركة بآخر PERFORMANCE_WINDOW طلب، والعدد الكلي، وعينات الطلبات البطيئة.
+    كل عملية (worker) تحتفظ بإحصائياتها الخاصة.
+    """
+
+    def __init__(self, window=PERFORMANCE_WINDOW, slow_samples=PERFORMANCE_SLOW_SAMPLES):
+        self.window = window
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.totals = {}
+        self.slow = deque(maxlen=slow_samples)
+        self.started_at = timezone.now()
+
+    def record(self, route, wall_ms, metrics, response_bytes, status):
+        sample = (wall_ms, metrics.queries, metrics.db_ms, metrics.template_ms, response_bytes or 0, status)
+        with self.lock:
+            samples = self.routes.get(route)
+            if samples is None:
+                samples = self.routes[route] = deque(maxlen=self.window)
+            samples.append(sample)
+            self.totals[route] = self.totals.get(route, 0) + 1
+
+    def record_slow(self, sample):
+        with self.lock:
+            self.slow.append(sample)
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+            self.totals.clear()
+            self.slow.clear()
+            self.started_at = timezone.now()
+
+    def snapshot(self):
+        with self.lock:
+            routes = {route: list(samples) for route, samples in self.routes.items()}
+            totals = dict(self.totals)
+            slow = list(self.slow)
+            started_at = self.started_at
+
+        result = {}
+        for route, samples in sorted(routes.items()):
+            wall, queries, db, template, size, status = zip(*samples)
+            result[route] = {
+                'requests': totals[route],
+                'window': len(samples),
+                'wall_ms': _summary(wall),
+                'histogram_ms': _histogram(wall),
+                'queries': _summary(queries),
+                'db_ms': _summary(db),
+                'template_ms': _summary(template),
+                'response_bytes': _summary(size),
+                'errors': sum(1 for code in status if code >= 500),
+            }
+        return {'started_at': started_at.isoformat(), 'routes': result, 'slow_requests': slow}
+
+
+stats = PerformanceStats()
+
+
+def server_timing(wall_ms, metrics):
+    """
+    قيمة ترويسة Server-Timing (تظهر في أدوات المطور بالمتصفح).
+    """
+    return ', '.join([
+        f'db;dur={metrics.db_ms:.1f};desc="{metrics.queries} queries"',
+        f'tpl;dur={metrics.template_ms:.1f}',
+        f'total;dur={wall_ms:.1f}',
+    ])
+
+
+def slow_request_sample(request, route, wall_ms, metrics, status):
+    user = getattr(request, 'user', None)
+    sample = {
+        'at': timezone.now().isoformat(),
+        'route': route,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': status,
+        'user': user.pk if user is not None and user.is_authenticated else None,
+        'wall_ms': round(wall_ms, 1),
+        'db_ms': round(metrics.db_ms, 1),
+        'template_ms': round(metrics.template_ms, 1),
+        'queries': metrics.queries,
+        'slowest_queries': metrics.slowest_statements(),
+    }
+    logger.warning('Slow request %s %s: %.0f ms, %d queries', request.method, route, wall_ms, metrics.queries)
+    return sample
@@ -0,0 +1,36 @@
+MANAGERS = 'Managers'
+INSPECTORS = 'Inspectors'
+
+
+def get_user_roles(user):
+    """
+    يعيد أسماء مجموعات المستخدم كـ frozenset.
+    تُحمّل مرة واحدة لكل طلب وتُخزن على كائن المستخدم نفسه، فلا تبقى بعد انتهاء الطلب
+    ويظهر أي تغيير في عضوية المجموعات من الطلب التالي.
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, '_role_names', None)
+    if roles is None:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        user._role_names = roles
+    return roles
+
+
+def has_role(user, *names):
+    roles = get_user_roles(user)
+    return any(name in roles for name in names)
+
+
+def invalidate_user_roles(user):
+    """
+    يبطل الأدوار المحفوظة على كائن المستخدم بعد تعديل مجموعاته داخل نفس الطلب.
+    """
+    user.__dict__.pop('_role_names', None)
+
+
+def user_groups_changed(sender, instance, action, reverse, **kwargs):
+    # user.groups.add(...) / remove / clear: كائنات المستخدمين الأخرى تُحمّل من جديد في طلباتها
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        invalidate_user_roles(instance)
@@ -0,0 +1,224 @@
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    ComplianceRollup, Company, Inspection, InspectionDailyStats,
+    COMPLIANCE_CHOICES, VIOLATION_CHOICES, REGULATIONS_CHOICES,
+)
+
+# التقارير المعتمدة فقط تدخل في جداول التجميع
+ROLLUP_STATUSES = ('approved', 'archived')
+
+# بنود قائمة الفحص ذات الخيارات (مطابقة / مخالفة / يوجد) التي تُعد قيمها
+ROLLUP_FIELDS = [
+    field.name for field in Inspection._meta.get_fields()
+    if getattr(field, 'choices', None) in (COMPLIANCE_CHOICES, VIOLATION_CHOICES, REGULATIONS_CHOICES)
+]
+
+def _snapshot_queryset():
+    return Inspection.objects.values(
+        'status', 'inspection_date', 'inspector_id', *ROLLUP_FIELDS,
+        region=F('company__region'),
+        establishment_type=F('company__establishment_type'),
+    )
+
+
+def inspection_snapshot(pk):
+    """
+    القيم المخزنة حالياً في قاعدة البيانات للتقرير (قبل الحفظ).
+    """
+    return _snapshot_queryset().filter(pk=pk).first()
+
+
+def instance_snapshot(inspection):
+    try:
+        company = inspection.company
+    except Company.DoesNotExist:
+        return None
+    snapshot = {
+        'status': inspection.status,
+        'inspection_date': inspection.inspection_date,
+        'inspector_id': inspection.inspector_id,
+        'region': company.region,
+        'establishment_type': company.establishment_type,
+    }
+    snapshot.update({field: getattr(inspection, field) for field in ROLLUP_FIELDS})
+    return snapshot
+
+
+def _contribution(snapshot):
+    """
+    مساهمة التقرير في جداول التجميع: (المفتاح، [(البند، القيمة)]) أو None إذا لم يكن معتمداً.
+    """
+    if not snapshot or snapshot['status'] not in ROLLUP_STATUSES or snapshot['inspection_date'] is None:
+        return None
+    key = {
+        'date': timezone.localdate(snapshot['inspection_date']),
+        'region': snapshot['region'] or '',
+        'inspector_id': snapshot['inspector_id'],
+        'establishment_type': snapshot['establishment_type'] or '',
+    }
+    values = [(field, snapshot[field]) for field in ROLLUP_FIELDS if snapshot[field]]
+    return key, values
+
+
+def _bump(key, values, delta):
+    # إنشاء الصفوف الناقصة بصفر ثم زيادتها بتحديث ذري واحد لكل جدول
+    InspectionDailyStats.objects.bulk_create([InspectionDailyStats(**key)], ignore_conflicts=True)
+    InspectionDailyStats.objects.filter(**key).update(inspections_count=F('inspections_count') + delta)
+    if not values:
+        return
+    ComplianceRollup.objects.bulk_create(
+        [ComplianceRollup(field=field, value=value, **key) for field, value in values],
+        ignore_conflicts=True,
+    )
+    matches = Q()
+    for field, value in values:
+        matches |= Q(field=field, value=value)
+    ComplianceRollup.objects.filter(matches, **key).update(count=F('count') + delta)
+
+
+def apply_change(old, new):
+    """
+    يطبق الفرق بين حالتي التقرير (قبل وبعد) على جداول التجميع.
+    """
+    old_contribution = _contribution(old)
+    new_contribution = _contribution(new)
+    if old_contribution == new_contribution:
+        return
+    with transaction.atomic():
+        if old_contribution:
+            _bump(*old_contribution, -1)
+        if new_contribution:
+            _bump(*new_contribution, 1)
+
+
+def inspection_pre_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._rollup_previous = inspection_snapshot(instance.pk) if instance.pk else None
+
+
+def inspection_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    was_counted = previous is not None and previous['status'] in ROLLUP_STATUSES
+    # لا حاجة لأي تحديث إذا لم يكن التقرير معتمداً قبل الحفظ أو بعده
+    if not was_counted and instance.status not in ROLLUP_STATUSES:
+        return
+    apply_change(previous, instance_snapshot(instance))
+    instance._rollup_previous = None
+
+
+def inspection_post_delete(sender, instance, **kwargs):
+    if instance.status in ROLLUP_STATUSES:
+        apply_change(instance_snapshot(instance), None)
+
+
+# حقول المنشأة التي تدخل في مفاتيح جداول التجميع
+COMPANY_KEY_FIELDS = ('region', 'establishment_type')
+
+
+def company_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._rollup_previous = None
+    if raw or not instance.pk:
+        return
+    if update_fields is not None and not set(update_fields) & set(COMPANY_KEY_FIELDS):
+        return
+    instance._rollup_previous = Company.objects.filter(pk=instance.pk).values(*COMPANY_KEY_FIELDS).first()
+
+
+def company_post_save(sender, instance, raw=False, **kwargs):
+    """
+    تغيير منطقة المنشأة أو نوعها ينقل تقاريرها المعتمدة من المفتاح القديم إلى الجديد،
+    حتى لا يُطرح لاحقاً من مفتاح لم تُضف إليه (عند تعديل التقرير أو حذفه).
+    """
+    previous = getattr(instance, '_rollup_previous', None)
+    instance._rollup_previous = None
+    if raw or previous is None:
+        return
+    current = {field: getattr(instance, field) for field in COMPANY_KEY_FIELDS}
+    if previous == current:
+        return
+    with transaction.atomic():
+        for snapshot in _snapshot_queryset().filter(company=instance, status__in=ROLLUP_STATUSES):
+            apply_change({**snapshot, **previous}, {**snapshot, **current})
+
+
+def rebuild_rollups(start_date=None, end_date=None):
+    """
+    يعيد بناء جداول التجميع من جدول التقارير (للفترة المحددة أو بالكامل).
+    يُستخدم بعد أي تحديث جماعي لا يمر عبر save() (مثل QuerySet.update على المنطقة أو النوع).
+    يعيد عدد صفوف (الإحصائيات اليومية، تجميع البنود).
+    """
+    inspections = Inspection.objects.filter(status__in=ROLLUP_STATUSES).annotate(
+        date=TruncDate('inspection_date'),
+    )
+    daily = InspectionDailyStats.objects.all()
+    compliance = ComplianceRollup.objects.all()
+    if start_date:
+        inspections = inspections.filter(date__gte=start_date)
+        daily = daily.filter(date__gte=start_date)
+        compliance = compliance.filter(date__gte=start_date)
+    if end_date:
+        inspections = inspections.filter(date__lte=end_date)
+        daily = daily.filter(date__lte=end_date)
+        compliance = compliance.filter(date__lte=end_date)
+
+    key_lookups = {
+        'region': F('company__region'),
+        'establishment_type': F('company__establishment_type'),
+    }
+    with transaction.atomic():
+        daily.delete()
+        compliance.delete()
+
+        daily_rows = [
+            InspectionDailyStats(**row)
+            for row in inspections.order_by().values('date', 'inspector_id', **key_lookups).annotate(inspections_count=Count('pk'))
+        ]
+        InspectionDailyStats.objects.bulk_create(daily_rows, batch_size=1000)
+
+        compliance_count = 0
+        for field in ROLLUP_FIELDS:
+            rows = (
+                inspections.exclude(**{field: ''})
+                .order_by()
+                .values('date', 'inspector_id', field, **key_lookups)
+                .annotate(count=Count('pk'))
+            )
+            objects = [ComplianceRollup(field=field, value=row.pop(field), **row) for row in rows]
+            ComplianceRollup.objects.bulk_create(objects, batch_size=1000)
+            compliance_count += len(objects)
+    return len(daily_rows), compliance_count
+
+
+def regional_violation_summary(inspectors=None, start_date=None, end_date=None):
+    """
+    ملخص المخالفات حسب المنطقة من جداول التجميع بدلاً من المرور على جميع التقارير.
+    يعيد قائمة قواميس: المنطقة، عدد التقارير، وعدد القيم لكل (بند، قيمة).
+    """
+    daily = InspectionDailyStats.objects.all()
+    compliance = ComplianceRollup.objects.all()
+    if inspectors is not None:
+        daily = daily.filter(inspector__in=inspectors)
+        compliance = compliance.filter(inspector__in=inspectors)
+    if start_date:
+        daily = daily.filter(date__gte=start_date)
+        compliance = compliance.filter(date__gte=start_date)
+    if end_date:
+        daily = daily.filter(date__lte=end_date)
+        compliance = compliance.filter(date__lte=end_date)
+
+    regions = {
+        row['region']: {'region': row['region'], 'inspections': row['total'], 'values': {}}
+        for row in daily.order_by('region').values('region').annotate(total=Sum('inspections_count'))
+        if row['total']
+    }
+    for row in compliance.order_by().values('region', 'field', 'value').annotate(total=Sum('count')):
+        if row['region'] in regions:
+            regions[row['region']]['values'][(row['field'], row['value'])] = row['total']
+    return list(regions.values())
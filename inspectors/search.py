@@ -0,0 +1,241 @@
+from auditlog.models import LogEntry
+from django.db import connection
+from django.db.models import FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .arabic import normalize_arabic
+from .models import Company, Inspection, SearchEntry, User
+
+# جدول FTS5 في SQLite (بمقسم trigram منذ migration 0020)
+FTS_TABLE = 'inspectors_search_fts'
+# مقسم trigram لا يطابق أقل من ثلاثة أحرف، فالكلمات الأقصر تُطابق بـ contains
+FTS_MIN_TOKEN_LENGTH = 3
+
+# مصادر الفهرس: النوع -> (النموذج، الحقول التي يتكون منها النص المفهرس)
+SEARCH_SOURCES = {
+    'company': (Company, ['company_name', 'company_number', 'region', 'street_name', 'activity_type']),
+    'user': (User, ['first_name', 'last_name', 'username', 'email', 'user_id']),
+    'inspection': (Inspection, [
+        'company__company_name', 'company__company_number', 'company__region',
+        'inspector__first_name', 'inspector__last_name', 'inspector__username', 'inspector__user_id',
+    ]),
+    'logentry': (LogEntry, ['object_repr']),
+}
+
+_sqlite_fts = None
+
+
+def _strip_article(token):
+    # "الرياض" تطابق "رياض"
+    if token.startswith('ال') and len(token) > 3:
+        return token[2:]
+    return token
+
+
+def build_document(values):
+    """
+    النص المفهرس: الكلمات المطبّعة مع نسخة بدون "ال" التعريف.
+    """
+    tokens = normalize_arabic(' '.join(str(value) for value in values if value)).split()
+    extra = [_strip_article(token) for token in tokens if _strip_article(token) != token]
+    return ' '.join(tokens + extra)
+
+
+def query_tokens(query):
+    return [_strip_article(token) for token in normalize_arabic(query).split()]
+
+
+def _sqlite_fts_available():
+    global _sqlite_fts
+    if _sqlite_fts is None:
+        _sqlite_fts = FTS_TABLE in connection.introspection.table_names()
+    return _sqlite_fts
+
+
+def _backend():
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite' and _sqlite_fts_available():
+        return 'fts5'
+    return 'basic'
+
+
+def _contains_all(tokens):
+    condition = Q()
+    for token in tokens:
+        condition &= Q(document__contains=token)
+    return condition
+
+
+def _fts_tokens(tokens):
+    return [token for token in tokens if len(token) >= FTS_MIN_TOKEN_LENGTH]
+
+
+def search_ids(kind, query):
+    """
+    استعلام فرعي بأرقام العناصر المطابقة (لاستخدامه مع pk__in).
+    جميع قواعد البيانات تطابق بنفس الطريقة: كل كلمة من البحث جزء من النص المفهرس (مثل icontains).
+    """
+    tokens = query_tokens(query)
+    entries = SearchEntry.objects.filter(kind=kind)
+    if not tokens:
+        return entries.values('object_id')
+    backend = _backend()
+    if backend == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+
+        tsquery = SearchQuery(' & '.join(f"'{token}':*" for token in tokens), search_type='raw', config='simple')
+        # tsvector للبحث ببداية الكلمة، والمطابقة الجزئية تستخدم فهرس trigram
+        entries = entries.annotate(vector=SearchVector('document', config='simple')).filter(
+            Q(vector=tsquery) | _contains_all(tokens)
+        )
+    elif backend == 'fts5':
+        indexed = _fts_tokens(tokens)
+        if indexed:
+            entries = entries.filter(id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [_fts_query(indexed)]
+            ))
+        entries = entries.filter(_contains_all([token for token in tokens if token not in indexed]))
+    else:
+        entries = entries.filter(_contains_all(tokens))
+    return entries.values('object_id')
+
+
+def _fts_query(tokens):
+    # مع trigram تطابق العبارة بين علامتي التنصيص أي جزء من النص
+    return ' AND '.join(f'"{token}"' for token in tokens)
+
+
+def _rank(queryset, kind, tokens):
+    backend = _backend()
+    if backend == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        tsquery = SearchQuery(' & '.join(f"'{token}':*" for token in tokens), search_type='raw', config='simple')
+        # double precision حتى تبقى قيمة الترتيب مطابقة عند استخدامها في مؤشر الصفحات
+        rank = Cast(SearchRank(SearchVector('document', config='simple'), tsquery), FloatField())
+        return Subquery(
+            SearchEntry.objects.filter(kind=kind, object_id=OuterRef('pk')).annotate(rank=rank).values('rank')[:1],
+            output_field=FloatField(),
+        )
+    if backend == 'fts5' and _fts_tokens(tokens):
+        outer = f'"{queryset.model._meta.db_table}"."{queryset.model._meta.pk.column}"'
+        return RawSQL(
+            f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = "
+            f"(SELECT id FROM {SearchEntry._meta.db_table} WHERE kind = %s AND object_id = {outer})",
+            [_fts_query(_fts_tokens(tokens)), kind],
+            output_field=FloatField(),
+        )
+    return Value(0.0, output_field=FloatField())
+
+
+def search_queryset(queryset, kind, query):
+    """
+    يصفّي الاستعلام بالعناصر المطابقة للبحث ويضيف search_rank (الأعلى = الأكثر صلة).
+    """
+    tokens = query_tokens(query)
+    if not tokens:
+        return queryset
+    return queryset.filter(pk__in=search_ids(kind, query)).annotate(search_rank=_rank(queryset, kind, tokens))
+
+
+def search_ordering(request, param, ordering, query):
+    """
+    عند البحث بدون اختيار ترتيب صريح تُرتب النتائج حسب الصلة أولاً.
+    """
+    if query and query_tokens(query) and param not in request.GET:
+        return ['-search_rank', ordering]
+    return ordering
+
+
+# تحديث الفهرس
+
+def _document_for_instance(kind, instance):
+    values = []
+    for lookup in SEARCH_SOURCES[kind][1]:
+        value = instance
+        for part in lookup.split('__'):
+            value = getattr(value, part, None) if value is not None else None
+        values.append(value)
+    return build_document(values)
+
+
+def index_object(kind, instance):
+    """
+    يحدّث عنصر الفهرس لكائن واحد. يعيد True إذا تغير النص المفهرس.
+    """
+    document = _document_for_instance(kind, instance)
+    entry = SearchEntry.objects.filter(kind=kind, object_id=instance.pk).first()
+    if entry is None:
+        SearchEntry.objects.create(kind=kind, object_id=instance.pk, document=document)
+        return True
+    if entry.document == document:
+        return False
+    entry.document = document
+    entry.save(update_fields=['document'])
+    return True
+
+
+def reindex(kind, queryset=None, batch_size=1000):
+    """
+    يعيد فهرسة مجموعة عناصر (أو جميع عناصر النوع) على دفعات. يعيد عدد العناصر.
+    """
+    model, lookups = SEARCH_SOURCES[kind]
+    if queryset is None:
+        queryset = model.objects.all()
+    count = 0
+    batch = []
+
+    def flush():
+        ids = [entry.object_id for entry in batch]
+        SearchEntry.objects.filter(kind=kind, object_id__in=ids).delete()
+        SearchEntry.objects.bulk_create(batch)
+        batch.clear()
+
+    for row in queryset.order_by().values_list('pk', *lookups).iterator(chunk_size=batch_size):
+        batch.append(SearchEntry(kind=kind, object_id=row[0], document=build_document(row[1:])))
+        count += 1
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return count
+
+
+def remove_object(kind, pk):
+    SearchEntry.objects.filter(kind=kind, object_id=pk).delete()
+
+
+def company_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # تقارير المنشأة تحمل اسمها في نصها المفهرس
+    if index_object('company', instance) and not kwargs.get('created'):
+        reindex('inspection', Inspection.objects.filter(company=instance))
+
+
+def user_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # تحديث last_login عند كل تسجيل دخول لا يغير النص المفهرس
+    if update_fields and not set(update_fields) & set(SEARCH_SOURCES['user'][1]):
+        return
+    if index_object('user', instance) and not kwargs.get('created'):
+        reindex('inspection', Inspection.objects.filter(inspector=instance))
+
+
+def inspection_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_object('inspection', instance)
+
+
+def logentry_saved(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        SearchEntry.objects.create(kind='logentry', object_id=instance.pk, document=build_document([instance.object_repr]))
+
+
+def object_deleted(sender, instance, **kwargs):
+    for kind, (model, _) in SEARCH_SOURCES.items():
+        if isinstance(instance, model):
+            remove_object(kind, instance.pk)
@@ -0,0 +1,132 @@
+import hashlib
+import os
+from collections import Counter
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+# مجلد الملفات داخل MEDIA_ROOT: blobs/ab/<sha256>.jpg
+BLOBS_DIR = 'blobs'
+
+
+def content_digest(content):
+    """
+    بصمة SHA-256 وحجم الملف بقراءته على أجزاء (دون تحميله كاملاً في الذاكرة).
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        sha256.update(chunk)
+        size += len(chunk)
+    return sha256.hexdigest(), size
+
+
+def blob_name(digest, original_name):
+    extension = os.path.splitext(original_name)[1].lower()
+    return f'{BLOBS_DIR}/{digest[:2]}/{digest}{extension}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    تخزين صور المنشآت والتقارير حسب محتواها: كل ملف يُحفظ مرة واحدة باسم بصمته،
+    وجدول MediaBlob يعد المراجع إليه. كل save يضيف مرجعاً وكل delete يحذف مرجعاً،
+    ولا يُحذف الملف من القرص إلا عند حذف آخر مرجع.
+    الملفات القديمة (المحفوظة قبل هذا التخزين) ليس لها سجل وتُحذف مباشرة كما في FileSystemStorage.
+    """
+
+    def save(self, name, content, max_length=None):
+        from .models import MediaBlob
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest, size = content_digest(content)
+        name = blob_name(digest, name)
+
+        with transaction.atomic():
+            blob, _ = MediaBlob.objects.select_for_update().get_or_create(
+                name=name, defaults={'sha256': digest, 'size': size},
+            )
+            if not self.exists(name):
+                content.seek(0)
+                name = self._save(name, content)
+            MediaBlob.objects.filter(pk=blob.pk).update(references=F('references') + 1)
+        return name
+
+    def delete(self, name):
+        from .models import MediaBlob
+
+        if not name:
+            return
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.references > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(references=F('references') - 1)
+                return
+            if blob is not None:
+                blob.delete()
+            super().delete(name)
+
+
+media_storage = ContentAddressedStorage()
+
+
+def image_storage():
+    # دالة بدلاً من الكائن حتى لا تتغير ملفات الترحيل مع إعدادات التخزين
+    return media_storage
+
+
+def referenced_names():
+    """
+    عدد مرات الإشارة إلى كل ملف في حقول الصور (الأصل ونسخة العرض والمصغرة)
+    وفي عمليات الرفع المكتملة التي لم تُربط بتقرير بعد.
+    """
+    from .models import CompanyImage, InspectionImage, PhotoUpload
+
+    counts = Counter()
+    for model in (CompanyImage, InspectionImage):
+        for names in model.objects.values_list('image', 'display', 'thumbnail').iterator():
+            counts.update(name for name in names if name)
+    counts.update(PhotoUpload.objects.exclude(blob='').values_list('blob', flat=True).iterator())
+    return counts
+
+
+def rebuild_references(dry_run=False):
+    """
+    يعيد حساب عدد المراجع لكل ملف من الصفوف الفعلية (بعد الإدخال الجماعي أو أي خلل في العد)،
+    ويحذف الملفات التي لم يعد يشير إليها أي صف.
+    يعيد (عدد السجلات المصححة، عدد الملفات المحذوفة).
+    """
+    from .models import MediaBlob
+
+    counts = referenced_names()
+    fixed = removed = 0
+    with transaction.atomic():
+        known = set()
+        for blob in MediaBlob.objects.select_for_update().iterator():
+            known.add(blob.name)
+            references = counts.get(blob.name, 0)
+            if references == 0:
+                removed += 1
+                if not dry_run:
+                    blob.delete()
+                    FileSystemStorage.delete(media_storage, blob.name)
+            elif references != blob.references:
+                fixed += 1
+                if not dry_run:
+                    MediaBlob.objects.filter(pk=blob.pk).update(references=references)
+
+        missing = [name for name in counts if name.startswith(f'{BLOBS_DIR}/') and name not in known and media_storage.exists(name)]
+        fixed += len(missing)
+        if not dry_run:
+            MediaBlob.objects.bulk_create([
+                MediaBlob(name=name, sha256=os.path.splitext(os.path.basename(name))[0],
+                          size=media_storage.size(name), references=counts[name])
+                for name in missing
+            ])
+    return fixed, removed
@@ -0,0 +1,356 @@
+import datetime
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.forms.models import model_to_dict
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .forms import InspectionForm
+from .images import attach_stored_image
+from .models import Company, Inspection, InspectionImage
+from .notifications import dispatch_notifications
+from .uploads import EDITABLE_STATUSES, claim_upload
+
+# أقصى عدد عمليات في طلب مزامنة واحد
+SYNC_MAX_OPERATIONS = getattr(settings, 'SYNC_MAX_OPERATIONS', 100)
+
+COMPANY_FIELDS = (
+    'id', 'company_name', 'company_number', 'region', 'street_name', 'building_number', 'activity_type',
+    'electricity_meter_number', 'actual_workers_count', 'establishment_type', 'size_description',
+    'status_by_inspector', 'updated_at',
+)
+FORM_FIELDS = tuple(InspectionForm._meta.fields)
+INSPECTION_FIELDS = ('id', 'company_id', 'status', 'sync_id', 'inspection_date', 'updated_at') + FORM_FIELDS
+# التقارير التي تُرسل لتطبيق المفتش: القابلة للتعديل، والمرسلة للمراجعة لعرض حالتها
+SYNC_INSPECTION_STATUSES = EDITABLE_STATUSES + ('pending_approval',)
+# حالات التعيين التي يمكن فيها قبول المهمة أو كتابة تقرير لها
+ACCEPTABLE_ASSIGNMENT_STATUSES = ('not_assigned', 'assigned')
+WORKING_ASSIGNMENT_STATUSES = ('accepted', 'in_progress')
+
+
+class SyncError(Exception):
+    pass
+
+
+class Conflict(Exception):
+    """
+    السجل تغير على الخادم بعد آخر مزامنة (نسخة updated_at مختلفة): تُعاد حالته الحالية للتطبيق.
+    """
+
+    def __init__(self, current):
+        super().__init__('conflict')
+        self.current = current
+
+
+class OperationError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors if isinstance(errors, dict) else {'__all__': [str(errors)]}
+
+
+def version(value):
+    return value.isoformat() if value else None
+
+
+def _json(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _table(queryset, fields):
+    # صيغة مضغوطة: أسماء الحقول مرة واحدة ثم صف قيم لكل سجل
+    return {
+        'fields': list(fields),
+        'rows': [[_json(value) for value in row] for row in queryset.values_list(*fields)],
+    }
+
+
+def _state(instance, fields):
+    return {name: _json(getattr(instance, name)) for name in fields}
+
+
+def company_state(company):
+    return _state(company, COMPANY_FIELDS)
+
+
+def inspection_state(inspection):
+    return _state(inspection, INSPECTION_FIELDS)
+
+
+def form_schema():
+    """
+    وصف حقول نموذج التقرير ليعرضه التطبيق دون اتصال (الاسم، العنوان، الإلزام، الخيارات).
+    """
+    schema = []
+    for name, field in InspectionForm().fields.items():
+        choices = getattr(field, 'choices', None)
+        schema.append({
+            'name': name,
+            'label': str(field.label),
+            'required': field.required,
+            'max_length': getattr(field, 'max_length', None),
+            'choices': [[value, str(label)] for value, label in choices if value != ''] if choices else None,
+        })
+    return schema
+
+
+def pull(user, since=None):
+    """
+    بيانات المفتش للعمل دون اتصال: المنشآت المسندة إليه وتقاريره المفتوحة.
+    مع since تُرسل السجلات المتغيرة بعده فقط، وقوائم المعرفات الكاملة ليحذف التطبيق ما لم يعد مسنداً إليه.
+    server_time يُرسل كـ since في المزامنة التالية.
+    """
+    server_time = timezone.now()
+    companies = Company.objects.filter(assigned_to=user, status='active').order_by('pk')
+    inspections = Inspection.objects.filter(inspector=user, status__in=SYNC_INSPECTION_STATUSES).order_by('pk')
+    payload = {
+        'server_time': version(server_time),
+        'company_ids': list(companies.values_list('pk', flat=True)),
+        'inspection_ids': list(inspections.values_list('pk', flat=True)),
+    }
+    if since is not None:
+        companies = companies.filter(updated_at__gt=since)
+        inspections = inspections.filter(updated_at__gt=since)
+    else:
+        payload['schema'] = form_schema()
+    payload['companies'] = _table(companies, COMPANY_FIELDS)
+    payload['inspections'] = _table(inspections, INSPECTION_FIELDS)
+    return payload
+
+
+class _Batch:
+    def __init__(self, user):
+        self.user = user
+        self.notifications = []
+        # التقارير المحفوظة في هذه الدفعة: يمكن إرسالها للمراجعة دون رقم نسخة
+        self.touched = set()
+
+
+def _check_version(instance, operation, state):
+    value = operation.get('version')
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise OperationError({'version': ['رقم النسخة (version) مطلوب.']})
+    if parsed != instance.updated_at:
+        raise Conflict(state(instance))
+
+
+def _assigned_company(batch, operation):
+    company = (
+        Company.objects.select_for_update()
+        .select_related('manager')
+        .filter(pk=operation.get('company'), assigned_to=batch.user, status='active')
+        .first()
+    )
+    if company is None:
+        raise OperationError('المنشأة غير موجودة أو غير مسندة إليك.')
+    return company
+
+
+def _sync_id(operation):
+    value = operation.get('sync_id')
+    if value in (None, ''):
+        return None
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise OperationError({'sync_id': ['معرف المزامنة غير صحيح.']})
+
+
+def _own_inspection(batch, operation):
+    queryset = Inspection.objects.select_for_update().select_related('company', 'company__manager').filter(inspector=batch.user)
+    if operation.get('inspection'):
+        inspection = queryset.filter(pk=operation['inspection']).first()
+    else:
+        sync_id = _sync_id(operation)
+        inspection = queryset.filter(sync_id=sync_id).first() if sync_id else None
+    if inspection is None:
+        raise OperationError('التقرير غير موجود.')
+    return inspection
+
+
+def _inspection_result(inspection):
+    return {'inspection': inspection.pk, 'sync_id': _json(inspection.sync_id), 'version': version(inspection.updated_at)}
+
+
+def accept_assignment(batch, operation):
+    company = _assigned_company(batch, operation)
+    if company.status_by_inspector in WORKING_ASSIGNMENT_STATUSES:
+        # قُبلت من قبل (مثلاً إعادة إرسال الدفعة نفسها)
+        return {'company': company.pk, 'version': version(company.updated_at)}
+    _check_version(company, operation, company_state)
+    if company.status_by_inspector not in ACCEPTABLE_ASSIGNMENT_STATUSES:
+        raise Conflict(company_state(company))
+    company.status_by_inspector = 'accepted'
+    company.save()
+    batch.notifications.append((
+        company.manager, 'تم قبول مهمة',
+        f"المفتش {batch.user.username} قام بقبول مهمة {company.company_name}.", company,
+    ))
+    return {'company': company.pk, 'version': version(company.updated_at)}
+
+
+def decline_assignment(batch, operation):
+    reason = str(operation.get('reason') or '').strip()
+    if not reason:
+        raise OperationError({'reason': ['سبب الرفض مطلوب.']})
+    company = _assigned_company(batch, operation)
+    _check_version(company, operation, company_state)
+    company.status_by_inspector = 'declined'
+    company.decline_reason = reason
+    company.assigned_to = None
+    company.save()
+    batch.notifications.append((
+        company.manager, 'تم رفض مهمة',
+        f"المفتش {batch.user.username} قام برفض مهمة {company.company_name}. سبب الرفض: {reason}", company,
+    ))
+    return {'company': company.pk, 'version': version(company.updated_at)}
+
+
+def _claim_images(batch, operation, inspection_id):
+    images = operation.get('images') or []
+    if not isinstance(images, list):
+        raise OperationError({'images': ['يجب أن تكون الصور قائمة.']})
+    claimed = []
+    seen = set()
+    for item in images:
+        item = item if isinstance(item, dict) else {'upload': item}
+        try:
+            upload_id = uuid.UUID(str(item.get('upload')))
+        except ValueError:
+            upload_id = None
+        if upload_id in seen:
+            raise OperationError({'images': [f"الصورة {item.get('upload')} مكررة."]})
+        seen.add(upload_id)
+        # claim_upload يقفل السجل حتى نهاية معاملة العملية
+        upload = claim_upload(batch.user, upload_id, inspection_id) if upload_id else None
+        if upload is None:
+            raise OperationError({'images': [f"الصورة {item.get('upload')} غير موجودة أو لم يكتمل رفعها."]})
+        claimed.append((upload, str(item.get('description') or '')[:255]))
+    return claimed
+
+
+def save_draft(batch, operation):
+    """
+    ينشئ مسودة تقرير أو يعدلها. data تحوي الحقول المتغيرة فقط عند تعديل تقرير موجود.
+    """
+    sync_id = _sync_id(operation)
+    inspection = None
+    if operation.get('inspection'):
+        inspection = _own_inspection(batch, operation)
+    elif sync_id:
+        # sync_id فريد على مستوى الجدول، فيُبحث عنه لدى جميع المفتشين قبل الإنشاء
+        inspection = Inspection.objects.select_for_update().select_related('company').filter(sync_id=sync_id).first()
+        if inspection is not None and inspection.inspector_id != batch.user.pk:
+            raise OperationError({'sync_id': ['معرف المزامنة مستخدم لتقرير آخر.']})
+        if inspection is not None and not operation.get('version'):
+            # المسودة أُنشئت في إرسال سابق لنفس الدفعة ولم تصل الاستجابة للتطبيق
+            return _inspection_result(inspection)
+
+    if inspection is not None:
+        if inspection.status not in EDITABLE_STATUSES:
+            raise Conflict(inspection_state(inspection))
+        _check_version(inspection, operation, inspection_state)
+        company = inspection.company
+    else:
+        company = _assigned_company(batch, operation)
+        if company.status_by_inspector not in WORKING_ASSIGNMENT_STATUSES:
+            raise OperationError('يجب قبول المهمة أولاً.')
+
+    data = operation.get('data') or {}
+    if not isinstance(data, dict):
+        raise OperationError({'data': ['يجب أن تكون البيانات كائناً.']})
+    initial = model_to_dict(inspection, fields=FORM_FIELDS) if inspection is not None else {}
+    form = InspectionForm({**initial, **data}, instance=inspection)
+    if not form.is_valid():
+        raise OperationError({field: list(errors) for field, errors in form.errors.items()})
+    claimed = _claim_images(batch, operation, inspection.pk if inspection is not None else None)
+
+    inspection = form.save(commit=False)
+    adding = inspection._state.adding
+    if adding:
+        inspection.inspector = batch.user
+        inspection.company = company
+        inspection.status = 'draft'
+        inspection.sync_id = sync_id
+    inspection.save()
+    for upload, description in claimed:
+        image = InspectionImage(inspection=inspection, description=description)
+        attach_stored_image(image, upload.blob)
+        image.save()
+        upload.delete()
+
+    if adding and company.status_by_inspector == 'accepted':
+        company.status_by_inspector = 'in_progress'
+        company.save()
+    batch.touched.add(inspection.pk)
+    return _inspection_result(inspection)
+
+
+def submit_for_review(batch, operation):
+    inspection = _own_inspection(batch, operation)
+    if inspection.status == 'pending_approval':
+        return _inspection_result(inspection)
+    if inspection.status != 'draft':
+        raise Conflict(inspection_state(inspection))
+    if inspection.pk not in batch.touched:
+        _check_version(inspection, operation, inspection_state)
+    inspection.status = 'pending_approval'
+    inspection.save()
+    company = inspection.company
+    batch.notifications.append((
+        company.manager, 'تقرير جديد للمراجعة',
+        f"المفتش {batch.user.username} قام بإكمال التقرير الخاص بمنشأة {company.company_name}.", company,
+    ))
+    return _inspection_result(inspection)
+
+
+OPERATIONS = {
+    'accept': accept_assignment,
+    'decline': decline_assignment,
+    'save_draft': save_draft,
+    'submit': submit_for_review,
+}
+
+
+def push(user, operations):
+    """
+    يطبق دفعة عمليات من تطبيق المفتش في معاملة واحدة. كل عملية في نقطة حفظ مستقلة:
+    العملية المتعارضة (conflict) أو غير الصحيحة (error) لا تُطبق ولا تمنع بقية الدفعة.
+    يعيد نتيجة لكل عملية بنفس الترتيب.
+    """
+    if not isinstance(operations, list):
+        raise SyncError('operations يجب أن تكون قائمة.')
+    if len(operations) > SYNC_MAX_OPERATIONS:
+        raise SyncError(f'الحد الأقصى {SYNC_MAX_OPERATIONS} عملية في الطلب الواحد.')
+
+    batch = _Batch(user)
+    results = []
+    with transaction.atomic():
+        for index, operation in enumerate(operations):
+            result = {'index': index}
+            handler = OPERATIONS.get(operation.get('op')) if isinstance(operation, dict) else None
+            try:
+                if handler is None:
+                    raise OperationError('نوع العملية غير معروف.')
+                with transaction.atomic():
+                    result.update(handler(batch, operation))
+                result['status'] = 'ok'
+            except Conflict as e:
+                result.update(status='conflict', current=e.current)
+            except OperationError as e:
+                result.update(status='error', errors=e.errors)
+            except (TypeError, ValueError):
+                # معرفات بصيغة غير صحيحة في بيانات العملية
+                result.update(status='error', errors={'__all__': ['بيانات العملية غير صحيحة.']})
+            except IntegrityError:
+                # مثل إنشاء نفس المسودة من طلبين متزامنين: نقطة الحفظ أُلغيت وتستمر بقية الدفعة
+                result.update(status='error', errors={'__all__': ['تعارضت العملية مع بيانات محفوظة. أعد المزامنة.']})
+            results.append(result)
+        dispatch_notifications(batch.notifications, sender=user, send_email=False)
+    return results
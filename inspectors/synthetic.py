@@ -0,0 +1,305 @@
+import io
+import random
+from datetime import timedelta
+
+from auditlog.models import LogEntry
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Company, CompanyImage, Inspection, InspectionImage, Notification, User,
+    COMPANY_TYPE_CHOICES, COMPLIANCE_CHOICES, GENDER_CHOICES, INSPECTOR_STATUS_CHOICES,
+    REGULATIONS_CHOICES, SHIFT_CHOICES, VIOLATION_CHOICES,
+)
+from .roles import INSPECTORS, MANAGERS
+from .rollups import rebuild_rollups
+from .search import reindex
+from .storage import media_storage, rebuild_references
+
+DEFAULT_BATCH_SIZE = 1000
+
+FIRST_NAMES = ['محمد', 'أحمد', 'عبدالله', 'خالد', 'فهد', 'سارة', 'نورة', 'ريم', 'عبدالرحمن', 'سلطان', 'هند', 'ماجد']
+LAST_NAMES = ['العتيبي', 'القحطاني', 'الشهري', 'الدوسري', 'الغامدي', 'الزهراني', 'المطيري', 'الحربي', 'السبيعي']
+# المناطق موزعة بشكل غير متساوٍ (أوزان تقريبية لعدد المنشآت)
+REGIONS = [('الرياض', 30), ('جدة', 22), ('مكة المكرمة', 12), ('الدمام', 10), ('المدينة المنورة', 8),
+           ('القصيم', 6), ('أبها', 5), ('تبوك', 4), ('حائل', 2), ('جازان', 1)]
+ACTIVITIES = ['تجارة التجزئة', 'مطاعم', 'مقاولات', 'صيانة سيارات', 'خياطة', 'مخابز', 'صيدلية', 'حلاقة', 'مستودعات']
+COMPANY_WORDS = ['مؤسسة', 'شركة', 'مصنع', 'محلات', 'ورشة', 'مكتب']
+COMPANY_NAMES = ['النور', 'الأمل', 'الريادة', 'الإتقان', 'البركة', 'الصفوة', 'الواحة', 'السلام', 'المستقبل', 'الخليج']
+
+# توزيع حالات التقارير
+INSPECTION_STATUS_WEIGHTS = [('approved', 40), ('archived', 20), ('pending_approval', 15), ('draft', 10), ('rejected', 10), ('deleted', 5)]
+# احتمال أن يكون بند الفحص مخالفاً
+VIOLATION_RATE = 0.15
+# نسبة الإشعارات المقروءة
+READ_NOTIFICATION_RATE = 0.6
+# المدى الزمني للبيانات المولدة (بالأيام)
+HISTORY_DAYS = 365
+
+
+def _pk_range(rows):
+    # نطاق الأرقام بدلاً من قائمة طويلة في IN (حد المتغيرات في SQLite)
+    pks = [row.pk for row in rows]
+    return min(pks), max(pks)
+
+
+class SyntheticDataGenerator:
+    """
+    يولد بيانات تجريبية بتوزيعات قريبة من الواقع للقياس والاختبار:
+    مدراء، مفتشون، منشآت، تقارير، صور، إشعارات وسجلات تدقيق.
+    الإدخال جماعي (bulk_create) مع تعبئة الأعمدة المطبّعة ثم تحديث فهرس البحث وجداول التجميع.
+    """
+
+    def __init__(self, prefix='synthetic', seed=None, batch_size=DEFAULT_BATCH_SIZE, log=None):
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+
+    def _weighted(self, choices):
+        values, weights = zip(*choices)
+        return self.random.choices(values, weights=weights)[0]
+
+    def _past(self, days=HISTORY_DAYS):
+        return self.now - timedelta(seconds=self.random.randint(0, days * 86400))
+
+    def _name(self):
+        return self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+
+    def _unique_start(self):
+        # يسمح بتشغيل المولد أكثر من مرة بنفس البادئة دون تعارض في الحقول الفريدة:
+        # الترقيم يبدأ بعد أكبر رقم مستخدم (وليس بعد العدد، حتى لا يتكرر رقم بعد حذف مستخدم مولد)
+        prefix = f'{self.prefix}-'
+        suffixes = [
+            int(user_id[len(prefix):])
+            for user_id in User.objects.filter(user_id__startswith=prefix).values_list('user_id', flat=True).iterator()
+            if user_id[len(prefix):].isdigit()
+        ]
+        return max(suffixes, default=-1) + 1
+
+    def create_users(self, count, group, supervisors=None):
+        start = self._unique_start()
+        # لا يمكن الدخول بالمستخدمين المولدين بكلمة مرور (القياس يستخدم force_login)
+        password = make_password(None)
+        users = []
+        for n in range(start, start + count):
+            first_name, last_name = self._name()
+            user = User(
+                username=f'{self.prefix}_{group.name.lower()}_{n}',
+                email=f'{self.prefix}_{n}@example.com',
+                phone_number=f'{self.prefix}-{n}',
+                user_id=f'{self.prefix}-{n}',
+                first_name=first_name,
+                last_name=last_name,
+                password=password,
+                supervisor=self.random.choice(supervisors) if supervisors else None,
+            )
+            user.set_normalized_fields()
+            users.append(user)
+        users = User.objects.bulk_create(users, batch_size=self.batch_size)
+        User.groups.through.objects.bulk_create(
+            [User.groups.through(user_id=user.pk, group_id=group.pk) for user in users],
+            batch_size=self.batch_size,
+        )
+        return users
+
+    def create_companies(self, count, managers, inspectors):
+        # حمل العمل غير متساوٍ: بعض المفتشين لديهم منشآت أكثر بكثير من غيرهم
+        weights = [1 / (rank + 1) for rank in range(len(inspectors))]
+        companies = []
+        for n in range(count):
+            assigned = self.random.choices(inspectors, weights=weights)[0] if self.random.random() < 0.9 else None
+            company = Company(
+                company_name=f'{self.random.choice(COMPANY_WORDS)} {self.random.choice(COMPANY_NAMES)} {n}',
+                company_number=str(self.random.randint(1000000, 9999999)),
+                region=self._weighted(REGIONS),
+                street_name=f'شارع {self.random.choice(COMPANY_NAMES)}',
+                building_number=str(self.random.randint(1, 9999)),
+                activity_type=self.random.choice(ACTIVITIES),
+                electricity_meter_number=str(self.random.randint(10 ** 8, 10 ** 9)),
+                actual_workers_count=int(self.random.lognormvariate(2, 1)),
+                establishment_type=self.random.choice(COMPANY_TYPE_CHOICES)[0],
+                size_description='-',
+                status='deleted' if self.random.random() < 0.05 else 'active',
+                manager=assigned.supervisor if assigned and assigned.supervisor else self.random.choice(managers),
+                assigned_to=assigned,
+                status_by_inspector=self.random.choice(INSPECTOR_STATUS_CHOICES[1:])[0] if assigned else 'not_assigned',
+            )
+            company.set_normalized_fields()
+            companies.append(company)
+        companies = Company.objects.bulk_create(companies, batch_size=self.batch_size)
+        # created_at يُعبأ تلقائياً عند الإنشاء، فيُحدّث بعده بتواريخ موزعة على الفترة
+        for company in companies:
+            company.created_at = self._past()
+        Company.objects.bulk_update(companies, ['created_at'], batch_size=self.batch_size)
+        return companies
+
+    def _checklist(self):
+        def pick(choices, bad):
+            if self.random.random() < VIOLATION_RATE:
+                return bad
+            return self.random.choice([value for value, _ in choices if value != bad])
+
+        return {
+            'workers_size_estimation': str(self.random.randint(1, 200)),
+            'license_compliance': pick(COMPLIANCE_CHOICES, 'non_compliant'),
+            'female_workers_element': self.random.choice(GENDER_CHOICES)[0],
+            'unlicensed_workers': pick(VIOLATION_CHOICES, 'violation'),
+            'penalties_regulation': pick(REGULATIONS_CHOICES, 'not_exists'),
+            'work_regulation': pick(REGULATIONS_CHOICES, 'not_exists'),
+            'worker_file_maintenance': pick(VIOLATION_CHOICES, 'violation'),
+            'extended_working_hours': pick(VIOLATION_CHOICES, 'violation'),
+            'consecutive_shifts': pick(VIOLATION_CHOICES, 'violation'),
+            'weekly_rest_schedule': pick(VIOLATION_CHOICES, 'violation'),
+            'number_of_shifts': self.random.choice(SHIFT_CHOICES)[0],
+            'inspector_opinion': 'تمت الزيارة والتحقق من البنود.',
+            'mandoub_name_1': ' '.join(self._name()),
+            'mandoub_phone_1': f'05{self.random.randint(10000000, 99999999)}',
+        }
+
+    def create_inspections(self, count, companies, inspectors):
+        assigned = [company for company in companies if company.assigned_to_id] or companies
+        inspections = []
+        for _ in range(count):
+            company = self.random.choice(assigned)
+            inspection = Inspection(
+                company=company,
+                inspector=company.assigned_to or self.random.choice(inspectors),
+                status=self._weighted(INSPECTION_STATUS_WEIGHTS),
+                **self._checklist(),
+            )
+            inspection.set_normalized_fields()
+            inspections.append(inspection)
+        inspections = Inspection.objects.bulk_create(inspections, batch_size=self.batch_size)
+        for inspection in inspections:
+            inspection.inspection_date = max(self._past(), inspection.company.created_at)
+            inspection.updated_at = inspection.inspection_date + timedelta(hours=self.random.randint(0, 240))
+        Inspection.objects.bulk_update(inspections, ['inspection_date', 'updated_at'], batch_size=self.batch_size)
+        return inspections
+
+    def _image_files(self, folder, count=5):
+        """
+        عدد قليل من ملفات الصور الحقيقية تتشارك فيها جميع الصفوف المولدة.
+        """
+        from PIL import Image
+
+        names = []
+        for n in range(count):
+            buffer = io.BytesIO()
+            color = tuple(self.random.randint(0, 255) for _ in range(3))
+            Image.new('RGB', (1024, 768), color).save(buffer, format='JPEG', quality=80)
+            names.append(media_storage.save(f'{folder}/{self.prefix}_{n}.jpg', ContentFile(buffer.getvalue())))
+        return names
+
+    def create_images(self, count, companies, inspections):
+        company_files = self._image_files('company_images')
+        inspection_files = self._image_files('inspection_images')
+        half = count // 2
+        CompanyImage.objects.bulk_create([
+            CompanyImage(company=self.random.choice(companies), image=self.random.choice(company_files), description='صورة الواجهة')
+            for _ in range(half)
+        ], batch_size=self.batch_size)
+        if inspections:
+            InspectionImage.objects.bulk_create([
+                InspectionImage(inspection=self.random.choice(inspections), image=self.random.choice(inspection_files), description='صورة من الزيارة')
+                for _ in range(count - half)
+            ], batch_size=self.batch_size)
+
+    def create_notifications(self, count, companies):
+        notifications = []
+        for _ in range(count):
+            company = self.random.choice(companies)
+            recipient = company.assigned_to or company.manager
+            notifications.append(Notification(
+                recipient=recipient,
+                sender=company.manager if recipient != company.manager else company.assigned_to,
+                title='تم تعيين منشأة جديدة لك',
+                message=f'تم تعيين المنشأة {company.company_name} لك.',
+                related_company=company,
+                is_read=self.random.random() < READ_NOTIFICATION_RATE,
+            ))
+        notifications = Notification.objects.bulk_create(notifications, batch_size=self.batch_size)
+        for notification in notifications:
+            notification.created_at = self._past(90)
+        Notification.objects.bulk_update(notifications, ['created_at'], batch_size=self.batch_size)
+
+    def create_audit_entries(self, count, companies, inspections):
+        company_type = ContentType.objects.get_for_model(Company)
+        inspection_type = ContentType.objects.get_for_model(Inspection)
+        entries = []
+        for _ in range(count):
+            if inspections and self.random.random() < 0.5:
+                inspection = self.random.choice(inspections)
+                entries.append(LogEntry(
+                    content_type=inspection_type, object_pk=str(inspection.pk), object_id=inspection.pk,
+                    object_repr=str(inspection.pk), action=LogEntry.Action.UPDATE,
+                    actor_id=inspection.inspector_id, timestamp=self._past(),
+                    changes={'status': ['draft', inspection.status]},
+                ))
+            else:
+                company = self.random.choice(companies)
+                action = self.random.choice([LogEntry.Action.CREATE, LogEntry.Action.UPDATE, LogEntry.Action.UPDATE])
+                entries.append(LogEntry(
+                    content_type=company_type, object_pk=str(company.pk), object_id=company.pk,
+                    object_repr=company.company_name, action=action,
+                    actor_id=company.manager_id, timestamp=self._past(),
+                    changes={
+                        'assigned_to': ['None', str(company.assigned_to_id)],
+                        'status_by_inspector': ['not_assigned', company.status_by_inspector],
+                    },
+                ))
+        return LogEntry.objects.bulk_create(entries, batch_size=self.batch_size)
+
+    def generate(self, managers=5, inspectors=50, companies=5000, inspections=10000,
+                 images=2000, notifications=20000, audit_entries=50000):
+        """
+        يولد جميع البيانات ويعيد عدد الصفوف المضافة لكل نوع.
+        """
+        managers_group, _ = Group.objects.get_or_create(name=MANAGERS)
+        inspectors_group, _ = Group.objects.get_or_create(name=INSPECTORS)
+
+        with transaction.atomic():
+            self.log('المدراء والمفتشون...')
+            manager_users = self.create_users(managers, managers_group)
+            inspector_users = self.create_users(inspectors, inspectors_group, supervisors=manager_users)
+            self.log('المنشآت...')
+            company_rows = self.create_companies(companies, manager_users, inspector_users)
+            self.log('تقارير التفتيش...')
+            inspection_rows = self.create_inspections(inspections, company_rows, inspector_users) if company_rows else []
+            self.log('الصور والإشعارات وسجلات التدقيق...')
+            if company_rows:
+                self.create_images(images, company_rows, inspection_rows)
+                self.create_notifications(notifications, company_rows)
+                entries = self.create_audit_entries(audit_entries, company_rows, inspection_rows)
+            else:
+                entries = []
+
+        # الإدخال الجماعي لا يمر عبر الإشارات: تحديث الفهرس وجداول التجميع والأدوار يدوياً
+        self.log('فهرس البحث وجداول التجميع...')
+        for kind, model, rows in (
+            ('user', User, manager_users + inspector_users),
+            ('company', Company, company_rows),
+            ('inspection', Inspection, inspection_rows),
+            ('logentry', LogEntry, entries),
+        ):
+            if rows:
+                reindex(kind, model.objects.filter(pk__range=_pk_range(rows)), batch_size=self.batch_size)
+        rebuild_rollups()
+        # الصور المولدة تتشارك في عدد قليل من الملفات
+        if images:
+            rebuild_references()
+
+        return {
+            'managers': len(manager_users),
+            'inspectors': len(inspector_users),
+            'companies': len(company_rows),
+            'inspections': len(inspection_rows),
+            'images': images if company_rows else 0,
+            'notifications': notifications if company_rows else 0,
+            'audit_entries': len(entries),
+        }
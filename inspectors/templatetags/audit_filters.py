@@ -1,63 +1,9 @@
 from django import template
-import json
 
-register = template.Library()
+from inspectors.audit import FIELD_NAMES
 
-# قاموس لترجمة أسماء الحقول إلى العربية
-FIELD_NAMES = {
-    # Company Fields (الموجودة سابقاً)
-    'company_name': 'اسم المنشأة',
-    'company_number': 'رقم المنشأة',
-    'region': 'المنطقة',
-    'street_name': 'اسم الشارع',
-    'building_number': 'رقم العقار',
-    'activity_type': 'نوع النشاط',
-    'electricity_meter_number': 'رقم الكهرباء',
-    'actual_workers_count': 'عدد العمال الفعلي',
-    'establishment_type': 'نوع المنشأة',
-    'size_description': 'وصف الحجم',
-    'created_at': 'تاريخ الإضافة',
-    'status': 'الحالة',
-    'manager': 'المدير المسؤول',
-    'assigned_to': 'المفتش المعين',
-    'status_by_inspector': 'حالة التعيين',
-    'decline_reason': 'سبب الرفض',
-    
-    # User Fields (النماذج التي سجلتيها)
-    'phone_number': 'رقم الجوال',
-    'address': 'العنوان',
-    'user_id': 'رقم الهوية',
-    'supervisor': 'المشرف/المدير',
-    'username': 'اسم المستخدم',
-    'first_name': 'الاسم الأول',
-    'last_name': 'الاسم الأخير',
-    'email': 'البريد الإلكتروني',
+register = template.Library()
 
-    # Inspection Fields
-    'inspector': 'المفتش',
-    'company': 'المنشأة المفتشة',
-    'inspection_date': 'تاريخ التفتيش',
-    'workers_size_estimation': 'تقدير حجم العمالة',
-    'license_compliance': 'مطابقة الرخصة للموقع',
-    'female_workers_element': 'العنصر النسائي',
-    'unlicensed_workers': 'عمال دون ترخيص',
-    'penalties_regulation': 'لائحة الجزاءات',
-    'work_regulation': 'لائحة تنظيم العمل',
-    'worker_file_maintenance': 'الاحتفاظ بملف العامل',
-    'extended_working_hours': 'ساعات العمل الإضافية',
-    'consecutive_shifts': 'الورديات المتتالية',
-    'weekly_rest_schedule': 'جدول الراحة الأسبوعية',
-    'number_of_shifts': 'عدد ورديات العمل',
-    'inspector_opinion': 'رأي المفتش',
-    'mandoub_name_1': 'اسم المندوب الأول',
-    'mandoub_phone_1': 'جوال المندوب الأول',
-    'mandoub_name_2': 'اسم المندوب الثاني',
-    'mandoub_phone_2': 'جوال المندوب الثاني',
-    'inspection_status': 'حالة التقرير', # تأكدي من الاسم التقني للحقل في نموذج Inspection
-    
-    # الحقول الداخلية التي قد تظهر
-    'id': 'الرقم التعريفي (ID)',
-}
 
 @register.filter
 def prettify_log(changes_json, key_type):
@@ -1,11 +1,28 @@
 from django import template
+from inspectors.roles import has_role, MANAGERS, INSPECTORS
 
 register = template.Library()
 
 @register.filter
 def is_manager(user):
-    return user.groups.filter(name='Managers').exists()
+    return has_role(user, MANAGERS)
 
 @register.filter
 def is_inspector(user):
-    return user.groups.filter(name='Inspectors').exists()
\ No newline at end of file
+    return has_role(user, INSPECTORS)
+
+@register.simple_tag(takes_context=True)
+def cursor_querystring(context, cursor):
+    # يحافظ على معاملات البحث والتصفية الحالية ويستبدل المؤشر فقط
+    params = context['request'].GET.copy()
+    params['cursor'] = cursor
+    return params.urlencode()
+
+
+@register.simple_tag(takes_context=True)
+def export_querystring(context, export_format):
+    # التصدير يشمل كل النتائج المطابقة وليس الصفحة الحالية فقط
+    params = context['request'].GET.copy()
+    params.pop('cursor', None)
+    params['export'] = export_format
+    return params.urlencode()
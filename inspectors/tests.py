@@ -1,3 +1,1311 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import json
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from auditlog.models import LogEntry
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+from PIL import Image
+from pypdf import PdfReader
+
+from . import audit_archive, images, pdf, performance
+from .audit import render_log_changes
+from .dashboard import build_manager_dashboard
+from .forms import InspectionImageFormSet
+from .models import (
+    AuditArchive, Company, CompanyImage, ComplianceRollup, Inspection, InspectionDailyStats, InspectionImage, MediaBlob,
+    Notification, OutgoingEmail, PhotoUpload, SearchEntry, User,
+)
+from .notifications import dispatch_notifications
+from .outbox import deliver_pending
+from .pagination import KeysetPaginator, encode_cursor, paginate_list_keyset
+from .roles import INSPECTORS, MANAGERS, get_user_roles
+from .rollups import rebuild_rollups
+from .storage import ContentAddressedStorage, media_storage
+from .typeahead import inspector_label
+
+
+def explain(sql):
+    """
+    خطة تنفيذ الاستعلام كنص (PostgreSQL أو SQLite).
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # جداول الاختبار صغيرة فيفضّل المخطط المسح الكامل، وتعطيله يُظهر هل يوجد فهرس مناسب للاستعلام
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+            cursor.execute('RESET enable_seqscan')
+            return plan
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return '\n'.join(row[-1] for row in cursor.fetchall())
+
+
+class QueryPlanTests(TestCase):
+    """
+    يتحقق أن الاستعلام الرئيسي لكل صفحة قائمة يستخدم الفهرس المخصص له
+    (الاستعلام المنفذ فعلياً من الصفحة وليس نسخة مكتوبة يدوياً).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        managers = Group.objects.create(name=MANAGERS)
+        inspectors = Group.objects.create(name=INSPECTORS)
+        cls.manager = User.objects.create_user('manager', 'manager@example.com', 'pw', phone_number='100', user_id='100')
+        cls.manager.groups.add(managers)
+        cls.inspector = User.objects.create_user(
+            'inspector', 'inspector@example.com', 'pw', phone_number='200', user_id='200', supervisor=cls.manager,
+        )
+        cls.inspector.groups.add(inspectors)
+        cls.company = None
+        for n in range(20):
+            company = Company.objects.create(
+                company_name=f'منشأة {n}', region='الرياض', manager=cls.manager, assigned_to=cls.inspector,
+                status='deleted' if n % 5 == 0 else 'active',
+            )
+            cls.company = cls.company or company
+            for status in ('pending_approval', 'approved', 'deleted'):
+                Inspection.objects.create(company=company, inspector=cls.inspector, status=status)
+            Notification.objects.create(recipient=cls.manager, sender=cls.inspector, title='t', message='m')
+
+    def main_query(self, url, table, user=None):
+        self.client.force_login(user or self.manager)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        pattern = re.compile(rf'^SELECT .* FROM "{table}" .*ORDER BY', re.S)
+        for query in context.captured_queries:
+            if pattern.search(query['sql']):
+                return query['sql']
+        self.fail(f'no list query on {table} for {url}')
+
+    def assertUsesIndex(self, url, table, index=None, user=None):
+        """
+        index=None يكتفي بأي مسح بالفهرس على الجدول (بدلاً من المسح الكامل).
+        """
+        plan = explain(self.main_query(url, table, user))
+        if index is None:
+            if connection.vendor == 'postgresql':
+                pattern = rf'Index (Only )?Scan (Backward )?using \w+ on {table}\b|Bitmap Index Scan'
+            else:
+                pattern = rf'(SEARCH|SCAN) {table} USING (COVERING )?INDEX'
+            self.assertRegex(plan, pattern, f'{url} does not use an index on {table}:\n{plan}')
+        else:
+            self.assertRegex(plan, rf'\b{index}\b', f'{url} does not use {index}:\n{plan}')
+
+    def test_companies_list(self):
+        self.assertUsesIndex(reverse('companies_list'), 'inspectors_company', 'company_status_created_idx')
+
+    def test_inspector_companies_list(self):
+        self.assertUsesIndex(reverse('companies_list'), 'inspectors_company', 'company_active_assigned_idx', user=self.inspector)
+
+    def test_hidden_companies_list(self):
+        self.assertUsesIndex(reverse('hidden_companies_list'), 'inspectors_company', 'company_status_created_idx')
+
+    def test_review_list(self):
+        self.assertUsesIndex(reverse('manager_review_list'), 'inspectors_inspection', 'inspection_status_date_idx')
+
+    def test_reports_archive(self):
+        # status IN (...) يمكن أن يُخدم بأي من فهرسي الحالة
+        self.assertUsesIndex(reverse('reports_archive'), 'inspectors_inspection')
+
+    def test_deleted_reports(self):
+        self.assertUsesIndex(reverse('manager_deleted_reports'), 'inspectors_inspection', 'inspection_status_updated_idx')
+
+    def test_company_details(self):
+        url = reverse('company_details', args=[self.company.pk])
+        self.assertUsesIndex(url, 'inspectors_inspection', 'inspection_company_date_idx')
+
+    def test_notifications(self):
+        self.assertUsesIndex(reverse('notifications_view'), 'inspectors_notification', 'notification_recipient_idx')
+
+    def test_inspectors_list(self):
+        self.assertUsesIndex(reverse('inspectors_list'), 'inspectors_user', 'user_supervisor_name_idx')
+
+
+class QueryBudgetTests(TestCase):
+    """
+    عدد استعلامات كل صفحة ثابت مهما زاد عدد الصفوف (10 / 100 / 1000):
+    أي تحميل كسول داخل حلقة في القالب (N+1) يرفع العدد مع الحجم فيفشل الاختبار.
+    الكاش يُمسح قبل كل طلب حتى تُقاس الصفحة بكاش بارد.
+    """
+
+    SCALES = (10, 100, 1000)
+
+    # الصفحة -> عدد الاستعلامات المسموح
+    BUDGETS = {
+        'companies_list': 5,
+        'inspector_companies_list': 5,
+        'hidden_companies_list': 5,
+        'company_details': 7,
+        'inspection_report_detail': 6,
+        'manager_review_list': 5,
+        'reports_archive': 5,
+        'manager_deleted_reports': 5,
+        'inspector_rejected_reports': 5,
+        'inspector_completed_reports': 5,
+        'notifications_view': 5,
+        'inspectors_list': 5,
+        'inspector_detail': 11,
+        'manager_dashboard': 9,
+        'manager_audit_logs': 8,
+    }
+
+    INSPECTION_STATUSES = ('pending_approval', 'approved', 'archived', 'rejected', 'deleted', 'draft')
+
+    def setUp(self):
+        cache.clear()
+        self.managers = Group.objects.create(name=MANAGERS)
+        self.inspectors = Group.objects.create(name=INSPECTORS)
+        self.manager = User.objects.create_user('manager', 'manager@example.com', 'pw', phone_number='100', user_id='100')
+        self.manager.groups.add(self.managers)
+        self.inspector = User.objects.create_user(
+            'inspector', 'inspector@example.com', 'pw', phone_number='200', user_id='200', supervisor=self.manager,
+        )
+        self.inspector.groups.add(self.inspectors)
+        self.company = Company.objects.create(company_name='المنشأة الرئيسية', region='الرياض', manager=self.manager, assigned_to=self.inspector)
+        self.inspection = Inspection.objects.create(company=self.company, inspector=self.inspector, status='pending_approval')
+        self.seeded = 0
+
+    def seed(self, total):
+        """
+        يضيف الصفوف حتى يصل كل جدول إلى total عنصراً (بالإدخال الجماعي).
+        """
+        count = total - self.seeded
+        start = self.seeded
+        self.seeded = total
+
+        inspectors = User.objects.bulk_create([
+            User(username=f'seed{n}', email=f'seed{n}@example.com', phone_number=f'5{n:06d}', user_id=f'5{n:06d}',
+                 first_name=f'مفتش {n}', supervisor=self.manager)
+            for n in range(start, start + count)
+        ])
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=user.pk, group_id=self.inspectors.pk) for user in inspectors
+        ])
+        companies = Company.objects.bulk_create([
+            Company(company_name=f'منشأة {n}', region=f'منطقة {n % 7}', manager=self.manager,
+                    assigned_to=inspectors[n - start] if n % 2 else self.inspector,
+                    status='deleted' if n % 10 == 0 else 'active', status_by_inspector='assigned')
+            for n in range(start, start + count)
+        ])
+        Inspection.objects.bulk_create([
+            Inspection(company=companies[n - start] if n % 3 else self.company,
+                       inspector=self.inspector if n % 5 else inspectors[n - start],
+                       status=self.INSPECTION_STATUSES[n % len(self.INSPECTION_STATUSES)])
+            for n in range(start, start + count)
+        ])
+        CompanyImage.objects.bulk_create([
+            CompanyImage(company=self.company, image=f'company_images/seed{n}.jpg') for n in range(start, start + count)
+        ])
+        InspectionImage.objects.bulk_create([
+            InspectionImage(inspection=self.inspection, image=f'inspection_images/seed{n}.jpg') for n in range(start, start + count)
+        ])
+        Notification.objects.bulk_create([
+            Notification(recipient=self.manager, sender=inspectors[n - start], title=f'إشعار {n}', message='-',
+                         related_company=companies[n - start])
+            for n in range(start, start + count)
+        ])
+        company_type = ContentType.objects.get_for_model(Company)
+        LogEntry.objects.bulk_create([
+            LogEntry(content_type=company_type, object_pk=str(company.pk), object_id=company.pk,
+                     object_repr=company.company_name, action=LogEntry.Action.UPDATE,
+                     actor=self.manager if n % 2 else self.inspector,
+                     changes={'assigned_to': [str(self.inspector.pk), str(company.assigned_to_id)],
+                              'status_by_inspector': ['not_assigned', 'assigned']})
+            for n, company in enumerate(companies, start)
+        ])
+
+    def pages(self):
+        return {
+            'companies_list': (reverse('companies_list'), self.manager),
+            'inspector_companies_list': (reverse('companies_list'), self.inspector),
+            'hidden_companies_list': (reverse('hidden_companies_list'), self.manager),
+            'company_details': (reverse('company_details', args=[self.company.pk]), self.manager),
+            'inspection_report_detail': (reverse('inspection_report_detail', args=[self.inspection.pk]), self.manager),
+            'manager_review_list': (reverse('manager_review_list'), self.manager),
+            'reports_archive': (reverse('reports_archive'), self.manager),
+            'manager_deleted_reports': (reverse('manager_deleted_reports'), self.manager),
+            'inspector_rejected_reports': (reverse('inspector_rejected_reports'), self.inspector),
+            'inspector_completed_reports': (reverse('inspector_completed_reports'), self.inspector),
+            'notifications_view': (reverse('notifications_view'), self.manager),
+            'inspectors_list': (reverse('inspectors_list'), self.manager),
+            'inspector_detail': (reverse('inspector_detail', args=[self.inspector.pk]), self.manager),
+            'manager_dashboard': (reverse('manager_dashboard'), self.manager),
+            'manager_audit_logs': (reverse('manager_audit_logs'), self.manager),
+        }
+
+    def test_query_budgets(self):
+        for scale in self.SCALES:
+            self.seed(scale)
+            for name, (url, user) in self.pages().items():
+                with self.subTest(page=name, rows=scale):
+                    self.client.force_login(user)
+                    cache.clear()
+                    with self.assertNumQueries(self.BUDGETS[name]):
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class PhotoUploadTests(TestCase):
+    """
+    الرفع المجزأ (api/uploads/) وربط الصورة المرفوعة بتقرير مرة واحدة فقط.
+    """
+
+    def setUp(self):
+        manager = User.objects.create_user('manager', 'manager@example.com', 'pw', phone_number='100', user_id='100')
+        manager.groups.add(Group.objects.create(name=MANAGERS))
+        self.inspector = User.objects.create_user(
+            'inspector', 'inspector@example.com', 'pw', phone_number='200', user_id='200', supervisor=manager,
+        )
+        self.inspector.groups.add(Group.objects.create(name=INSPECTORS))
+        self.company = Company.objects.create(
+            company_name='منشأة', region='الرياض', manager=manager, assigned_to=self.inspector, status_by_inspector='accepted',
+        )
+        self.client.force_login(self.inspector)
+
+    def upload(self, content=None):
+        content = content or png_bytes()
+        response = self.client.post(reverse('photo_upload_create'), {'filename': 'photo.png', 'size': len(content)})
+        self.assertEqual(response.status_code, 201)
+        url = response.json()['url']
+        middle = len(content) // 2
+        for offset, chunk in ((0, content[:middle]), (middle, content[middle:])):
+            response = self.client.patch(url, chunk, content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+            self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['complete'])
+        return response.json()['id']
+
+    def test_chunked_upload(self):
+        content = png_bytes()
+        response = self.client.post(reverse('photo_upload_create'), {'filename': 'photo.png', 'size': len(content)})
+        url = response.json()['url']
+        response = self.client.patch(url, content[:10], content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.json()['offset'], 10)
+        # موضع لا يطابق ما استُلم يعيد الموضع الصحيح
+        response = self.client.patch(url, content[20:], content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='20')
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 10))
+        response = self.client.patch(url, content[10:] + b'x', content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='10')
+        self.assertEqual(response.status_code, 413)
+        response = self.client.patch(url, content[10:], content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='10')
+        self.assertTrue(response.json()['complete'])
+
+    def test_formset_rejects_repeated_upload(self):
+        upload_id = self.upload()
+        inspection = Inspection.objects.create(company=self.company, inspector=self.inspector, status='draft')
+        data = {
+            'images-TOTAL_FORMS': '2', 'images-INITIAL_FORMS': '0',
+            'images-0-upload': upload_id, 'images-1-upload': upload_id,
+        }
+        formset = InspectionImageFormSet(data, instance=inspection, prefix='images', form_kwargs={'user': self.inspector})
+        self.assertFalse(formset.is_valid())
+        self.assertIn('upload', formset.forms[1].errors)
+
+        data['images-TOTAL_FORMS'] = '1'
+        formset = InspectionImageFormSet(data, instance=inspection, prefix='images', form_kwargs={'user': self.inspector})
+        self.assertTrue(formset.is_valid())
+        formset.save()
+        self.assertEqual(inspection.inspectionimage_set.count(), 1)
+        self.assertFalse(PhotoUpload.objects.exists())
+
+    def test_sync_rejects_repeated_upload(self):
+        upload_id = self.upload()
+        data = {
+            'workers_size_estimation': '5', 'license_compliance': 'compliant', 'female_workers_element': 'feasible',
+            'unlicensed_workers': 'non_violation', 'penalties_regulation': 'exists', 'work_regulation': 'exists',
+            'worker_file_maintenance': 'non_violation', 'extended_working_hours': 'non_violation',
+            'consecutive_shifts': 'non_violation', 'weekly_rest_schedule': 'non_violation',
+            'number_of_shifts': 'one_shift', 'inspector_opinion': '-',
+        }
+
+        def save_draft(images):
+            operation = {'op': 'save_draft', 'company': self.company.pk, 'data': data, 'images': images}
+            response = self.client.post(reverse('inspector_sync'), json.dumps({'operations': [operation]}),
+                                        content_type='application/json')
+            return response.json()['results'][0]
+
+        self.assertEqual(save_draft([upload_id, upload_id])['status'], 'error')
+        self.assertFalse(InspectionImage.objects.exists())
+        self.assertEqual(save_draft([upload_id])['status'], 'ok')
+        self.assertEqual(InspectionImage.objects.count(), 1)
+        # عملية الرفع حُذفت بعد ربطها فلا يمكن ربطها بمسودة أخرى
+        self.assertEqual(save_draft([upload_id])['status'], 'error')
+        self.assertEqual(InspectionImage.objects.count(), 1)
+
+
+class TeamNotificationTests(TestCase):
+    """
+    إشعار الفريق (notify_team): عدد الاستعلامات ثابت مهما زاد عدد المفتشين،
+    ولا يُفتح اتصال بريد داخل الطلب، وتُرسل الرسائل لاحقاً عبر اتصال واحد.
+    """
+
+    def setUp(self):
+        self.inspectors = Group.objects.create(name=INSPECTORS)
+        self.manager = User.objects.create_user('manager', 'manager@example.com', 'pw', phone_number='100', user_id='100')
+        self.manager.groups.add(Group.objects.create(name=MANAGERS))
+        self.seeded = 0
+
+    def seed(self, total):
+        users = User.objects.bulk_create([
+            User(username=f'team{n}', email=f'team{n}@example.com', phone_number=f'6{n:06d}', user_id=f'6{n:06d}',
+                 supervisor=self.manager)
+            for n in range(self.seeded, total)
+        ])
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=user.pk, group_id=self.inspectors.pk) for user in users
+        ])
+        self.seeded = total
+
+    def notify(self):
+        return self.client.post(reverse('notify_team'), {'title': 'اجتماع', 'message': 'غداً', 'send_email': 'on'})
+
+    def test_query_and_connection_count(self):
+        self.client.force_login(self.manager)
+        self.seed(3)
+        # الطلب الأول يحمّل الجلسة والمستخدم؛ يُقاس عدد الاستعلامات من الطلب الثاني
+        self.notify()
+        with CaptureQueriesContext(connection) as small:
+            self.notify()
+        self.seed(30)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.notify().status_code, 302)
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(Notification.objects.filter(recipient__supervisor=self.manager).count(), 3 + 3 + 30)
+        self.assertEqual(OutgoingEmail.objects.filter(status='pending').count(), 36)
+        self.assertEqual(len(mail.outbox), 0)
+
+        with mock.patch('inspectors.outbox.get_connection', wraps=mail.get_connection) as get_connection:
+            self.assertEqual(deliver_pending(batch_size=100), (36, 0))
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 36)
+
+
+class CompanyImportTests(TestCase):
+    """
+    استيراد المنشآت من CSV: الصفوف الخاطئة تُسجل في التقرير، والملف غير المقروء يعيد خطأ في النموذج لا 500.
+    """
+
+    HEADER = 'company_name,company_number,region,street_name,building_number,assigned_to\n'
+
+    def setUp(self):
+        managers = Group.objects.create(name=MANAGERS)
+        inspectors = Group.objects.create(name=INSPECTORS)
+        self.manager = User.objects.create_user('manager', 'manager@example.com', 'pw', phone_number='100', user_id='100')
+        self.manager.groups.add(managers)
+        self.inspector = User.objects.create_user(
+            'inspector', 'inspector@example.com', 'pw', phone_number='200', user_id='200', supervisor=self.manager,
+        )
+        self.inspector.groups.add(inspectors)
+        other_manager = User.objects.create_user('other', 'other@example.com', 'pw', phone_number='300', user_id='300')
+        other_manager.groups.add(managers)
+        User.objects.create_user(
+            'stranger', 'stranger@example.com', 'pw', phone_number='400', user_id='400', supervisor=other_manager,
+        ).groups.add(inspectors)
+        self.client.force_login(self.manager)
+
+    def post(self, content, name='companies.csv'):
+        return self.client.post(reverse('import_companies'), {'file': SimpleUploadedFile(name, content)})
+
+    def test_import(self):
+        content = (
+            self.HEADER + 'أ,1,الرياض,ش,1,inspector\nب,2,الرياض,ش,2,INSPECTOR@example.com\n'
+            ',3,الرياض,ش,3,inspector\nد,4,الرياض,ش,4,stranger\n'
+        )
+        response = self.post(content.encode('utf-8-sig'))
+        report = response.context['report']
+        self.assertEqual((report.processed, report.created, report.failed), (4, 2, 2))
+        # مفتش تابع لمدير آخر لا يُقبل في التعيين
+        self.assertEqual([line for line, errors in report.errors], [4, 5])
+        self.assertEqual(Company.objects.filter(assigned_to=self.inspector, manager=self.manager).count(), 2)
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_unreadable_files(self):
+        cases = (
+            ((self.HEADER + 'أ,1,الرياض,ش,1,inspector\n').encode('cp1256'), 'companies.csv'),
+            (b'not a zip file', 'companies.xlsx'),
+        )
+        for content, name in cases:
+            with self.subTest(name=name):
+                response = self.post(content, name)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('file', response.context['form'].errors)
+        self.assertFalse(Company.objects.exists())
+
+
+class AuditArchiveTests(TestCase):
+    """
+    أرشفة سجل التدقيق: الصفحة الحية تعرض كل ما لم يُؤرشف بعد، وملفات الشهر المؤرشف لا تُقرأ في كل طلب.
+    """
+
+    def setUp(self):
+        cache.clear()
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir, ignore_errors=True)
+        patcher = mock.patch.object(audit_archive, 'AUDIT_ARCHIVE_DIR', archive_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = User.objects.create_user('manager', 'manager@example.com', 'pw', phone_number='100', user_id='100')
+        self.manager.groups.add(Group.objects.create(name=MANAGERS))
+        self.client.force_login(self.manager)
+        LogEntry.objects.all().delete()
+
+    def log(self, name, days_ago):
+        entry = LogEntry.objects.create(
+            content_type=ContentType.objects.get_for_model(Company), object_pk='1', object_id=1,
+            object_repr=name, action=LogEntry.Action.UPDATE, actor=self.manager, changes={},
+        )
+        LogEntry.objects.filter(pk=entry.pk).update(timestamp=timezone.now() - timedelta(days=days_ago))
+
+    def page(self, **params):
+        return [log.object_repr for log in self.client.get(reverse('manager_audit_logs'), params).context['logs']]
+
+    def test_live_logs_until_archived(self):
+        retention = audit_archive.AUDIT_LOG_RETENTION_DAYS
+        self.log('مؤرشف', retention + 60)
+        self.log('قديم', retention + 1)
+        self.log('حديث', 1)
+        # لم يُشغل الأرشيف بعد: لا يختفي أي سجل من الصفحة
+        self.assertEqual(self.page(), ['حديث', 'قديم', 'مؤرشف'])
+
+        audit_archive.archive_logs(before=timezone.now() - timedelta(days=retention + 30))
+        self.assertEqual(self.page(), ['حديث', 'قديم'])
+        month = AuditArchive.objects.get().month.strftime('%Y-%m')
+        with mock.patch.object(audit_archive.FileSystemStorage, 'open', autospec=True,
+                               side_effect=audit_archive.FileSystemStorage.open) as storage_open:
+            self.assertEqual(self.page(archive=month), ['مؤرشف'])
+            self.assertEqual(self.page(archive=month), ['مؤرشف'])
+        self.assertEqual(storage_open.call_count, 1)
+
+    def test_archive_and_cache_slice(self):
+        self.log('مؤرشف', audit_archive.AUDIT_LOG_RETENTION_DAYS + 60)
+        archived_pk = LogEntry.objects.get().pk
+        self.assertTrue(SearchEntry.objects.filter(kind='logentry', object_id=archived_pk).exists())
+        audit_archive.archive_logs()
+        self.assertFalse(LogEntry.objects.filter(pk=archived_pk).exists())
+        self.assertFalse(SearchEntry.objects.filter(kind='logentry', object_id=archived_pk).exists())
+
+        month = AuditArchive.objects.get().month
+        # الكاش يحمل سجلات الفريق المطلوب فقط
+        self.assertEqual(audit_archive.load_archived_entries(month, actor_ids={self.manager.pk + 1}), [])
+        self.assertEqual([entry.pk for entry in audit_archive.load_archived_entries(month, {self.manager.pk})], [archived_pk])
+        # الشهر الأكبر من الحد لا يُحفظ في الكاش
+        with mock.patch.object(audit_archive, 'AUDIT_ARCHIVE_CACHE_MAX_ENTRIES', 0), \
+                mock.patch.object(audit_archive.FileSystemStorage, 'open', autospec=True,
+                                  side_effect=audit_archive.FileSystemStorage.open) as storage_open:
+            cache.clear()
+            for _ in range(2):
+                self.assertEqual(len(audit_archive.load_archived_entries(month, {self.manager.pk})), 1)
+        self.assertEqual(storage_open.call_count, 2)
+
+
+class MergedPdfTests(TestCase):
+    """
+    ملف PDF المدمج يُبنى من ملفات التقارير في الكاش دون إعادة توليدها.
+    """
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        patcher = mock.patch.object(pdf, 'PDF_CACHE_DIR', cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        manager = User.objects.create_user('manager', 'manager@example.com', 'pw', phone_number='100', user_id='100')
+        inspector = User.objects.create_user('inspector', 'inspector@example.com', 'pw', phone_number='200', user_id='200')
+        company = Company.objects.create(company_name='منشأة', region='الرياض', manager=manager, assigned_to=inspector)
+        for _ in range(3):
+            Inspection.objects.create(company=company, inspector=inspector, status='archived', inspector_opinion='-')
+
+    def merge(self):
+        output = io.BytesIO()
+        pdf.render_merged_pdf(pdf.batch_queryset(), output, workers=1)
+        return PdfReader(io.BytesIO(output.getvalue()))
+
+    def test_merge_from_cache(self):
+        with mock.patch.object(pdf, 'render_inspection_pdf', wraps=pdf.render_inspection_pdf) as render:
+            merged = self.merge()
+            self.assertEqual(render.call_count, 3)
+            self.assertEqual(len(self.merge().pages), len(merged.pages))
+            self.assertEqual(render.call_count, 3)
+        expected = sum(
+            len(PdfReader(pdf.get_cached_pdf_path(payload['pk'], payload['version'])).pages)
+            for payload in map(pdf.inspection_payload, pdf.batch_queryset())
+        )
+        self.assertEqual(len(merged.pages), expected)
+
+    def test_shared_worker_pool(self):
+        self.assertIs(pdf._worker_pool(), pdf._worker_pool())
+
+
+class SyntheticDataTests(TestCase):
+    """
+    مولد البيانات التجريبية لا يعمل دون DEBUG إلا بتأكيد صريح، ولا يمكن الدخول بمستخدميه.
+    """
+
+    SIZES = {
+        'managers': 1, 'inspectors': 2, 'companies': 5, 'inspections': 5, 'images': 0,
+        'notifications': 5, 'audit_entries': 5, 'stdout': io.StringIO(),
+    }
+
+    def test_requires_debug_or_allow(self):
+        with self.settings(DEBUG=False):
+            with self.assertRaises(CommandError):
+                call_command('generate_synthetic_data', **self.SIZES)
+        self.assertFalse(User.objects.exists())
+
+        call_command('generate_synthetic_data', allow=True, seed=1, **self.SIZES)
+        users = User.objects.filter(username__startswith='synthetic_')
+        self.assertEqual(users.count(), 3)
+        self.assertFalse(any(user.has_usable_password() for user in users))
+
+    def test_rerun_after_delete(self):
+        call_command('generate_synthetic_data', allow=True, seed=1, **self.SIZES)
+        # حذف أحد المستخدمين المولدين لا يجعل التشغيل التالي يكرر رقماً موجوداً
+        User.objects.filter(username__startswith='synthetic_').order_by('pk').first().delete()
+        call_command('generate_synthetic_data', allow=True, seed=2, **self.SIZES)
+        self.assertEqual(User.objects.filter(username__startswith='synthetic_').count(), 5)
+
+
+class TeamTestCase(TestCase):
+    """
+    مدير ومفتش تابع له ومنشأة مسندة إليه.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.managers = Group.objects.create(name=MANAGERS)
+        self.inspectors = Group.objects.create(name=INSPECTORS)
+        self.manager = User.objects.create_user('manager', 'manager@example.com', 'pw', phone_number='100', user_id='100')
+        self.manager.groups.add(self.managers)
+        self.inspector = User.objects.create_user(
+            'inspector', 'inspector@example.com', 'pw', phone_number='200', user_id='200', supervisor=self.manager,
+        )
+        self.inspector.groups.add(self.inspectors)
+        self.company = Company.objects.create(
+            company_name='منشأة', region='الرياض', manager=self.manager, assigned_to=self.inspector,
+            status_by_inspector='assigned',
+        )
+
+
+class KeysetPaginationTests(TeamTestCase):
+    """
+    الترقيم بالمؤشر: المرور على جميع الصفحات للأمام ثم للخلف يعيد كل صف مرة واحدة بنفس الترتيب.
+    """
+
+    def setUp(self):
+        super().setUp()
+        # أسماء وأوقات مكررة حتى يُختبر الترتيب الثانوي بالمعرف
+        Company.objects.bulk_create([
+            Company(company_name=f'منشأة {n % 4}', region='الرياض', manager=self.manager) for n in range(23)
+        ])
+
+    def walk(self, paginator):
+        page = paginator.get_page()
+        pages = [page]
+        while page.has_next:
+            page = paginator.get_page(page.next_cursor)
+            pages.append(page)
+        backward = [pages[-1]]
+        while page.has_previous:
+            page = paginator.get_page(page.previous_cursor)
+            backward.insert(0, page)
+        return [[obj.pk for obj in page] for page in pages], [[obj.pk for obj in page] for page in backward]
+
+    def test_querysets(self):
+        queryset = Company.objects.all()
+        for ordering in ('-created_at', 'created_at', 'company_name', '-company_name'):
+            with self.subTest(ordering=ordering):
+                forward, backward = self.walk(KeysetPaginator(queryset, ordering, per_page=5))
+                tie_breaker = '-pk' if ordering.startswith('-') else 'pk'
+                expected = list(queryset.order_by(ordering, tie_breaker).values_list('pk', flat=True))
+                self.assertEqual(sum(forward, []), expected)
+                self.assertEqual(backward, forward)
+
+    def test_lists(self):
+        rows = sorted(Company.objects.all(), key=lambda company: -company.pk)
+        first = paginate_list_keyset(RequestFactory().get('/'), rows, per_page=10)
+        second = paginate_list_keyset(RequestFactory().get('/', {'cursor': first.next_cursor}), rows, per_page=10)
+        back = paginate_list_keyset(RequestFactory().get('/', {'cursor': second.previous_cursor}), rows, per_page=10)
+        self.assertEqual([row.pk for row in back], [row.pk for row in first])
+        self.assertEqual([row.pk for row in second], [row.pk for row in rows[10:20]])
+
+    def test_tampered_cursors(self):
+        paginator = KeysetPaginator(Company.objects.all(), '-created_at', per_page=5)
+        first = [obj.pk for obj in paginator.get_page()]
+        now = timezone.now().isoformat()
+        for cursor in (
+            encode_cursor(['ليس تاريخاً'], 1, 'next'), encode_cursor([now], 'x', 'next'), encode_cursor([now], 1.5, 'next'),
+            encode_cursor([now], True, 'next'), encode_cursor([{'a': 1}], 1, 'prev'), encode_cursor([None], 1, 'next'),
+            encode_cursor([], 1, 'next'), encode_cursor([now], 1, 'sideways'),
+        ):
+            with self.subTest(cursor=cursor):
+                page = paginator.get_page(cursor)
+                self.assertEqual([obj.pk for obj in page], first)
+                self.assertFalse(page.has_previous)
+                rows = paginate_list_keyset(RequestFactory().get('/', {'cursor': cursor}), Company.objects.order_by('-pk'), per_page=5)
+                self.assertFalse(rows.has_previous)
+
+    def test_page_links(self):
+        Company.objects.bulk_create([Company(company_name=f'منشأة {n}', region='جدة', manager=self.manager) for n in range(40)])
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('companies_list'))
+        link = re.search(r'href="\?([^"]*cursor=[^"]*)"', response.content.decode()).group(1).replace('&amp;', '&')
+        first = {company.pk for company in response.context['companies']}
+        response = self.client.get(f"{reverse('companies_list')}?{link}")
+        self.assertFalse(first & {company.pk for company in response.context['companies']})
+        # مؤشر تالف يعيد الصفحة الأولى
+        response = self.client.get(reverse('companies_list'), {'cursor': 'garbage'})
+        self.assertEqual({company.pk for company in response.context['companies']}, first)
+
+
+class OutboxTests(TeamTestCase):
+    """
+    رسائل البريد تُضاف لصندوق الصادر داخل الطلب وتُرسل لاحقاً مع إعادة المحاولة عند الفشل.
+    """
+
+    def test_retry_and_send(self):
+        self.client.force_login(self.manager)
+        response = self.client.post(reverse('add_company'), {
+            'company_name': 'منشأة جديدة', 'company_number': '1', 'region': 'الرياض', 'street_name': 'ش',
+            'building_number': '1', 'assigned_to': self.inspector.pk,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        outgoing = OutgoingEmail.objects.get()
+        self.assertEqual(outgoing.recipients, [self.inspector.email])
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('smtp down')):
+            self.assertEqual(deliver_pending(), (0, 1))
+        outgoing.refresh_from_db()
+        self.assertEqual((outgoing.status, outgoing.attempts), ('pending', 1))
+        self.assertGreater(outgoing.next_attempt_at, timezone.now())
+        # لم يحن موعد المحاولة التالية
+        self.assertEqual(deliver_pending(), (0, 0))
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        call_command('send_queued_mail', stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutgoingEmail.objects.get().status, 'sent')
+
+
+class SearchTests(TeamTestCase):
+    """
+    البحث بجزء من الكلمة مع تطبيع الهمزات والتاء المربوطة والتشكيل، وتحديث الفهرس مع التعديل والحذف.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.manager)
+        self.target = Company.objects.create(company_name='شركة الأَمَل للتجارة', region='جدة', manager=self.manager)
+        Company.objects.create(company_name='مؤسسة النجاح', region='الدمام', manager=self.manager)
+
+    def search(self, name, query, key):
+        return [obj.pk for obj in self.client.get(reverse(name), {'q': query}).context[key]]
+
+    def test_companies(self):
+        for query in ('امل', 'الأمل', 'تجار', 'جدة'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search('companies_list', query, 'companies'), [self.target.pk])
+        self.assertEqual(self.search('companies_list', 'غير موجود', 'companies'), [])
+        self.assertEqual(self.client.get(reverse('companies_list'), {'q': '!!'}).status_code, 200)
+
+    def test_index_follows_changes(self):
+        inspection = Inspection.objects.create(company=self.target, inspector=self.inspector, status='pending_approval')
+        self.assertEqual(self.search('manager_review_list', 'امل', 'inspections'), [inspection.pk])
+        self.target.company_name = 'مصنع النور'
+        self.target.save()
+        self.assertEqual(self.search('manager_review_list', 'نور', 'inspections'), [inspection.pk])
+        self.assertEqual(self.search('inspectors_list', 'inspector@exa', 'inspectors'), [self.inspector.pk])
+
+        count = SearchEntry.objects.count()
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(SearchEntry.objects.count(), count)
+        pk = self.target.pk
+        self.target.delete()
+        self.assertFalse(SearchEntry.objects.filter(kind='company', object_id=pk).exists())
+
+
+class NormalizedFieldTests(TeamTestCase):
+    """
+    الأعمدة المطبّعة (اسم المنشأة والمنطقة واسم المستخدم) تُحدّث عند الحفظ وبأمر backfill_normalized_fields.
+    """
+
+    def test_region_and_name(self):
+        company = Company.objects.create(company_name='منشأة', region='الرِّياض الشَّرقية', manager=self.manager)
+        self.assertEqual(company.region_normalized, 'الرياض الشرقيه')
+        Inspection.objects.create(company=company, inspector=self.inspector, status='archived')
+        self.assertEqual(pdf.batch_queryset(region='الرياض الشرقية').count(), 1)
+
+        self.inspector.first_name = 'أحمد'
+        self.inspector.save(update_fields=['first_name'])
+        self.assertEqual(User.objects.get(pk=self.inspector.pk).name_normalized, 'احمد')
+
+        Company.objects.update(region_normalized='')
+        User.objects.update(name_normalized='')
+        call_command('backfill_normalized_fields', stdout=io.StringIO())
+        self.assertEqual(Company.objects.get(pk=company.pk).region_normalized, 'الرياض الشرقيه')
+        self.assertEqual(User.objects.get(pk=self.inspector.pk).name_normalized, 'احمد')
+
+    def test_company_name(self):
+        inspection = Inspection.objects.create(company=self.company, inspector=self.inspector, status='archived')
+        self.assertEqual(inspection.company_name_normalized, 'منشاه')
+        self.assertEqual(pdf.batch_queryset(company_name='مُنشأة').count(), 1)
+
+        # تعديل اسم المنشأة ينتقل إلى نسخته في التقارير
+        self.company.company_name = 'مؤسسة الأمل'
+        self.company.save(update_fields=['company_name'])
+        self.assertEqual(Inspection.objects.get().company_name_normalized, 'موسسه الامل')
+        self.assertEqual(pdf.batch_queryset(company_name='مؤسسة ال').count(), 1)
+        self.assertEqual(pdf.batch_queryset(company_name='منشأة').count(), 0)
+
+        # حفظ التقرير دون تغيير المنشأة لا يعيد قراءة اسمها المطبّع
+        inspection = Inspection.objects.get()
+        with CaptureQueriesContext(connection) as queries:
+            inspection.save()
+        self.assertFalse(any('SELECT "inspectors_company"."company_name_normalized"' in query['sql'] for query in queries))
+        other = Company.objects.create(company_name='مصنع النور', region='جدة', manager=self.manager)
+        inspection = Inspection.objects.get()
+        inspection.company_id = other.pk
+        inspection.save()
+        self.assertEqual(Inspection.objects.get().company_name_normalized, 'مصنع النور')
+
+        Company.objects.update(company_name_normalized='')
+        Inspection.objects.update(company_name_normalized='')
+        call_command('backfill_normalized_fields', stdout=io.StringIO())
+        self.assertEqual(Company.objects.get(pk=other.pk).company_name_normalized, 'مصنع النور')
+        self.assertEqual(Inspection.objects.get().company_name_normalized, 'مصنع النور')
+
+
+class TypeaheadTests(TeamTestCase):
+    """
+    اقتراح المفتشين أثناء الكتابة يطابق الاسم بعد التطبيع ويقتصر على مفتشي المدير.
+    """
+
+    def test_typeahead(self):
+        other = User.objects.create_user(
+            'other', 'other@example.com', 'pw', phone_number='300', user_id='300', first_name='أحمد', supervisor=self.manager,
+        )
+        other.groups.add(self.inspectors)
+        # مفتش غير تابع للمدير لا يظهر
+        User.objects.create_user(
+            'stranger', 'stranger@example.com', 'pw', phone_number='400', user_id='400', first_name='احمد',
+        ).groups.add(self.inspectors)
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('inspector_typeahead'), {'q': 'إحمد'})
+        self.assertEqual([result['id'] for result in response.json()['results']], [other.pk])
+
+
+class ContentAddressedStorageTests(TestCase):
+    """
+    الملف المكرر يُحفظ مرة واحدة، ولا يُحذف من القرص إلا بحذف آخر مرجع إليه.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.storage = ContentAddressedStorage(location=media_root)
+
+    def test_references(self):
+        first = self.storage.save('inspection_images/a.png', ContentFile(png_bytes()))
+        second = self.storage.save('company_images/b.png', ContentFile(png_bytes()))
+        self.assertEqual(first, second)
+        self.assertEqual(MediaBlob.objects.get(name=first).references, 2)
+
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.assertEqual(MediaBlob.objects.get(name=first).references, 1)
+        self.storage.delete(second)
+        self.assertFalse(self.storage.exists(first))
+
+
+class SyncTests(TeamTestCase):
+    """
+    مزامنة تطبيق المفتش: السحب الكامل والتغييرات فقط، وتطبيق العمليات مع كشف التعارض وإعادة الإرسال.
+    """
+
+    DATA = {
+        'workers_size_estimation': '5', 'license_compliance': 'compliant', 'female_workers_element': 'feasible',
+        'unlicensed_workers': 'non_violation', 'penalties_regulation': 'exists', 'work_regulation': 'exists',
+        'worker_file_maintenance': 'non_violation', 'extended_working_hours': 'non_violation',
+        'consecutive_shifts': 'non_violation', 'weekly_rest_schedule': 'non_violation',
+        'number_of_shifts': 'one_shift', 'inspector_opinion': '-',
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.inspector)
+
+    def push(self, *operations):
+        response = self.client.post(reverse('inspector_sync'), json.dumps({'operations': operations}),
+                                    content_type='application/json')
+        return response.json()['results']
+
+    def test_pull(self):
+        full = self.client.get(reverse('inspector_sync')).json()
+        self.assertEqual(full['company_ids'], [self.company.pk])
+        self.assertEqual(len(full['companies']['rows']), 1)
+        self.assertIn('schema', full)
+        changes = self.client.get(reverse('inspector_sync'), {'since': full['server_time']}).json()
+        self.assertEqual(changes['companies']['rows'], [])
+        self.assertEqual(changes['company_ids'], [self.company.pk])
+
+    def test_push(self):
+        stale = self.company.updated_at.isoformat()
+        [accepted] = self.push({'op': 'accept', 'company': self.company.pk, 'version': stale})
+        self.assertEqual(accepted['status'], 'ok')
+
+        sync_id = '7d0c2d5e-4f7a-4b8e-9a51-2f3c9d1e8a10'
+        draft = {'op': 'save_draft', 'company': self.company.pk, 'sync_id': sync_id, 'data': self.DATA}
+        first, = self.push(draft)
+        # إعادة إرسال الدفعة نفسها لا تنشئ مسودة ثانية
+        again, = self.push(draft)
+        self.assertEqual((first['status'], again['inspection']), ('ok', first['inspection']))
+        self.assertEqual(Inspection.objects.count(), 1)
+
+        edit = {'op': 'save_draft', 'inspection': first['inspection'], 'version': first['version'],
+                'data': {'inspector_opinion': 'تم'}}
+        edited, = self.push(edit)
+        self.assertEqual(edited['status'], 'ok')
+        conflict, = self.push(edit)
+        self.assertEqual(conflict['status'], 'conflict')
+        self.assertEqual(conflict['current']['inspector_opinion'], 'تم')
+
+        submitted, = self.push({'op': 'submit', 'inspection': first['inspection'], 'version': edited['version']})
+        self.assertEqual(submitted['status'], 'ok')
+        self.assertEqual(Inspection.objects.get().status, 'pending_approval')
+        self.assertTrue(Notification.objects.filter(recipient=self.manager).exists())
+        self.assertEqual(self.push({'op': 'unknown'})[0]['status'], 'error')
+
+    def test_foreign_sync_id(self):
+        other = User.objects.create_user(
+            'other', 'other@example.com', 'pw', phone_number='300', user_id='300', supervisor=self.manager,
+        )
+        other.groups.add(self.inspectors)
+        sync_id = '7d0c2d5e-4f7a-4b8e-9a51-2f3c9d1e8a10'
+        Inspection.objects.create(company=self.company, inspector=other, status='draft', sync_id=sync_id)
+        self.push({'op': 'accept', 'company': self.company.pk, 'version': self.company.updated_at.isoformat()})
+
+        # معرف مزامنة لمفتش آخر يعيد خطأ لهذه العملية فقط ولا يُفشل الدفعة
+        taken, fresh = self.push(
+            {'op': 'save_draft', 'company': self.company.pk, 'sync_id': sync_id, 'data': self.DATA},
+            {'op': 'save_draft', 'company': self.company.pk, 'sync_id': '0b7e1c1a-2d3f-4e5a-8b9c-0d1e2f3a4b5c', 'data': self.DATA},
+        )
+        self.assertEqual((taken['status'], list(taken['errors'])), ('error', ['sync_id']))
+        self.assertEqual(fresh['status'], 'ok')
+        self.assertEqual(Inspection.objects.filter(inspector=self.inspector).count(), 1)
+
+        # تعارض القيد الفريد أثناء الحفظ (طلبان متزامنان) يلغي نقطة الحفظ فقط
+        with mock.patch.object(Inspection.objects, 'select_for_update', return_value=Inspection.objects.none()):
+            [raced] = self.push({'op': 'save_draft', 'company': self.company.pk, 'sync_id': sync_id, 'data': self.DATA})
+        self.assertEqual((raced['status'], list(raced['errors'])), ('error', ['__all__']))
+        self.assertIn('تعارضت', raced['errors']['__all__'][0])
+        self.assertEqual(self.client.get(reverse('inspector_sync')).status_code, 200)
+
+
+class ConditionalGetTests(TeamTestCase):
+    """
+    الصفحات وملفات PDF تعيد 304 ما لم تتغير البيانات، وتتغير ETag مع تعديل التقرير أو المنشأة.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        patcher = mock.patch.object(pdf, 'PDF_CACHE_DIR', cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.inspection = Inspection.objects.create(company=self.company, inspector=self.inspector, status='archived')
+        self.client.force_login(self.manager)
+
+    def revalidate(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']), response['ETag']
+
+    def test_page(self):
+        url = reverse('inspection_report_detail', args=[self.inspection.pk])
+        response, etag = self.revalidate(url)
+        self.assertEqual(response.status_code, 304)
+        self.inspection.inspector_opinion = 'تم التعديل'
+        self.inspection.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_pdf(self):
+        url = reverse('generate_inspection_pdf', args=[self.inspection.pk])
+        response, etag = self.revalidate(url)
+        self.assertEqual(response.status_code, 304)
+        # اسم المنشأة يظهر في ملف PDF فيتغير معه
+        self.company.company_name = 'اسم جديد'
+        self.company.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class RoleTests(TeamTestCase):
+    """
+    الأدوار تُقرأ مرة واحدة في الطلب، وتغيير العضوية يظهر من الطلب التالي دون كاش مشترك.
+    """
+
+    def test_memo_per_request(self):
+        user = User.objects.get(pk=self.manager.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_roles(user), {MANAGERS})
+            self.assertEqual(get_user_roles(user), {MANAGERS})
+        user.groups.add(self.inspectors)
+        self.assertEqual(get_user_roles(user), {MANAGERS, INSPECTORS})
+
+    def test_membership_change(self):
+        self.client.force_login(self.manager)
+        self.assertEqual(self.client.get(reverse('companies_list')).status_code, 200)
+        # التعديل من جهة المجموعة لا يمر بكائن المستخدم المحمّل في الطلب
+        self.managers.user_set.remove(self.manager)
+        self.assertEqual(self.client.get(reverse('companies_list')).status_code, 302)
+
+
+class UnreadCountTests(TeamTestCase):
+    """
+    عدد الإشعارات غير المقروءة يُحسب من قاعدة البيانات مرة واحدة لكل طلب فيظهر أي إشعار جديد فوراً.
+    """
+
+    def unread(self):
+        response = self.client.get(reverse('companies_list'))
+        return response.context['unread_notifications_count']
+
+    def test_count(self):
+        self.client.force_login(self.manager)
+        self.assertEqual(self.unread(), 0)
+        dispatch_notifications([(self.manager, 'عنوان', 'رسالة', None)] * 2, sender=self.inspector, send_email=False)
+        # إشعار أُنشئ خارج مسار الإرسال (عملية أخرى أو سكربت)
+        Notification.objects.create(recipient=self.manager, title='t', message='m')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.unread(), 3)
+        self.assertEqual(sum('"is_read"' in query['sql'] and 'COUNT' in query['sql'] for query in queries), 1)
+
+        response = self.client.get(reverse('notifications_view'))
+        self.assertEqual(response.context['unread_notifications_count'], 0)
+        self.assertEqual(self.unread(), 0)
+
+
+class ExportTests(TeamTestCase):
+    """
+    التصدير بصيغتي CSV و XLSX يتبع البحث ويحوّل الخلايا التي تبدأ برموز الصيغ إلى نص.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.company.company_name = '=HYPERLINK("http://example.com")'
+        self.company.save()
+        Inspection.objects.create(company=self.company, inspector=self.inspector, status='pending_approval',
+                                  inspector_opinion='@SUM(A1)', license_compliance='compliant')
+        self.client.force_login(self.manager)
+
+    def test_csv(self):
+        response = self.client.get(reverse('manager_review_list'), {'export': 'csv'})
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(len(rows), 2)
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual(row['اسم المنشأة'], '\'=HYPERLINK("http://example.com")')
+        self.assertIn('\'@SUM(A1)', rows[1])
+
+    def test_xlsx(self):
+        response = self.client.get(reverse('manager_review_list'), {'export': 'xlsx'})
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        header, row = [[cell.value for cell in cells] for cells in sheet.iter_rows()]
+        self.assertEqual(row[header.index('اسم المنشأة')], '\'=HYPERLINK("http://example.com")')
+        self.assertIn('\'@SUM(A1)', row)
+
+
+class PdfCacheTests(TeamTestCase):
+    """
+    ملف PDF للتقرير يُولد مرة واحدة لكل نسخة، ويُعاد توليده عند تعديل التقرير أو المنشأة أو المفتش.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        patcher = mock.patch.object(pdf, 'PDF_CACHE_DIR', self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.inspection = Inspection.objects.create(company=self.company, inspector=self.inspector, status='archived')
+        self.url = reverse('generate_inspection_pdf', args=[self.inspection.pk])
+        self.client.force_login(self.manager)
+
+    def download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        return PdfReader(io.BytesIO(b''.join(response.streaming_content) if response.streaming else response.content))
+
+    def test_cache_per_version(self):
+        with mock.patch.object(pdf, 'render_inspection_pdf', wraps=pdf.render_inspection_pdf) as render:
+            self.assertGreaterEqual(len(self.download().pages), 1)
+            self.download()
+            self.assertEqual(render.call_count, 1)
+            self.inspector.first_name = 'سالم'
+            for change in (self.inspection, self.company, self.inspector):
+                with self.subTest(model=type(change).__name__):
+                    calls = render.call_count
+                    change.save()
+                    self.download()
+                    self.assertEqual(render.call_count, calls + 1)
+        # تبقى نسخة واحدة فقط لكل تقرير في مجلد الكاش
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+
+class DashboardTests(TeamTestCase):
+    """
+    إحصائيات لوحة المدير بالتجميع الشرطي تطابق العد المباشر لكل مفتش وللفريق وللمناطق.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.second = User.objects.create_user(
+            'second', 'second@example.com', 'pw', phone_number='300', user_id='300', supervisor=self.manager,
+        )
+        self.second.groups.add(self.inspectors)
+        # مفتش مدير آخر لا يدخل في الإحصائيات
+        stranger = User.objects.create_user('stranger', 'stranger@example.com', 'pw', phone_number='400', user_id='400')
+        stranger.groups.add(self.inspectors)
+        for inspector, status, license_compliance in (
+            (self.inspector, 'archived', 'non_compliant'), (self.inspector, 'archived', 'compliant'),
+            (self.inspector, 'draft', 'non_compliant'), (self.second, 'approved', 'non_compliant'),
+            (stranger, 'archived', 'non_compliant'),
+        ):
+            Inspection.objects.create(company=self.company, inspector=inspector, status=status,
+                                      license_compliance=license_compliance)
+
+    def rate(self, summary):
+        return dict(summary['violation_rates'])[str(Inspection._meta.get_field('license_compliance').verbose_name)]
+
+    def test_aggregates(self):
+        with self.assertNumQueries(5):
+            dashboard = build_manager_dashboard(self.manager)
+        rows = {row['pk']: row for row in dashboard['inspectors']}
+        self.assertEqual(set(rows), {self.inspector.pk, self.second.pk})
+
+        first = rows[self.inspector.pk]
+        self.assertEqual((first['inspections_total'], first['counted']), (3, 2))
+        self.assertEqual(self.rate(first), 50.0)
+        self.assertEqual(dict(first['assignments'])['تم التعيين'], 1)
+        self.assertEqual(self.rate(rows[self.second.pk]), 100.0)
+
+        totals = dashboard['totals']
+        self.assertEqual((totals['inspections_total'], totals['counted']), (4, 3))
+        self.assertEqual(self.rate(totals), round(100 * 2 / 3, 1))
+        [region] = dashboard['regions']
+        self.assertEqual((region['region'], region['inspections']), ('الرياض', 3))
+        self.assertEqual(self.rate(region), round(100 * 2 / 3, 1))
+
+        self.client.force_login(self.manager)
+        self.assertEqual(self.client.get(reverse('manager_dashboard')).status_code, 200)
+
+
+class RollupTests(TeamTestCase):
+    """
+    جداول التجميع تتبع اعتماد التقارير وتعديلها وحذفها وتغيير منطقة المنشأة، وتطابق إعادة البناء الكاملة.
+    """
+
+    def counts(self):
+        daily = {
+            (row.region, row.establishment_type, row.inspector_id): row.inspections_count
+            for row in InspectionDailyStats.objects.exclude(inspections_count=0)
+        }
+        compliance = {
+            (row.region, row.field, row.value): row.count for row in ComplianceRollup.objects.exclude(count=0)
+        }
+        return daily, compliance
+
+    def assertMatchesRebuild(self):
+        counts = self.counts()
+        self.assertFalse(InspectionDailyStats.objects.filter(inspections_count__lt=0).exists())
+        self.assertFalse(ComplianceRollup.objects.filter(count__lt=0).exists())
+        rebuild_rollups()
+        self.assertEqual(self.counts(), counts)
+        return counts
+
+    def test_changes(self):
+        self.company.establishment_type = 'factory'
+        self.company.save()
+        inspection = Inspection.objects.create(company=self.company, inspector=self.inspector, status='draft',
+                                               license_compliance='compliant')
+        self.assertEqual(self.assertMatchesRebuild(), ({}, {}))
+
+        inspection.status = 'approved'
+        inspection.save()
+        daily, compliance = self.assertMatchesRebuild()
+        self.assertEqual(daily, {('الرياض', 'factory', self.inspector.pk): 1})
+        self.assertEqual(compliance, {('الرياض', 'license_compliance', 'compliant'): 1})
+
+        inspection.license_compliance = 'non_compliant'
+        inspection.save()
+        self.assertEqual(self.assertMatchesRebuild()[1], {('الرياض', 'license_compliance', 'non_compliant'): 1})
+
+        # تغيير منطقة المنشأة ينقل تقاريرها المعتمدة للمفتاح الجديد
+        self.company.region = 'جدة'
+        self.company.save()
+        self.assertEqual(self.assertMatchesRebuild()[0], {('جدة', 'factory', self.inspector.pk): 1})
+
+        inspection.delete()
+        self.assertEqual(self.assertMatchesRebuild(), ({}, {}))
+
+
+class AuditRendererTests(TeamTestCase):
+    """
+    عرض تغييرات سجل التدقيق: أسماء الحقول والخيارات بالعربية، والكائنات المرتبطة باستعلام واحد لكل نموذج.
+    """
+
+    def test_render(self):
+        other = User.objects.create_user('other', 'other@example.com', 'pw', phone_number='300', user_id='300',
+                                         first_name='سالم')
+        self.company.assigned_to = other
+        self.company.status_by_inspector = 'accepted'
+        self.company.save()
+        entries = list(LogEntry.objects.get_for_object(self.company).select_related('content_type').order_by('pk'))
+        created, updated = entries
+
+        with self.assertNumQueries(1):
+            rendered = render_log_changes(entries)
+        changes = {change['field']: change for change in rendered[updated.pk]}
+        self.assertEqual(changes['المفتش المعين'], {
+            'field': 'المفتش المعين', 'old': inspector_label(self.inspector), 'new': inspector_label(other),
+        })
+        self.assertEqual((changes['حالة التعيين']['old'], changes['حالة التعيين']['new']), ('تم التعيين', 'تم القبول'))
+        # الإنشاء يعرض القيم غير الفارغة فقط وبدون قيمة قديمة
+        self.assertTrue(rendered[created.pk])
+        self.assertTrue(all(change['old'] is None and change['new'] for change in rendered[created.pk]))
+
+        # السجل المعروض مرة يُقرأ من الكاش
+        with self.assertNumQueries(0):
+            self.assertEqual(render_log_changes(entries), rendered)
+
+
+class PerformanceMiddlewareTests(TeamTestCase):
+    """
+    قياس الطلبات: ترويسة Server-Timing بعدد الاستعلامات الفعلي، والإحصائيات لكل مسار، وعينات الطلبات البطيئة.
+    """
+
+    def setUp(self):
+        super().setUp()
+        performance.stats.reset()
+        self.addCleanup(performance.stats.reset)
+
+    def test_server_timing_and_stats(self):
+        self.assertFalse(self.client.get(reverse('login')).has_header('Server-Timing'))
+
+        self.client.force_login(self.manager)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('companies_list'))
+        timing = re.fullmatch(r'db;dur=[\d.]+;desc="(\d+) queries", tpl;dur=([\d.]+), total;dur=[\d.]+', response['Server-Timing'])
+        self.assertEqual(int(timing.group(1)), len(queries))
+        self.assertGreater(float(timing.group(2)), 0)
+
+        route = performance.stats.snapshot()['routes']['companies_list']
+        self.assertEqual((route['requests'], route['queries']['max']), (1, len(queries)))
+        self.assertEqual(sum(route['histogram_ms'].values()), 1)
+
+    def test_slow_requests_and_endpoint(self):
+        self.client.force_login(self.manager)
+        with mock.patch('inspectors.middleware.PERFORMANCE_SLOW_REQUEST_MS', 0), \
+                self.assertLogs('inspectors.performance', 'WARNING'):
+            self.client.get(reverse('companies_list'))
+        [sample] = performance.stats.snapshot()['slow_requests']
+        self.assertEqual((sample['route'], sample['user']), ('companies_list', self.manager.pk))
+        self.assertEqual(len(sample['slowest_queries']), min(sample['queries'], performance.SLOW_REQUEST_QUERIES))
+
+        data = self.client.get(reverse('performance_stats')).json()
+        self.assertIn('companies_list', data['routes'])
+        self.client.post(reverse('performance_stats'))
+        # لا يبقى بعد التصفير إلا طلب التصفير نفسه
+        self.assertEqual(list(performance.stats.snapshot()['routes']), ['performance_stats'])
+
+        self.client.force_login(self.inspector)
+        self.assertEqual(self.client.get(reverse('performance_stats')).status_code, 302)
+
+
+class ImageProcessingTests(TeamTestCase):
+    """
+    الموقع الجغرافي وبيانات EXIF تُحذف قبل كتابة الصورة في التخزين، والنسخ المصغرة تُولد بعد الحفظ.
+    """
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        patcher = mock.patch.object(images, 'IMAGE_BACKGROUND_PROCESSING', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def photo(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        # الكاميرا مدارة 90 درجة
+        exif[0x0112] = 6
+        exif[0x8825] = {1: 'N', 2: (24.0, 42.0, 0.0)}
+        buffer = io.BytesIO()
+        Image.new('RGB', (3000, 2000), 'blue').save(buffer, 'JPEG', exif=exif)
+        return buffer.getvalue()
+
+    def assertClean(self, name):
+        with media_storage.open(name, 'rb') as f, Image.open(f) as stored:
+            self.assertFalse(stored.getexif())
+            # مُدارة حسب اتجاه الكاميرا ومصغرة إلى الحد الأقصى
+            width, height = stored.size
+            self.assertLess(width, height)
+            self.assertEqual(height, images.IMAGE_ORIGINAL_MAX_DIMENSION)
+
+    def test_upload(self):
+        image = CompanyImage(company=self.company, image=SimpleUploadedFile('photo.jpg', self.photo(), 'image/jpeg'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            image.save()
+        # الملف المحفوظ نظيف قبل أي معالجة في الخلفية
+        self.assertClean(image.image.name)
+        self.assertFalse(image.thumbnail)
+
+        name = image.image.name
+        for callback in callbacks:
+            callback()
+        image.refresh_from_db()
+        # المعالجة في الخلفية لا تعيد حفظ الأصل النظيف
+        self.assertEqual(image.image.name, name)
+        with media_storage.open(image.thumbnail.name, 'rb') as f, Image.open(f) as thumbnail:
+            self.assertEqual(max(thumbnail.size), images.IMAGE_THUMBNAIL_MAX_DIMENSION)
+        self.assertTrue(media_storage.exists(image.display.name))
+
+    def test_stored_upload(self):
+        stored = media_storage.save('uploads/photo.jpg', ContentFile(self.photo()))
+        image = CompanyImage(company=self.company)
+        images.attach_stored_image(image, stored)
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        image.refresh_from_db()
+        self.assertNotEqual(image.image.name, stored)
+        self.assertClean(image.image.name)
+        # مرجع الملف الأصلي حُرر بعد نجاح الحفظ
+        self.assertFalse(media_storage.exists(stored))
+        self.assertTrue(image.thumbnail)
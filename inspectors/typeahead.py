@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db.models import Q
+
+from .arabic import normalized_prefix_q
+from .models import User
+from .roles import INSPECTORS
+
+# عدد النتائج الافتراضي والأقصى لطلبات الإكمال التلقائي
+TYPEAHEAD_LIMIT = getattr(settings, 'TYPEAHEAD_LIMIT', 10)
+TYPEAHEAD_MAX_LIMIT = 25
+
+
+def inspector_label(user):
+    full_name = user.get_full_name()
+    return f'{full_name} ({user.username})' if full_name else user.username
+
+
+def manager_inspectors(manager, include_pk=None):
+    """
+    المفتشون التابعون للمدير (مع المفتش المعين حالياً حتى لو لم يكن تابعاً له).
+    """
+    condition = Q(supervisor=manager)
+    if include_pk:
+        condition |= Q(pk=include_pk)
+    return User.objects.filter(condition, groups__name=INSPECTORS)
+
+
+def search_inspectors(manager, query, limit=TYPEAHEAD_LIMIT):
+    """
+    أول N مفتش يبدأ اسمه (المطبّع) أو اسم المستخدم أو رقم الهوية بالنص المدخل.
+    """
+    query = (query or '').strip()
+    inspectors = manager_inspectors(manager).filter(is_active=True)
+    if query:
+        inspectors = inspectors.filter(
+            normalized_prefix_q('name_normalized', query) |
+            Q(username__istartswith=query) |
+            Q(user_id__startswith=query)
+        )
+    return list(
+        inspectors.order_by('name_normalized', 'username')
+        .only('pk', 'username', 'first_name', 'last_name')[:limit]
+    )
@@ -0,0 +1,220 @@
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import Inspection, PhotoUpload
+from .storage import media_storage
+
+# مجلد الأجزاء المؤقتة للرفع المجزأ (خارج MEDIA_ROOT لأن الملفات غير مكتملة وغير متحقق منها)
+UPLOAD_TEMP_DIR = getattr(settings, 'UPLOAD_TEMP_DIR', os.path.join(tempfile.gettempdir(), 'govinspect_uploads'))
+# حجم الجزء المقترح على المتصفح، وأقصى حجم للصورة الواحدة
+UPLOAD_CHUNK_SIZE = getattr(settings, 'UPLOAD_CHUNK_SIZE', 512 * 1024)
+UPLOAD_MAX_FILE_SIZE = getattr(settings, 'UPLOAD_MAX_FILE_SIZE', 25 * 1024 * 1024)
+# عمليات الرفع غير المرتبطة بتقرير تُحذف بعد هذه المدة (بالساعات)
+UPLOAD_EXPIRY_HOURS = getattr(settings, 'UPLOAD_EXPIRY_HOURS', 48)
+# حجم القراءة من جسم الطلب أثناء الكتابة إلى القرص
+STREAM_BLOCK_SIZE = 64 * 1024
+
+ALLOWED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp')
+# التقارير التي يمكن إضافة صور إليها
+EDITABLE_STATUSES = ('draft', 'rejected')
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def part_path(upload):
+    return os.path.join(UPLOAD_TEMP_DIR, f'{upload.pk}.part')
+
+
+def start_upload(user, filename, size, inspection_id=None):
+    """
+    يبدأ عملية رفع جديدة ويعيد سجلها. inspection_id اختياري لربط الصورة بمسودة تقرير موجودة.
+    """
+    filename = os.path.basename(filename or '')[:255]
+    if not filename or os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise UploadError('نوع الملف غير مدعوم. يرجى رفع صورة.')
+    if size <= 0 or size > UPLOAD_MAX_FILE_SIZE:
+        raise UploadError(f'حجم الصورة يجب ألا يتجاوز {UPLOAD_MAX_FILE_SIZE // (1024 * 1024)} ميجابايت.', status=413)
+
+    inspection = None
+    if inspection_id:
+        inspection = Inspection.objects.filter(
+            pk=inspection_id, inspector=user, status__in=EDITABLE_STATUSES,
+        ).only('pk').first()
+        if inspection is None:
+            raise UploadError('التقرير غير موجود أو لا يمكن تعديله.', status=404)
+
+    upload = PhotoUpload.objects.create(owner=user, inspection=inspection, filename=filename, size=size)
+    os.makedirs(UPLOAD_TEMP_DIR, exist_ok=True)
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def append_chunk(upload_id, user, offset, stream):
+    """
+    يكتب جزءاً من الملف من جسم الطلب مباشرة إلى القرص (دون تحميله في الذاكرة).
+    offset يجب أن يساوي ما استُلم حتى الآن، وإلا يعيد الخطأ 409 مع الموضع الصحيح ليكمل المتصفح منه.
+    عند اكتمال الملف يُتحقق أنه صورة ويُنقل إلى التخزين.
+    """
+    upload = PhotoUpload.objects.filter(pk=upload_id, owner=user).first()
+    if upload is None:
+        raise UploadError('عملية الرفع غير موجودة.', status=404)
+    if upload.is_complete:
+        return upload
+    if offset != upload.received:
+        raise UploadError('موضع الجزء لا يطابق ما تم استلامه.', status=409, offset=upload.received)
+    if not os.path.exists(part_path(upload)):
+        raise UploadError('انتهت صلاحية عملية الرفع، يرجى البدء من جديد.', status=410)
+
+    # جسم الطلب (الشبكة البطيئة) يُقرأ إلى ملف مؤقت قبل قفل السجل وفتح المعاملة
+    chunk_path = os.path.join(UPLOAD_TEMP_DIR, f'{upload.pk}.{uuid.uuid4().hex}.chunk')
+    try:
+        length = _receive_chunk(stream, chunk_path, upload.size - offset, offset)
+        return _append_received_chunk(upload_id, user, offset, chunk_path, length)
+    finally:
+        try:
+            os.remove(chunk_path)
+        except FileNotFoundError:
+            pass
+
+
+def _receive_chunk(stream, path, limit, offset):
+    length = 0
+    with open(path, 'wb') as chunk:
+        while True:
+            block = stream.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            length += len(block)
+            if length > limit:
+                raise UploadError('حجم البيانات أكبر من حجم الملف المعلن.', status=413, offset=offset)
+            chunk.write(block)
+    return length
+
+
+def _append_received_chunk(upload_id, user, offset, chunk_path, length):
+    with transaction.atomic():
+        upload = PhotoUpload.objects.select_for_update().filter(pk=upload_id, owner=user).first()
+        if upload is None:
+            raise UploadError('عملية الرفع غير موجودة.', status=404)
+        if upload.is_complete:
+            return upload
+        # طلب متزامن لنفس عملية الرفع سبق إلى هذا الموضع
+        if offset != upload.received:
+            raise UploadError('موضع الجزء لا يطابق ما تم استلامه.', status=409, offset=upload.received)
+
+        path = part_path(upload)
+        try:
+            with open(path, 'r+b') as part, open(chunk_path, 'rb') as chunk:
+                # جزء سابق كُتب ولم يُسجل (انقطع الاتصال أثناءه) يُستبدل
+                part.seek(offset)
+                part.truncate()
+                shutil.copyfileobj(chunk, part, STREAM_BLOCK_SIZE)
+        except FileNotFoundError:
+            raise UploadError('انتهت صلاحية عملية الرفع، يرجى البدء من جديد.', status=410)
+
+        upload.received = offset + length
+        invalid = False
+        if upload.received == upload.size:
+            invalid = not _is_image(path)
+            if invalid:
+                _remove_part(upload)
+                upload.delete()
+            else:
+                with open(path, 'rb') as f:
+                    upload.blob = media_storage.save(upload.filename, File(f, name=upload.filename))
+        if not invalid:
+            upload.save(update_fields=['received', 'blob', 'updated_at'])
+
+    if invalid:
+        raise UploadError('الملف المرفوع ليس صورة صالحة.', status=422)
+    if upload.is_complete:
+        _remove_part(upload)
+    return upload
+
+
+def _is_image(path):
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except Exception:
+        return False
+    return True
+
+
+def _remove_part(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def discard_upload(upload):
+    """
+    يحذف عملية الرفع وملفها المؤقت، ويحرر مرجع الصورة إن اكتملت ولم تُربط بتقرير.
+    """
+    _remove_part(upload)
+    if upload.blob:
+        transaction.on_commit(lambda name=upload.blob: media_storage.delete(name))
+    upload.delete()
+
+
+def _claimable(queryset, user, upload_id, inspection_id):
+    upload = queryset.filter(pk=upload_id, owner=user).exclude(blob='').first()
+    if upload is None or upload.inspection_id not in (None, inspection_id):
+        return None
+    return upload
+
+
+def find_upload(user, upload_id, inspection_id=None):
+    """
+    يعيد عملية رفع مكتملة يملكها المستخدم ويمكن ربطها بالتقرير، أو None (للتحقق في النماذج قبل الحفظ).
+    """
+    return _claimable(PhotoUpload.objects.all(), user, upload_id, inspection_id)
+
+
+def claim_upload(user, upload_id, inspection_id=None):
+    """
+    مثل find_upload لكن يقفل السجل حتى نهاية المعاملة، ويُحذف السجل فيها بعد ربط الصورة بالتقرير.
+    الطلب المتزامن الذي يطالب بنفس عملية الرفع ينتظر القفل ثم يحصل على None، فلا تُنشأ صورتان لملف واحد.
+    """
+    return _claimable(PhotoUpload.objects.select_for_update(), user, upload_id, inspection_id)
+
+
+def clean_expired_uploads(now=None):
+    """
+    يحذف عمليات الرفع القديمة التي لم تُربط بتقرير، والملفات المؤقتة التي ليس لها سجل.
+    """
+    cutoff = (now or timezone.now()) - timedelta(hours=UPLOAD_EXPIRY_HOURS)
+    removed = 0
+    for upload in PhotoUpload.objects.filter(updated_at__lt=cutoff).iterator():
+        with transaction.atomic():
+            discard_upload(upload)
+        removed += 1
+
+    if os.path.isdir(UPLOAD_TEMP_DIR):
+        known = {str(pk) for pk in PhotoUpload.objects.values_list('pk', flat=True)}
+        for filename in os.listdir(UPLOAD_TEMP_DIR):
+            path = os.path.join(UPLOAD_TEMP_DIR, filename)
+            upload_id = filename[:-len('.part')] if filename.endswith('.part') else None
+            # الملفات الحديثة قد تخص عملية رفع لم تُحفظ معاملتها بعد
+            if upload_id in known or os.path.getmtime(path) >= cutoff.timestamp():
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+    return removed
@@ -16,6 +16,8 @@ urlpatterns = [
 
     # 1. قائمة المفتشين
     path('managers/inspectors/', views.inspectors_list_view, name='inspectors_list'),
+    # إشعار لجميع المفتشين التابعين للمدير
+    path('managers/inspectors/notify/', views.notify_team_view, name='notify_team'),
     
     # 2. تفاصيل المفتش (نستخدم pk كمعرف)
     path('managers/inspectors/<int:pk>/', views.inspector_detail_view, name='inspector_detail'),
@@ -23,11 +25,16 @@ urlpatterns = [
     # 🛑 مسار تعديل بيانات المفتش بواسطة المدير (جديد) 🛑
     path('manager/inspector/<int:pk>/edit/', views.manager_edit_inspector_view, name='manager_edit_inspector'),
 
+    path('manager/dashboard/', views.manager_dashboard_view, name='manager_dashboard'),
+
     path('manager/audit-logs/', views.manager_audit_log_view, name='manager_audit_logs'),
+    path('manager/performance/', views.performance_stats_view, name='performance_stats'),
     
     # مسارات الشركات
     path('companies/', views.companies_list, name='companies_list'),
     path('companies/add/', views.add_company_view, name='add_company'),
+    path('companies/import/', views.import_companies_view, name='import_companies'),
+    path('api/inspectors/typeahead/', views.inspector_typeahead_view, name='inspector_typeahead'),
     path('companies/<int:pk>/', views.company_details_view, name='company_details'),
     path('companies/<int:pk>/edit/', views.edit_company_view, name='edit_company'), 
     path('companies/<int:pk>/hide/', views.hide_company_view, name='hide_company'),
@@ -46,6 +53,7 @@ urlpatterns = [
 
      # 2. الأرشيف والحذف (المدير)
     path('reports/archive/', views.manager_reports_archive_view, name='reports_archive'),
+    path('reports/archive/pdf/', views.batch_inspection_pdf_view, name='batch_inspection_pdf'),
     path('reports/deleted/', views.manager_deleted_reports_view, name='manager_deleted_reports'), # ✅ جديد
     
     
@@ -55,6 +63,11 @@ urlpatterns = [
     path('inspection/<int:pk>/hide/', views.soft_delete_inspection_view, name='soft_delete_inspection'), # مسار لإخفاء التقرير
     path('inspection/<int:pk>/restore/', views.restore_inspection_view, name='restore_inspection'), # المسار الجديد للاسترجاع
     path('inspection/<int:pk>/edit/', views.edit_inspection_view, name='edit_inspection'),
+    # رفع صور التقرير على أجزاء مع الاستكمال بعد انقطاع الاتصال
+    path('api/uploads/', views.photo_upload_create_view, name='photo_upload_create'),
+    path('api/uploads/<uuid:pk>/', views.photo_upload_view, name='photo_upload'),
+    # مزامنة تطبيق المفتش دون اتصال
+    path('api/sync/', views.inspector_sync_view, name='inspector_sync'),
 
     # الارسال للمراجعة (المفتش)
     path('inspection/<int:pk>/submit/', views.submit_for_review_view, name='submit_for_review'),
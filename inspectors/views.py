@@ -1,31 +1,51 @@
+import json
 import os
 from django.shortcuts import render, redirect, get_object_or_404
-from .forms import InspectorCreationForm, CompanyImageForm, ManagerCompanyForm, InspectorCompanyForm, InspectionForm, InspectionImageFormSet, InspectorAuthenticationForm, DeclineReasonForm, UserProfileEditForm
+from .forms import InspectorCreationForm, CompanyImageForm, ManagerCompanyForm, InspectorCompanyForm, InspectionForm, InspectionImageFormSet, InspectorAuthenticationForm, DeclineReasonForm, UserProfileEditForm, CompanyImportForm, TeamNotificationForm
 from django.contrib.auth import login, logout
 from django.forms import inlineformset_factory
 from django.contrib.auth.forms import AuthenticationForm
 from django.core.mail import send_mail
 from django.conf import settings
 from django.views.decorators.csrf import requires_csrf_token
+from django.views.decorators.http import require_http_methods, require_POST
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import Group
-from .models import Company, Inspection, InspectionImage, CompanyImage, Notification
+from .models import Company, Inspection, InspectionImage, CompanyImage, Notification, PhotoUpload
 from django.contrib import messages
 from django.core.mail import EmailMessage
 from django.db import transaction
-from django.db.models import Q
-from django.utils.dateparse import parse_date
+from django.db.models import Q, prefetch_related_objects
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils import timezone
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse, FileResponse, JsonResponse
+from django.urls import reverse
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import io
-from datetime import date
+import tempfile
+from datetime import date, datetime
 from auditlog.models import LogEntry
 from django.contrib.contenttypes.models import ContentType
+from .pagination import paginate_keyset, paginate_list_keyset
+from .roles import has_role, MANAGERS, INSPECTORS
+from .notifications import notify_team, reset_unread_count
+from .outbox import enqueue_email
+from .importers import import_companies, ImportFileError, IMPORT_FIELDS
+from .exports import export_inspections, EXPORT_FORMATS
+from .search import search_ids, search_ordering, search_queryset
+from .typeahead import TYPEAHEAD_LIMIT, TYPEAHEAD_MAX_LIMIT, inspector_label, search_inspectors
+from .dashboard import get_manager_dashboard, get_inspector_statistics
+from .pdf import PDF_VERSION_FIELDS, batch_queryset, get_cached_pdf_path, inspection_payload, pdf_etag, pdf_version, render_inspection_pdf_cached, render_merged_pdf, stream_zip
+from .audit import render_log_changes
+from .conditional import company_version, conditional_response, inspection_version, page_etag, with_company_version, with_inspection_version
+from .sync import SyncError, pull as sync_pull, push as sync_push
+from .uploads import UPLOAD_CHUNK_SIZE, UploadError, append_chunk, discard_upload, start_upload
+from .performance import stats as performance_stats
+from .audit_archive import archive_index, filter_archived_entries, load_archived_entries
 
 
 from django.contrib.auth import get_user_model
@@ -61,30 +81,26 @@ def logout_view(request):
     return redirect('login')
 
 def is_manager(user):
-    return user.is_authenticated and user.groups.filter(name='Managers').exists()
+    return user.is_authenticated and has_role(user, MANAGERS)
 
 def is_inspector(user):
-    return user.is_authenticated and user.groups.filter(name='Inspectors').exists()
+    return user.is_authenticated and has_role(user, INSPECTORS)
 
 def is_system_user(user):
     # نتحقق أولاً أنه ليس superuser
     if user.is_superuser:
         return False
     # نتحقق أنه ينتمي لأحد المجموعتين
-    return user.groups.filter(name__in=['Managers', 'Inspectors']).exists()
+    return has_role(user, MANAGERS, INSPECTORS)
 
 # دالة لإرسال إشعار بالبريد الإلكتروني
 def send_assignment_notification(company):
+    # تُضاف الرسالة لصندوق البريد الصادر ولا يُنتظر خادم SMTP داخل الطلب
     inspector = company.assigned_to
     if inspector and inspector.email:
         subject = f"تم تعيين منشأة جديدة لك: {company.company_name}"
         message = f"مرحباً {inspector.username},\n\nتم تعيين منشأة جديدة لك لإجراء التفتيش عليها:\n{company.company_name} - {company.region}\n\nيرجى تسجيل الدخول إلى النظام لتأكيد الاستلام والبدء في العمل."
-        email = EmailMessage(
-            subject,
-            message,
-            to=[inspector.email]
-        )
-        email.send()
+        enqueue_email(subject, message, [inspector.email])
 
 # دالة مساعدة لإنشاء إشعار
 def create_notification(recipient, sender, title, message, company=None):
@@ -135,14 +151,8 @@ def inspectors_list_view(request):
     # 2. تطبيق البحث (Searching)
     search_query = request.GET.get('q') # الحصول على قيمة خانة البحث
     if search_query:
-        # البحث في حقول متعددة باستخدام Q (OR logic)
-        inspectors = inspectors.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(username__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(user_id__icontains=search_query) 
-        )
+        # البحث في فهرس البحث (الاسم، اسم المستخدم، البريد، رقم الهوية) مع ترتيب حسب الصلة
+        inspectors = search_queryset(inspectors, 'user', search_query)
 
     # 3. تطبيق التصفية (Filtering) حسب حالة النشاط (is_active)
     filter_status = request.GET.get('status') # الحصول على قيمة التصفية
@@ -162,24 +172,44 @@ def inspectors_list_view(request):
     # نستخدم حقول الاسم، اسم المستخدم، تاريخ الانضمام، وحالة النشاط
     allowed_orders = ['last_name', '-last_name', 'username', '-username', 'date_joined', '-date_joined', '-is_active', 'is_active'] 
     
-    if order_by in allowed_orders:
-        inspectors = inspectors.order_by(order_by)
-    else:
+    if order_by not in allowed_orders:
         # إذا كانت القيمة غير آمنة، نستخدم الترتيب الافتراضي
-        inspectors = inspectors.order_by(default_order)
+        order_by = default_order
+
+    # 5. الترقيم بالمؤشر (Keyset) بدلاً من تحميل جميع الصفوف
+    page = paginate_keyset(request, inspectors, search_ordering(request, 'order_by', order_by, search_query))
 
-    if not inspectors.exists():
+    if not page:
         messages.info(request, "لا يوجد مفتشون مطابقون لمعايير البحث/التصفية.")
     
     context = {
-        'inspectors': inspectors,
+        'inspectors': page,
+        'page': page,
         'page_title': 'المفتشون التابعون لي',
         'search_query': search_query, # تمرير قيمة البحث للحفاظ عليها في النموذج
         'filter_status': filter_status, # تمرير قيمة التصفية للحفاظ عليها
         'current_order': order_by,
+        'team_form': TeamNotificationForm(),
     }
     return render(request, 'inspectors/inspectors_list.html', context)
 
+
+# إشعار واحد لجميع المفتشين النشطين التابعين للمدير (إدخال جماعي، والبريد عبر صندوق البريد الصادر)
+@login_required(login_url='login')
+@user_passes_test(is_manager)
+@require_POST
+def notify_team_view(request):
+    form = TeamNotificationForm(request.POST)
+    if form.is_valid():
+        results = notify_team(
+            request.user, form.cleaned_data['title'], form.cleaned_data['message'],
+            send_email=form.cleaned_data['send_email'],
+        )
+        messages.success(request, f"تم إرسال الإشعار إلى {len(results)} مفتش.")
+    else:
+        messages.error(request, "العنوان والرسالة مطلوبان لإرسال إشعار للفريق.")
+    return redirect('inspectors_list')
+
 @login_required(login_url='login')
 @user_passes_test(is_manager)
 def inspector_detail_view(request, pk):
@@ -188,19 +218,35 @@ def inspector_detail_view(request, pk):
     inspector = get_object_or_404(User, pk=pk)
 
     # 3. التأكد من أن المستخدم المُستعرض هو مفتش فعلاً (للتأمين)
-    if inspector.supervisor != request.user or inspector.is_superuser or not inspector.groups.filter(name='Inspectors').exists():
+    if inspector.supervisor_id != request.user.pk or inspector.is_superuser or not has_role(inspector, INSPECTORS):
         messages.error(request, "المستخدم المطلوب ليس مفتشاً.")
         return redirect('inspectors_list')
         
-    # يمكن هنا إضافة معلومات إحصائية للمفتش (مثل عدد التقارير)
-    
+    # إحصائيات المفتش من نفس بيانات لوحة المدير (مخزنة في الكاش)
+    stats = get_inspector_statistics(request.user, inspector.pk)
+
     context = {
         'inspector': inspector,
+        'stats': stats,
         'page_title': f'تفاصيل المفتش: {inspector.get_full_name()}',
     }
     return render(request, 'inspectors/inspector_detail.html', context)
 
 
+@login_required(login_url='login')
+@user_passes_test(is_manager)
+def manager_dashboard_view(request):
+    """
+    لوحة المدير: إحصائيات التعيينات والتقارير ونسب المخالفات لكل مفتش تابع له.
+    """
+    dashboard = get_manager_dashboard(request.user)
+    context = {
+        'dashboard': dashboard,
+        'page_title': 'لوحة المتابعة',
+    }
+    return render(request, 'inspectors/manager_dashboard.html', context)
+
+
 # دالة تعديل الملف الشخصي
 @login_required(login_url='login')
 def edit_profile_view(request):
@@ -235,7 +281,7 @@ def manager_edit_inspector_view(request, pk):
     inspector = get_object_or_404(User, pk=pk)
     
     # 2. تحقق أمان إضافي: التأكد من أن الكائن هو مفتش (أو ليس المدير نفسه إذا أردتِ)
-    if inspector.supervisor != request.user or inspector.is_superuser or not inspector.groups.filter(name='Inspectors').exists():
+    if inspector.supervisor != request.user or inspector.is_superuser or not has_role(inspector, INSPECTORS):
         messages.error(request, 'ليس لديك الصلاحية لتعديل بيانات هذا المستخدم، إما لأنه ليس تابعًا لك أو ليس مفتشًا معتمدًا.')
         return redirect('inspectors_list')
 
@@ -272,22 +318,17 @@ def companies_list(request):
     user = request.user
     
     # التحقق من نوع المستخدم (باستخدام المجموعات أو السمات التي عرفتيها سابقاً)
-    if user.groups.filter(name='Managers').exists():
-        companies = Company.objects.filter(status='active')
-    elif user.groups.filter(name='Inspectors').exists():
+    if is_manager(user):
+        companies = Company.objects.filter(status='active').select_related('assigned_to')
+    elif is_inspector(user):
         # المفتش يرى الشركات المعينة له فقط
         companies = Company.objects.filter(assigned_to=user, status='active')
     else:
         companies = Company.objects.none()
 
-    # جلب عدد الإشعارات غير المقروءة
-    unread_notifications_count = Notification.objects.filter(recipient=user, is_read=False).count()
-
-    # فلترة بالبحث النصي
+    # فلترة بالبحث النصي (فهرس البحث مع تطبيع العربية)
     if query:
-        companies = companies.filter(
-            Q(company_name__icontains=query) | Q(region__icontains=query)
-        )
+        companies = search_queryset(companies, 'company', query)
 
     # فلترة بالتاريخ
     if start_date and end_date:
@@ -297,15 +338,17 @@ def companies_list(request):
             companies = companies.filter(created_at__date__range=(start, end))
 
     # تطبيق الترتيب (يجب التأكد من أن sort_order قيمة آمنة)
-    companies = companies.order_by(sort_order)
+    if sort_order not in ['-created_at', 'created_at']:
+        sort_order = '-created_at'
+    page = paginate_keyset(request, companies, search_ordering(request, 'sort_order', sort_order, query))
 
     context = {
-        'companies': companies,
+        'companies': page,
+        'page': page,
         'query': query,
         'start_date': start_date,
         'end_date': end_date,
         'sort_order': sort_order,
-        'unread_notifications_count': unread_notifications_count,
     }
     return render(request, 'inspectors/companies_list.html', context)
 
@@ -334,9 +377,7 @@ def hidden_companies_list(request):
     companies = Company.objects.filter(status='deleted')
 
     if query:
-        companies = companies.filter(
-            Q(company_name__icontains=query) | Q(region__icontains=query)
-        )
+        companies = search_queryset(companies, 'company', query)
 
     if start_date and end_date:
         start = parse_date(start_date)
@@ -344,10 +385,13 @@ def hidden_companies_list(request):
         if start and end:
             companies = companies.filter(created_at__date__range=(start, end))
 
-    companies = companies.order_by(sort_order)
+    if sort_order not in ['-created_at', 'created_at']:
+        sort_order = '-created_at'
+    page = paginate_keyset(request, companies, search_ordering(request, 'sort_order', sort_order, query))
 
     context = {
-        'companies': companies,
+        'companies': page,
+        'page': page,
         'query': query,
         'start_date': start_date,
         'end_date': end_date,
@@ -373,7 +417,7 @@ def show_company_view(request, pk):
 @user_passes_test(is_manager)
 def add_company_view(request):
     if request.method == 'POST':
-        form = ManagerCompanyForm(request.POST)
+        form = ManagerCompanyForm(request.POST, manager=request.user)
         if form.is_valid():
             company = form.save(commit=False)
             company.manager = request.user
@@ -392,12 +436,149 @@ def add_company_view(request):
             messages.success(request, f"تم إضافة منشأة {company.company_name} بنجاح وتم تعيينها للمفتش.")
             return redirect('companies_list')
     else:
-        form = ManagerCompanyForm()
+        form = ManagerCompanyForm(manager=request.user)
     
     context = {'form': form}
     return render(request, 'inspectors/add_company.html', context)
 
 
+# واجهة الإكمال التلقائي لاختيار المفتش في نماذج المنشآت (للمدير فقط)
+@login_required(login_url='login')
+@user_passes_test(is_manager)
+def inspector_typeahead_view(request):
+    try:
+        limit = min(int(request.GET.get('limit', TYPEAHEAD_LIMIT)), TYPEAHEAD_MAX_LIMIT)
+    except ValueError:
+        limit = TYPEAHEAD_LIMIT
+    inspectors = search_inspectors(request.user, request.GET.get('q', ''), limit=max(limit, 1))
+    return JsonResponse({
+        'results': [{'id': inspector.pk, 'text': inspector_label(inspector)} for inspector in inspectors],
+    })
+
+
+# إحصائيات أداء الصفحات في العملية الحالية (للمدير فقط)، و POST يعيد تصفيرها
+@login_required(login_url='login')
+@user_passes_test(is_manager)
+def performance_stats_view(request):
+    if request.method == 'POST':
+        performance_stats.reset()
+    return JsonResponse(performance_stats.snapshot(), json_dumps_params={'ensure_ascii': False})
+
+
+def _upload_payload(upload):
+    return {
+        'id': str(upload.pk),
+        'offset': upload.received,
+        'size': upload.size,
+        'complete': upload.is_complete,
+        'chunk_size': UPLOAD_CHUNK_SIZE,
+        'url': reverse('photo_upload', args=[upload.pk]),
+    }
+
+
+def _upload_error(error):
+    return JsonResponse({'error': str(error), 'offset': error.offset}, status=error.status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+# رفع صور التقرير على أجزاء: POST يبدأ عملية رفع (filename, size, inspection اختياري)
+@login_required(login_url='login')
+@user_passes_test(is_system_user, login_url='login')
+@require_POST
+def photo_upload_create_view(request):
+    try:
+        size = int(request.POST.get('size', ''))
+        inspection_id = int(request.POST['inspection']) if request.POST.get('inspection') else None
+    except ValueError:
+        return JsonResponse({'error': 'بيانات الرفع غير صحيحة.'}, status=400, json_dumps_params={'ensure_ascii': False})
+    try:
+        upload = start_upload(request.user, request.POST.get('filename'), size, inspection_id)
+    except UploadError as e:
+        return _upload_error(e)
+    return JsonResponse(_upload_payload(upload), status=201)
+
+
+# GET يعيد ما استُلم (للاستكمال بعد انقطاع الاتصال)، PATCH يضيف جزءاً من موضع ترويسة Upload-Offset،
+# و DELETE يلغي عملية الرفع. جسم طلب PATCH يُكتب إلى القرص مباشرة دون قراءته كاملاً في الذاكرة
+@login_required(login_url='login')
+@user_passes_test(is_system_user, login_url='login')
+@require_http_methods(['GET', 'PATCH', 'DELETE'])
+def photo_upload_view(request, pk):
+    if request.method == 'PATCH':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return JsonResponse({'error': 'ترويسة Upload-Offset مطلوبة.'}, status=400, json_dumps_params={'ensure_ascii': False})
+        try:
+            upload = append_chunk(pk, request.user, offset, request)
+        except UploadError as e:
+            return _upload_error(e)
+        return JsonResponse(_upload_payload(upload))
+
+    upload = get_object_or_404(PhotoUpload, pk=pk, owner=request.user)
+    if request.method == 'DELETE':
+        with transaction.atomic():
+            discard_upload(upload)
+        return HttpResponse(status=204)
+    return JsonResponse(_upload_payload(upload))
+
+
+# مزامنة تطبيق المفتش دون اتصال: GET يعيد المنشآت المسندة والتقارير المفتوحة (since للتغييرات فقط)،
+# و POST يطبق دفعة عمليات {"operations": [...]} (قبول/رفض المهمة، حفظ مسودة، إرسال للمراجعة) في معاملة واحدة
+@login_required(login_url='login')
+@user_passes_test(is_inspector, login_url='login')
+@require_http_methods(['GET', 'POST'])
+def inspector_sync_view(request):
+    json_params = {'ensure_ascii': False}
+    if request.method == 'POST':
+        try:
+            body = json.loads(request.body or b'{}')
+            results = sync_push(request.user, body.get('operations') if isinstance(body, dict) else None)
+        except ValueError:
+            return JsonResponse({'error': 'صيغة JSON غير صحيحة.'}, status=400, json_dumps_params=json_params)
+        except SyncError as e:
+            return JsonResponse({'error': str(e)}, status=400, json_dumps_params=json_params)
+        return JsonResponse({'results': results}, json_dumps_params=json_params)
+
+    since = None
+    if request.GET.get('since'):
+        since = parse_datetime(request.GET['since'])
+        if since is None:
+            return JsonResponse({'error': 'صيغة since غير صحيحة.'}, status=400, json_dumps_params=json_params)
+    return JsonResponse(sync_pull(request.user, since), json_dumps_params=json_params)
+
+
+# استيراد المنشآت من ملف (للمدير فقط)
+@login_required(login_url='login')
+@user_passes_test(is_manager)
+def import_companies_view(request):
+    report = None
+    if request.method == 'POST':
+        form = CompanyImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                report = import_companies(upload.file, upload.name, request.user, dry_run=form.cleaned_data['dry_run'])
+            except ImportFileError as e:
+                form.add_error('file', str(e))
+            else:
+                if form.cleaned_data['dry_run']:
+                    messages.info(request, f"تم فحص {report.processed} صف: {report.processed - report.failed} صالح و {report.failed} يحتوي على أخطاء.")
+                else:
+                    messages.success(request, f"تمت إضافة {report.created} منشأة من أصل {report.processed} صف.")
+                    if not report.errors:
+                        return redirect('companies_list')
+    else:
+        form = CompanyImportForm()
+
+    context = {
+        'form': form,
+        'report': report,
+        'import_fields': IMPORT_FIELDS,
+    }
+    return render(request, 'inspectors/import_companies.html', context)
+
+
 # 3. قبول المهمة
 @login_required(login_url='login')
 @user_passes_test(is_inspector)
@@ -455,16 +636,17 @@ def decline_assignment_view(request, pk):
 @login_required(login_url='login')
 @user_passes_test(is_system_user, login_url='login') # يستخدم الدالة الموحدة
 def notifications_view(request):
-    notifications = Notification.objects.filter(recipient=request.user).order_by('-created_at')
+    notifications = Notification.objects.filter(recipient=request.user).select_related('related_company').order_by('-created_at')
     
     # وضع علامة "تمت القراءة" على جميع الإشعارات
-    notifications.update(is_read=True)
+    notifications.filter(is_read=False).update(is_read=True)
+    reset_unread_count(request.user)
 
     return render(request, 'inspectors/notifications.html', {'notifications': notifications})
 
 @login_required(login_url='login')
 def company_details_view(request, pk):
-    company = get_object_or_404(Company, id=pk) # ✅ جلب الشركة أولاً
+    company = get_object_or_404(with_company_version(Company.objects.select_related('assigned_to')), id=pk) # ✅ جلب الشركة أولاً (مع نسخة بياناتها)
     if is_manager(request.user):
         pass # المدير لديه حق الوصول دائمًا
         
@@ -481,12 +663,17 @@ def company_details_view(request, pk):
     else:
         return redirect('home')
     
-    inspections = Inspection.objects.filter(company=company).exclude(status='deleted').order_by('-inspection_date')
-    context = {
-        'company': company,
-        'inspections': inspections
-    }
-    return render(request, 'inspectors/company_details.html', context)
+    def build():
+        prefetch_related_objects([company], 'companyimage_set')
+        inspections = Inspection.objects.filter(company=company).exclude(status='deleted').select_related('inspector').order_by('-inspection_date')
+        context = {
+            'company': company,
+            'inspections': inspections
+        }
+        return render(request, 'inspectors/company_details.html', context)
+
+    # إن لم تتغير المنشأة وصورها وتقاريرها منذ آخر زيارة يُعاد 304 دون عرض القالب
+    return conditional_response(request, build, etag=page_etag(request, company_version(company)))
 
 
 
@@ -520,8 +707,9 @@ def edit_company_view(request, pk):
         return redirect('companies_list')
 
     # 2. التعامل مع طلب POST
+    form_kwargs = {} if is_inspector_flow else {'manager': request.user}
     if request.method == 'POST':
-        form = FormClass(request.POST, request.FILES, instance=company)
+        form = FormClass(request.POST, request.FILES, instance=company, **form_kwargs)
         formset = ImageFormSet(request.POST, request.FILES, instance=company) if ImageFormSet else None
 
         # التحقق من صحة النموذج والـ formset (إذا كان موجوداً)
@@ -587,7 +775,7 @@ def edit_company_view(request, pk):
     
     # 3. التعامل مع طلب GET
     else:
-        form = FormClass(instance=company)
+        form = FormClass(instance=company, **form_kwargs)
         formset = ImageFormSet(instance=company) if ImageFormSet else None
     
     context = {
@@ -617,7 +805,7 @@ def add_inspection_view(request, pk):
 
     if request.method == 'POST':
         inspection_form = InspectionForm(request.POST)
-        image_formset = InspectionImageFormSet(request.POST, request.FILES, prefix='images')
+        image_formset = InspectionImageFormSet(request.POST, request.FILES, prefix='images', form_kwargs={'user': request.user})
 
         if inspection_form.is_valid() and image_formset.is_valid():
             try:
@@ -640,11 +828,13 @@ def add_inspection_view(request, pk):
 
                 messages.success(request, "تم حفظ المسودة بنجاح.")
                 return redirect('inspection_report_detail', pk=inspection.pk)
+            except UploadError as e:
+                messages.error(request, str(e))
             except Exception as e:
                 inspection_form.add_error(None, f"حدث خطأ أثناء الحفظ: {str(e)}")
     else:
         inspection_form = InspectionForm()
-        image_formset = InspectionImageFormSet(prefix='images')
+        image_formset = InspectionImageFormSet(prefix='images', form_kwargs={'user': request.user})
 
     context = {
         'company': company,
@@ -659,20 +849,23 @@ def add_inspection_view(request, pk):
 @login_required(login_url='login')
 @user_passes_test(is_system_user, login_url='login')
 def inspection_report_detail_view(request, pk):
-    inspection = get_object_or_404(Inspection, pk=pk)
+    inspection = get_object_or_404(with_inspection_version(Inspection.objects.select_related('company', 'inspector')), pk=pk)
     
     # حماية: المفتش يرى تقاريره فقط، المدير يرى كل شيء
     if not is_manager(request.user) and inspection.inspector != request.user:
         messages.error(request, "ليس لديك صلاحية لعرض هذا التقرير.")
         return redirect('companies_list')
 
-    images = InspectionImage.objects.filter(inspection=inspection)
-    context = {
-        'inspection': inspection,
-        'company': inspection.company,
-        'images': images,
-    }
-    return render(request, 'inspectors/inspection_report_detail.html', context)
+    def build():
+        images = InspectionImage.objects.filter(inspection=inspection)
+        context = {
+            'inspection': inspection,
+            'company': inspection.company,
+            'images': images,
+        }
+        return render(request, 'inspectors/inspection_report_detail.html', context)
+
+    return conditional_response(request, build, etag=page_etag(request, inspection_version(inspection)))
 
 
 
@@ -681,26 +874,59 @@ def inspection_report_detail_view(request, pk):
 @login_required(login_url='login')
 @user_passes_test(is_system_user, login_url='login')
 def generate_inspection_pdf_view(request, pk):
-    inspection = get_object_or_404(Inspection, pk=pk)
-    
-    # إنشاء ملف في الذاكرة
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    
-    # كتابة نص بسيط (ملاحظة: reportlab الأساسي لا يدعم العربي بسهولة بدون خطوط)
-    # عشان نضمن إن الموقع يفتح، هنكتب بالإنجليزية مؤقتاً
-    p.drawString(100, 800, f"Inspection Report - ID: {inspection.pk}")
-    p.drawString(100, 780, f"Company: {inspection.company.company_name}")
-    p.drawString(100, 760, f"Inspector: {inspection.inspector.username}")
-    p.drawString(100, 740, f"Date: {inspection.inspection_date}")
-    
-    # إنهاء الصفحة
-    p.showPage()
-    p.save()
-    
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="inspection_{inspection.pk}.pdf"'
+    # محتوى PDF لا يعتمد على المستخدم، ونسخته تُحسب من التقرير والمنشأة والمفتش باستعلام واحد صغير
+    # قبل جلب التقرير كاملاً أو فتح الملف: التقارير المؤرشفة لا تتغير فتُعاد 304 مباشرة.
+    # لا يُرسل Last-Modified لأن بيانات المفتش ليس لها وقت تحديث، فـ ETag هو المرجع الوحيد
+    values = Inspection.objects.filter(pk=pk).values_list(*PDF_VERSION_FIELDS).first()
+    if values is None:
+        raise Http404
+    version = pdf_version(values)
+    filename = f'inspection_{pk}.pdf'
+
+    def build():
+        # إذا لم يتغير التقرير أو منشأته أو مفتشه منذ آخر توليد يُرسل الملف المحفوظ مباشرة
+        cached = get_cached_pdf_path(pk, version)
+        if cached:
+            return FileResponse(open(cached, 'rb'), as_attachment=True, filename=filename, content_type='application/pdf')
+
+        # التوليد يتم بنفس الدالة المستخدمة في التوليد الجماعي
+        inspection = get_object_or_404(Inspection.objects.select_related('company', 'inspector'), pk=pk)
+        pdf = render_inspection_pdf_cached(inspection_payload(inspection))
+
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    return conditional_response(request, build, etag=pdf_etag(pk, version))
+
+
+@login_required(login_url='login')
+@user_passes_test(is_manager)
+def batch_inspection_pdf_view(request):
+    """
+    توليد ملفات PDF لمجموعة تقارير دفعة واحدة (مثلاً جميع التقارير المؤرشفة لمنطقة أو فترة)
+    وإرسالها كملف ZIP تدفقي أو كملف PDF واحد مدمج.
+    """
+    status = request.GET.get('status', 'archived')
+    if status not in ['approved', 'archived', 'rejected']:
+        status = 'archived'
+
+    inspections = batch_queryset(
+        status=status,
+        region=request.GET.get('region', '').strip() or None,
+        company_name=request.GET.get('company', '').strip() or None,
+        start_date=parse_date(request.GET.get('start_date', '')),
+        end_date=parse_date(request.GET.get('end_date', '')),
+    )
+    stamp = timezone.localtime().strftime('%Y%m%d_%H%M')
+
+    if request.GET.get('format') == 'pdf':
+        output = render_merged_pdf(inspections, tempfile.TemporaryFile())
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=f'inspections_{stamp}.pdf', content_type='application/pdf')
+
+    response = StreamingHttpResponse(stream_zip(inspections), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="inspections_{stamp}.zip"'
     return response
 
 @login_required(login_url='login')
@@ -750,16 +976,21 @@ def edit_inspection_view(request, pk):
     
     if request.method == 'POST':
         form = InspectionForm(request.POST, instance=inspection)
-        formset = InspectionImageFormSet(request.POST, request.FILES, instance=inspection, prefix='images')
+        formset = InspectionImageFormSet(request.POST, request.FILES, instance=inspection, prefix='images', form_kwargs={'user': request.user})
         
         if form.is_valid() and formset.is_valid():
-            form.save()
-            formset.save()
-            messages.success(request, "تم تحديث التقرير.")
-            return redirect('inspection_report_detail', pk=inspection.pk)
+            try:
+                with transaction.atomic():
+                    form.save()
+                    formset.save()
+            except UploadError as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, "تم تحديث التقرير.")
+                return redirect('inspection_report_detail', pk=inspection.pk)
     else:
         form = InspectionForm(instance=inspection)
-        formset = InspectionImageFormSet(instance=inspection, prefix='images')
+        formset = InspectionImageFormSet(instance=inspection, prefix='images', form_kwargs={'user': request.user})
         
     context = {
         'inspection': inspection,
@@ -795,7 +1026,7 @@ def inspector_rejected_reports_view(request):
     inspections = Inspection.objects.filter(
         inspector=request.user, 
         status='rejected'
-    ).order_by('-inspection_date')
+    ).select_related('company').order_by('-inspection_date')
     
     context = {
         'inspections': inspections,
@@ -817,14 +1048,8 @@ def manager_review_list_view(request):
     # 1. تطبيق البحث (Searching)
     search_query = request.GET.get('q')
     if search_query:
-        # البحث في اسم الشركة (company__company_name) أو اسم المفتش (inspector__username أو الاسم الكامل)
-        inspections = inspections.filter(
-            Q(company__company_name__icontains=search_query) |
-            Q(inspector__first_name__icontains=search_query) |
-            Q(inspector__last_name__icontains=search_query) |
-            Q(inspector__username__icontains=search_query) |
-            Q(inspector__user_id__icontains=search_query) 
-        )
+        # البحث في اسم الشركة أو اسم المفتش أو رقم هويته عبر فهرس البحث
+        inspections = search_queryset(inspections, 'inspection', search_query)
 
     # 2. تطبيق التصفية حسب نطاق التاريخ (Date Range Filtering)
     date_from = request.GET.get('date_from')
@@ -854,14 +1079,20 @@ def manager_review_list_view(request):
     
     # التأكد من أن الترتيب صحيح وآمن
     allowed_orders = ['inspection_date', '-inspection_date'] 
-    if order_by in allowed_orders:
-        inspections = inspections.order_by(order_by)
-    else:
+    if order_by not in allowed_orders:
         # إذا كانت القيمة غير مسموح بها، نستخدم الترتيب الافتراضي
-        inspections = inspections.order_by('-inspection_date')
+        order_by = '-inspection_date'
+
+    # التصدير يستخدم نفس نتائج البحث والتصفية
+    export_format = request.GET.get('export')
+    if export_format in EXPORT_FORMATS:
+        return export_inspections(inspections.order_by(order_by, 'pk'), export_format, 'pending_reports')
+
+    page = paginate_keyset(request, inspections, search_ordering(request, 'order_by', order_by, search_query))
     
     context = {
-        'inspections': inspections, 
+        'inspections': page, 
+        'page': page,
         'list_title': 'تقارير بانتظار الموافقة',
         'search_query': search_query,      # لحفظ قيمة البحث
         'date_from': date_from,            # لحفظ قيمة تاريخ البداية
@@ -944,9 +1175,7 @@ def manager_reports_archive_view(request):
 
     inspections = Inspection.objects.filter(status__in=['approved', 'archived', 'rejected']).select_related('company', 'inspector')
     if query:
-        inspections = inspections.filter(Q(company__company_name__icontains=query) |
-                                        Q(inspector__username__icontains=query) | 
-                                        Q(inspector__user_id__icontains=query))
+        inspections = search_queryset(inspections, 'inspection', query)
 
     if start_date_str:
         start_date = parse_date(start_date_str)
@@ -962,12 +1191,18 @@ def manager_reports_archive_view(request):
         else:
             messages.error(request, "صيغة تاريخ النهاية غير صحيحة.")
     
-    inspections = inspections.order_by(sort_order)
-    
+    if sort_order not in ['-inspection_date', 'inspection_date']:
+        sort_order = '-inspection_date'
+
+    export_format = request.GET.get('export')
+    if export_format in EXPORT_FORMATS:
+        return export_inspections(inspections.order_by(sort_order, 'pk'), export_format, 'reports_archive')
+
+    page = paginate_keyset(request, inspections, search_ordering(request, 'sort_order', sort_order, query))
 
-    
     context = {
-        'inspections': inspections, 
+        'inspections': page, 
+        'page': page,
         'list_title': 'التقارير المؤرشفة والموافق عليها',
         'query': query,
         'start_date': start_date_str,
@@ -989,13 +1224,7 @@ def manager_deleted_reports_view(request):
     search_query = request.GET.get('q')
     if search_query:
         # البحث في: اسم الشركة، اسم المفتش، رقم هوية المفتش
-        deleted_inspections = deleted_inspections.filter(
-            Q(company__company_name__icontains=search_query) |
-            Q(inspector__first_name__icontains=search_query) |
-            Q(inspector__last_name__icontains=search_query) |
-            Q(inspector__username__icontains=search_query) |
-            Q(inspector__user_id__icontains=search_query) # البحث برقم هوية المفتش
-        )
+        deleted_inspections = search_queryset(deleted_inspections, 'inspection', search_query)
 
     # 3. تطبيق التصفية حسب نطاق التاريخ (Date Range Filtering) - تاريخ الحذف (updated_at)
     date_from = request.GET.get('date_from')
@@ -1020,14 +1249,19 @@ def manager_deleted_reports_view(request):
     
     # التأكد من أن الترتيب صحيح وآمن
     allowed_orders = ['updated_at', '-updated_at'] 
-    if order_by in allowed_orders:
-        deleted_inspections = deleted_inspections.order_by(order_by)
-    else:
+    if order_by not in allowed_orders:
         # إذا كانت القيمة غير مسموح بها، نستخدم الترتيب الافتراضي
-        deleted_inspections = deleted_inspections.order_by('-updated_at')
+        order_by = '-updated_at'
+
+    export_format = request.GET.get('export')
+    if export_format in EXPORT_FORMATS:
+        return export_inspections(deleted_inspections.order_by(order_by, 'pk'), export_format, 'deleted_reports')
+
+    page = paginate_keyset(request, deleted_inspections, search_ordering(request, 'order_by', order_by, search_query))
     
     context = {
-        'inspections': deleted_inspections, 
+        'inspections': page, 
+        'page': page,
         'list_title': 'سلة المحذوفات',
         'search_query': search_query,
         'date_from': date_from,
@@ -1071,30 +1305,32 @@ def manager_audit_log_view(request):
     actor_ids = list(supervised_users.values_list('id', flat=True))
     actor_ids.append(request.user.id)
     
-    # 2. الاستعلام الأساسي: سجلات المدير والمفتشين التابعين
+    # 2. الاستعلام الأساسي: سجلات المدير والمفتشين التابعين الأحدث من آخر سجل مؤرشف
+    # (السجلات المؤرشفة في ملفات الأرشيف الشهرية وتُعرض عند اختيار الشهر)
+    months, archived_until = archive_index()
     audit_logs = LogEntry.objects.filter(
-        actor_id__in=actor_ids
+        actor_id__in=actor_ids,
     ).select_related(
         'actor', 
         'content_type'
     )
+    if archived_until:
+        audit_logs = audit_logs.filter(timestamp__gt=archived_until)
     
     # 3. تطبيق البحث (Searching)
     search_query = request.GET.get('q')
     if search_query:
         audit_logs = audit_logs.filter(
             # البحث في اسم المستخدم الذي قام بالعملية (actor)
-            Q(actor__first_name__icontains=search_query) |
-            Q(actor__last_name__icontains=search_query) |
-            Q(actor__username__icontains=search_query) |
-            Q(actor__user_id__icontains=search_query) |
-            
+            Q(actor__in=search_ids('user', search_query)) |
+
             # البحث في تمثيل السجل المتأثر (مثل اسم المنشأة)
-            Q(object_repr__icontains=search_query)
+            Q(pk__in=search_ids('logentry', search_query))
         )
 
     # 4. تطبيق التصفية حسب نوع العملية (Action)
     filter_action = request.GET.get('action')
+    action_value = None
     if filter_action:
         # تأكد أن القيمة رقمية لأن log.action يحفظ رقم (0=CREATE, 1=UPDATE, 2=DELETE)
         try:
@@ -1108,17 +1344,42 @@ def manager_audit_log_view(request):
     if filter_model:
         # ContentType__model يطابق اسم النموذج بالأحرف الصغيرة (مثل 'company' أو 'user')
         audit_logs = audit_logs.filter(content_type__model__iexact=filter_model)
-    
-    # الترتيب النهائي
-    audit_logs = audit_logs.order_by('-timestamp')
+
+    # شهر من الأرشيف (?archive=YYYY-MM): يُقرأ من الملفات وتُطبق عليه نفس الفلاتر
+    archive_month = None
+    filter_archive = request.GET.get('archive')
+    if filter_archive:
+        try:
+            archive_month = datetime.strptime(filter_archive, '%Y-%m').date()
+        except ValueError:
+            archive_month = None
+        if archive_month not in months:
+            archive_month = None
+
+    # الترتيب النهائي مع الترقيم بالمؤشر
+    if archive_month:
+        archived = load_archived_entries(archive_month, actor_ids=set(actor_ids))
+        page = paginate_list_keyset(
+            request, filter_archived_entries(archived, search_query, action_value, filter_model)
+        )
+    else:
+        page = paginate_keyset(request, audit_logs, '-timestamp')
+
+    # التغييرات المعالجة مسبقاً (أسماء الحقول والقيم والكائنات المرتبطة)
+    rendered_changes = render_log_changes(page)
+    for log in page:
+        log.rendered_changes = rendered_changes[log.pk]
     
     # 6. تمرير البيانات إلى الـ Template
     context = {
-        'logs': audit_logs,
+        'logs': page,
+        'page': page,
         'page_title': 'سجلات تدقيق الفريق',
         'search_query': search_query,
         'filter_action': filter_action,
         'filter_model': filter_model,
+        'archive_months': months,
+        'archive_month': archive_month,
         # لتوليد قائمة بالنماذج المتاحة في فلتر القالب
         'available_models': ['Company', 'Inspection', 'User'] # أضيفي جميع النماذج التي تُسجَّل
     }